@@ -42,6 +42,8 @@ else:
 
 
 
+    gcaGlobals.mainwind.root.after(100, gca.recoverJournals)
+
     if not gcaGlobals.dataStation:
         gcaGlobals.mainwind.root.after(10, gca.connectToArduino)
         gcaGlobals.mainwind.root.after(50, gca.selectLiveTab)
@@ -5,7 +5,7 @@ Major structure is GasChromatogram class which is used to make a
 GasChromatogram object for every GC trace acquired.
 
 This object consists of:
-    the actual trace
+    the actual trace (time and intensity arrays, float64 or float32)
     information about the acquisition
         time
         instrument
@@ -18,13 +18,20 @@ This object consists of:
         threshold and gradient threshold levels used to process
         points identified as baseline points in the trace
         calculated baseline points
-        a list of peaks (each a Peak object)
+        the peaks (a PeakTable, with columns for the Peak attributes)
+    a cache of arrays derived from the trace (not saved with the object)
+
+The analysis does not need tkinter, a main window or the config file: it can
+be used from batch jobs and worker processes. Settings that are not passed in
+are read with setting() (from gcaglobals only if the GUI has already loaded
+it), and problems are returned as a list of AnalysisWarning objects for the
+caller to show, instead of opening message boxes.
 
 Known Issue:
     Need to think about backwards compatibility in opening and saving files
     to allow for future modifications of this class.
-    Partially handled currently in fixBkwdCompat() of openFile() in
-    gcawindow.py
+    Partially handled currently in fixBkwdCompat() in gcaloader.py (used
+    when files are opened)
 
 Future Development:
     If other GC Instruments are added, this could be a root Class that other
@@ -41,8 +48,26 @@ Grinnell, IA 50112
 mobleyt@grinnell.edu
 """
 
+from collections import deque
+import functools
+import io
+import sys
 import numpy as np
-import gcaglobals as gcaGlobals
+import gcafit
+import gcastats
+
+
+def _timedStage(name):
+    """Decorator timing a GasChromatogram method as the stage name in the
+    object's ProcessingStats (if stats are being collected).
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def timedMethod(self, *args, **kwargs):
+            with self._runStats().stage(name):
+                return method(self, *args, **kwargs)
+        return timedMethod
+    return decorate
 
 
 class GasChromatogram():
@@ -51,9 +76,13 @@ class GasChromatogram():
     """
 
     def __init__(self, trace, timeStamp, thresh, gradThresh,
-                 comment="", instrName=""):
+                 comment="", instrName="", traceDtype=None):
 
-        self.trace = trace
+        if traceDtype is None:
+            traceDtype = setting('traceDtype')
+        self._cache = {}
+        self.trace = [np.asarray(trace[0], dtype=traceDtype),
+                      np.asarray(trace[1], dtype=traceDtype)]
 
         self.timeStamp = timeStamp
         self.instrName = instrName
@@ -71,7 +100,162 @@ class GasChromatogram():
         self.baselineCalc = []
         self.peaks = []
 
-    def findPeaks(self):
+    @property
+    def peaks(self):
+        """PeakTable of the peaks. A list of Peak objects can be assigned
+        (e.g. peaks = []), it is converted to a PeakTable.
+        """
+        return self._peaks
+
+    @peaks.setter
+    def peaks(self, peaks):
+        if not isinstance(peaks, PeakTable):
+            peaks = PeakTable(peaks)
+        self._peaks = peaks
+
+    @property
+    def trace(self):
+        """[timePoints, yPoints] of the GC trace as contiguous numpy arrays.
+        Setting a new trace converts lists to float64 arrays (float arrays
+        are kept as they are) and clears the cache of derived arrays.
+        A trace opened from a file may only be read when first used (see
+        setLazyArrays).
+        """
+        return self._trace
+
+    @trace.setter
+    def trace(self, trace):
+        self._trace = [_traceArray(trace[0]), _traceArray(trace[1])]
+        self.invalidateCache()
+
+    def setLazyArrays(self, loader, names):
+        """Leaves the arrays names ('trace', 'baselineIndex', 'baseline',
+        'baselineCalc') to be read when one of them is first used:
+        loader() then returns a dictionary of all of them. Used when opening
+        files so that the header can be read without the trace.
+        """
+        for name in names:
+            self.__dict__.pop('_trace' if name == 'trace' else name, None)
+        self._lazy = (loader, tuple(names))
+        self.invalidateCache()
+
+    @property
+    def lazyPending(self):
+        """True if arrays are still to be read (see setLazyArrays)."""
+        return '_lazy' in self.__dict__
+
+    def loadLazyArrays(self):
+        """Reads the arrays left by setLazyArrays (if not read already)."""
+        lazy = self.__dict__.pop('_lazy', None)
+        if lazy is None:
+            return
+        loader, names = lazy
+        try:
+            arrays = loader()
+        except Exception:
+            self._lazy = lazy               # try again next time
+            raise
+        for name in names:
+            setattr(self, name, arrays[name])
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set: those left to be
+        # read by setLazyArrays
+        lazy = self.__dict__.get('_lazy')
+        if lazy is not None and \
+                name in [('_trace' if n == 'trace' else n) for n in lazy[1]]:
+            self.loadLazyArrays()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def invalidateCache(self):
+        """Clears the cache of arrays derived from the trace. Needs to be
+        called if the trace lists are changed in place (setting trace does it
+        automatically).
+        """
+        self._cache = {}
+
+    def releaseCache(self):
+        """Frees the arrays cached from the trace (traceArrays,
+        baselineArray), e.g. for a run that is not being shown. They are
+        made again when next needed.
+        """
+        self._cache = {}
+
+    def collectStats(self, collect=True):
+        """Starts (or stops, collect=False) collecting processing stats for
+        this GasChromatogram, whatever the collectStats setting. Starting
+        clears any stats already collected.
+        """
+        self._stats = gcastats.ProcessingStats() if collect else None
+
+    @property
+    def stats(self):
+        """ProcessingStats (time and calls per stage, counters) collected
+        for this GasChromatogram, None if none have been collected.
+        """
+        return self.__dict__.get('_stats')
+
+    def _runStats(self):
+        """Returns the ProcessingStats to record into: this object's, made
+        when first needed if the collectStats setting is on, otherwise
+        gcastats.noStats which records nothing.
+        """
+        stats = self.__dict__.get('_stats')
+        if stats is None:
+            if not setting('collectStats'):
+                return gcastats.noStats
+            stats = self._stats = gcastats.ProcessingStats()
+        return stats
+
+    def recordStage(self, name, seconds):
+        """Records time spent on this GasChromatogram outside the analysis
+        (e.g. redrawing) as the stage name.
+        """
+        self._runStats().add(name, seconds)
+
+    def __getstate__(self):
+        """Pickle without the cache, with the trace and peaks (as a list of
+        Peak objects) under their old names so that files can still be read
+        by older versions.
+        """
+        self.loadLazyArrays()
+        state = self.__dict__.copy()
+        state.pop('_cache', None)
+        state.pop('_stats', None)
+        state['trace'] = state.pop('_trace')
+        state['peaks'] = state.pop('_peaks').toPeaks()
+        return state
+
+    def __setstate__(self, state):
+        """Unpickle. Traces saved as lists by older versions are converted
+        to arrays here.
+        """
+        state = dict(state)
+        trace = state.pop('trace')
+        peaks = state.pop('peaks', [])
+        self.__dict__.update(state)
+        self.trace = trace
+        self.peaks = peaks
+
+    def traceLists(self):
+        """Returns [timePoints, yPoints] as python lists, which are faster
+        than arrays for the point by point loops of findPeaks. The lists are
+        made on each call (not cached, they take several times the memory of
+        the arrays).
+        """
+        return [self.trace[0].tolist(), self.trace[1].tolist()]
+
+    def _cached(self, key, calculate):
+        """Returns cached value for key, calling calculate() to make it the
+        first time.
+        """
+        if key not in self._cache:
+            self._cache[key] = calculate()
+        return self._cache[key]
+
+    @_timedStage("findPeaks")
+    def findPeaks(self, areaChoice=None, inBaseCt=None):
         """Routine to automatically find peaks.  First looks for start of peak.
         Once found, the end of peak is searched for. When the peak end
         is found, the peakMax is determined, the peakArea is
@@ -87,19 +271,26 @@ class GasChromatogram():
         with in a reasonable way. Future development could include
         recalculating baseline for riding peaks to better emulate curve of
         underlying peak.
+
+        areaChoice and inBaseCt default to setting(). Returns a list of
+        AnalysisWarning (empty if there was no problem).
         """
-        timePoints = self.trace[0]
-        yPoints = self.trace[1]
+        if areaChoice is None:
+            areaChoice = setting('areaChoice')
+        if inBaseCt is None:
+            inBaseCt = setting('inBaseCt')
+        arrays = self.traceArrays()     # cumulative sums for peak areas
+        yPoints = arrays['y'].tolist()
         self.baselineCalc = {}
 
-        if len(yPoints) > gcaGlobals.inBaseCt:       # Minimum 10 pts. for data
-            yGradients = np.gradient(yPoints).tolist()
+        if len(yPoints) > inBaseCt:       # Minimum 10 pts. for data
+            yGradients = arrays['grad'].tolist()
             self.baselineIndex = [0]
-            self.baseline = yPoints[0:gcaGlobals.inBaseCt-1]
+            self.baseline = yPoints[0:inBaseCt-1]
             # define the 1st 10 pts as baseline
             currentIndex = 0                # define start point for analysis
-            currentBaseline = (sum(yPoints[0:gcaGlobals.inBaseCt-1]) /
-                               gcaGlobals.inBaseCt)  # 1st 10 pts init baseline
+            currentBaseline = (sum(yPoints[0:inBaseCt-1]) /
+                               inBaseCt)  # 1st 10 pts init baseline
             valley = False
             peakEnd = None
 
@@ -113,18 +304,18 @@ class GasChromatogram():
                     peakStart, currentBaseline = self.findStart(yPoints,
                                                             yGradients,
                                                             currentBaseline,
-                                                            currentIndex)
+                                                            currentIndex,
+                                                            inBaseCt)
 
-                if peakStart:
+                if peakStart is not None:
                     peakEnd, valley = self.findEnd(yPoints, yGradients,
                                                    currentBaseline, peakStart)
                     if peakEnd:
                         currentIndex = peakEnd
                         peakMax = self.findPeakMax(yPoints, peakStart, peakEnd)
-                        peakArea = 100*self.findPeakArea(yPoints, timePoints,
-                                                         peakStart, peakEnd,
-                                                         currentBaseline,
-                                                         gcaGlobals.areaChoice)
+                        peakArea = 100*_sumsPeakArea(arrays, peakStart,
+                                                     peakEnd, currentBaseline,
+                                                     areaChoice)
                         self.peaks.append(Peak(peakStart, peakEnd,
                                                peakMax, peakArea,
                                                currentBaseline, 0))
@@ -132,10 +323,9 @@ class GasChromatogram():
                         currentIndex = len(yPoints) - 1
                         peakEnd = currentIndex  # set pk end to last data point
                         peakMax = self.findPeakMax(yPoints, peakStart, peakEnd)
-                        peakArea = 100*self.findPeakArea(yPoints, timePoints,
-                                                         peakStart, peakEnd,
-                                                         currentBaseline,
-                                                         gcaGlobals.areaChoice)
+                        peakArea = 100*_sumsPeakArea(arrays, peakStart,
+                                                     peakEnd, currentBaseline,
+                                                     areaChoice)
                         self.peaks.append(Peak(peakStart, peakEnd,
                                                peakMax, peakArea,
                                                currentBaseline, 0))
@@ -146,37 +336,291 @@ class GasChromatogram():
             self.peaks = []
 
         pkBases = {}
-        pkIndex = []        # List to contain all pts. incl. in peaks
+        pkMask = np.zeros(len(yPoints), dtype=bool)  # True for pts. in peaks
         for pk in self.peaks:
-            pkStart = pk.peakStart
-            pkEnd = pk.peakEnd
+            pkStart = int(pk.peakStart)
+            pkEnd = int(pk.peakEnd)
             if pkEnd < len(yPoints):
                 pkEnd = pkEnd + 1
-            for i in list(range(pkStart, pkEnd)):
-                pkIndex.append(i)
-                pkBases[i] = pk.peakBaseline
-# concatenate this peak's pts. to pkIndex list
+            pkMask[max(pkStart, 0):pkEnd] = True
+            pkBases.update(dict.fromkeys(range(pkStart, pkEnd),
+                                         pk.peakBaseline))
+# mark this peak's pts. in pkMask
 # get baseline for each peak, associate with indices within peaks
 
-        self.baselineIndex = list(set(range(len(yPoints))) - set(pkIndex))
+        self.baselineIndex = np.flatnonzero(~pkMask).tolist()
 # baseline index is all other points
         self.baseline = []
         self.baselineCalc.update(pkBases)
-        baselineList = []
+        self.baselineCalc = list(self.baselineCalc.values())
+        stats = self._runStats()
+        stats.count('pointsScanned', len(yPoints))
+        stats.count('peaksEmitted', len(self.peaks))
+        return self.findNormalizedArea()
+
+    @_timedStage("findPeaksVectorized")
+    def findPeaksVectorized(self, areaChoice=None, inBaseCt=None):
+        """Array based version of findPeaks.  Follows the same algorithm
+        (peak start on two rising gradients above gradThresh, downslope,
+        then peak end or valley) but works on whole blocks of the trace at
+        a time instead of point by point:
+
+            1) The gradient is calculated once and turned into boolean masks
+               for rising, falling, flat and valley regions.
+            2) Peak starts are searched for in blocks.  The running baseline
+               for a block is a rolling window (last inBaseCt points) over
+               the baseline points, summed in the same order as findStart.
+            3) Peak ends are searched for in blocks with the same masks, so
+               only the points up to the peak end are looked at.
+            4) Peak areas come from cumulative sums of the trace.
+
+        The python loop runs once per peak (not once per point), so the
+        processing time is essentially that of a few numpy calls.  The
+        first few points of each search are still stepped through one at a
+        time (see _SCALAR_STEPS), which is faster for the many short peaks
+        and gaps of a noisy trace.
+
+        The decision of whether a point belongs to the baseline (less than
+        2 * thresh above the baseline) is made for a whole block at once and
+        then checked against the running baseline, and the block is redone
+        from the first point where it was wrong, so the peaks, baselines and
+        areas are exactly those of findPeaks (test_peakengines checks this).
+
+        Settings and return value as for findPeaks.
+        """
+        if areaChoice is None:
+            areaChoice = setting('areaChoice')
+        if inBaseCt is None:
+            inBaseCt = setting('inBaseCt')
+        arrays = self.traceArrays()
+        nPts = len(arrays['y'])
+        stats = self._runStats()
+        peaks, baselineCalc = self._searchPeaks(arrays, self.thresh,
+                                                self.gradThresh,
+                                                areaChoice, inBaseCt, stats)
+        self.peaks = peaks
+        stats.count('pointsScanned', nPts)
+        stats.count('peaksEmitted', len(peaks))
+        if baselineCalc is None:        # Data set has less than 15 pts.
+            self.baselineIndex = list(range(nPts))
+            self.baseline = []
+            self.baselineCalc = []
+            return []
+
+        pkMask = np.zeros(nPts, dtype=bool)
+        for pk in peaks:                # Peak objects, faster than the table
+            pkMask[pk.peakStart:pk.peakEnd + 1] = True
+        self.baselineIndex = np.flatnonzero(~pkMask).tolist()
+        self.baseline = []
+        self.baselineCalc = baselineCalc.tolist()
+        return self.findNormalizedArea()
+
+    def sweepThresholds(self, threshList, gradThreshList, areaChoice=None,
+                        inBaseCt=None):
+        """Runs the vectorized peak search for every pair of threshold and
+        gradient threshold in the grid threshList x gradThreshList, to help
+        in choosing thresh and gradThresh. The gradient, its masks, the
+        cumulative sums used for areas and the noise levels are calculated
+        once and shared by all grid points. The GasChromatogram itself is
+        not changed.
+
+        Returns a list (thresh varying slowest) with one tuple per grid point:
+            (thresh, gradThresh, number of peaks, total peak area,
+             list of retention times)
+
+        noiseLevels() gives the noise of the trace and of its gradient,
+        which are useful for choosing the range of the grid.
+        """
+        if areaChoice is None:
+            areaChoice = setting('areaChoice')
+        if inBaseCt is None:
+            inBaseCt = setting('inBaseCt')
+        arrays = self.traceArrays()
+        timePoints = arrays['time']
+        results = {}
+# gradThresh varies slowest here, so the masks of each are made only once
+        for j, gradThresh in enumerate(gradThreshList):
+            for i, thresh in enumerate(threshList):
+                peaks, baselineCalc = self._searchPeaks(arrays, thresh,
+                                                        gradThresh,
+                                                        areaChoice,
+                                                        inBaseCt)
+                results[i, j] = (thresh, gradThresh, len(peaks),
+                                 sum(pk.peakArea for pk in peaks),
+                                 [float(timePoints[pk.peakMax])
+                                  for pk in peaks])
+        return [results[i, j] for i in range(len(threshList))
+                for j in range(len(gradThreshList))]
+
+    def noiseLevels(self):
+        """Returns estimates of the noise (standard deviation) of the trace
+        and of its gradient, from the median absolute deviation of the
+        gradient (peaks have little effect on the median).
+        """
+        arrays = self.traceArrays()
+        return arrays['yNoise'], arrays['gradNoise']
+
+    def traceArrays(self):
+        """Returns dictionary of arrays derived from the trace that do not
+        depend on the processing parameters. The dictionary is cached until
+        the trace is changed (or releaseCache is called), so the arrays must
+        not be modified.
+
+            time, y            the trace arrays themselves (not copies, in
+                               the traceDtype of the trace)
+            grad               np.gradient of y (float64)
+            falling, valleys   gradient < 0; two consecutive gradients > 0
+            ySums              cumulative sum of y (ySums[i] = sum of y[:i])
+            trapSums           cumulative trapezoidal integral of y over time
+                               (trapSums[i] = integral from point 0 to i)
+            yNoise, gradNoise  noise estimates (see noiseLevels)
+            masks              (gradThresh, rising, flat) of the last
+                               gradThresh searched for (or None)
+        """
+        return self._cached('arrays', self._makeTraceArrays)
+
+    def baselineArray(self):
+        """Returns baselineCalc as an array (cached until baselineCalc is
+        replaced by a new list).
+        """
+        cached = self._cache.get('baselineArray')
+        if cached is None or cached[0] is not self.baselineCalc:
+            cached = (self.baselineCalc, np.asarray(self.baselineCalc))
+            self._cache['baselineArray'] = cached
+        return cached[1]
+
+    def _makeTraceArrays(self):
+        stats = self._runStats()
+# the trace is used as it is; only the derived arrays that need it
+# (gradient, sums) are float64
+        timePoints, yPoints = self.trace
+        arrays = {'time': timePoints, 'y': yPoints, 'masks': None}
+        with stats.stage('integrationIndex'):
+            arrays['ySums'], arrays['trapSums'] = _integralSums(timePoints,
+                                                                yPoints)
+        if len(yPoints) < 2:
+            arrays['yNoise'] = arrays['gradNoise'] = 0.0
+            return arrays
+
+        with stats.stage('gradient'):
+            yGradients = np.gradient(yPoints.astype(float, copy=False))
+            arrays['grad'] = yGradients
+            arrays['falling'] = yGradients < 0
+            arrays['valleys'] = (yGradients[:-1] > 0) & (yGradients[1:] > 0)
+        gradNoise = 1.4826 * float(np.median(np.abs(
+            yGradients - np.median(yGradients))))
+        arrays['gradNoise'] = gradNoise
+        arrays['yNoise'] = float(gradNoise * np.sqrt(2))  # central diff.
+        return arrays
+
+    def _searchPeaks(self, arrays, thresh, gradThresh, areaChoice, inBaseCt,
+                     stats=gcastats.noStats):
+        """Peak search of findPeaksVectorized on the arrays from
+        traceArrays. Returns the list of peaks and the array of calculated
+        baseline values (None if the trace is too short to process).
+        The search stages are timed in stats.
+        """
+        yPoints = arrays['y'].astype(float, copy=False)  # copy if float32
+        nPts = len(yPoints)
+        if nPts <= inBaseCt:
+            return [], None
+
+        if arrays['masks'] is None or arrays['masks'][0] != gradThresh:
+            yGradients = arrays['grad']
+            arrays['masks'] = (gradThresh,
+                               (yGradients[:-1] > gradThresh) &
+                               (yGradients[1:] > gradThresh),
+                               np.abs(yGradients) < gradThresh/5)
+        rising, flat = arrays['masks'][1:]
+        baselineCalc = np.empty(nPts)
+        peaks = []
+
+        basePool = yPoints[0:1]         # values of most recent baseline pts.
+        currentBaseline = sum(yPoints[0:inBaseCt-1].tolist()) / inBaseCt
+        currentIndex = 0
+        valley = False
+        peakEnd = None
+
+        while currentIndex < nPts - 1:
+            if valley:
+                peakStart = peakEnd
+                valley = False
+            else:
+                with stats.stage('findStart'):
+                    peakStart, currentBaseline, basePool = \
+                        _findStartBlock(yPoints, rising, baselineCalc, thresh,
+                                        currentBaseline, basePool,
+                                        currentIndex, inBaseCt)
+            if peakStart is None:
+                break
 
-        for i in list(self.baselineCalc.keys()):
-            baselineList.append(self.baselineCalc[i])
-        self.baselineCalc = baselineList
-        self.findNormalizedArea()
+            with stats.stage('findEnd'):
+                peakEnd, valley = _findEndBlock(yPoints, arrays['falling'],
+                                                flat, arrays['valleys'],
+                                                thresh, currentBaseline,
+                                                peakStart)
+            if peakEnd is None:         # If no peak end, at end of dataset
+                peakEnd = nPts - 1
+            currentIndex = peakEnd
+            baselineCalc[peakStart:peakEnd + 1] = currentBaseline
+            with stats.stage('peakArea'):
+                peakMax = _arrayPeakMax(yPoints, peakStart, peakEnd)
+                peakArea = 100*_sumsPeakArea(arrays, peakStart, peakEnd,
+                                             currentBaseline, areaChoice)
+            peaks.append(Peak(peakStart, peakEnd, peakMax, peakArea,
+                              float(currentBaseline), 0))
+
+        baselineCalc[-1] = baselineCalc[-2]
+        return peaks, baselineCalc
+
+    @_timedStage("usePeakFinder")
+    def usePeakFinder(self, peakFinder):
+        """Takes the peaks found during acquisition by a StreamingPeakFinder
+        (after its finish() has been called) instead of running findPeaks.
+        The baseline points are all points outside the peaks; the calculated
+        baseline is the peak baseline within peaks and the average of the
+        last inBaseCt baseline points elsewhere. Returns a list of
+        AnalysisWarning.
+        """
+        yPoints = np.asarray(self.trace[1], dtype=float)
+        nPts = len(yPoints)
+        inBaseCt = peakFinder.inBaseCt
+        self.peaks = peakFinder.peaks
+
+        pkMask = np.zeros(nPts, dtype=bool)
+        for pk in self.peaks:
+            pkMask[pk.peakStart:pk.peakEnd + 1] = True
+        baseIndex = np.flatnonzero(~pkMask)
+
+        baselineCalc = np.empty(nPts)
+        if len(baseIndex) > 0:
+            baseSums = np.concatenate(([0.0], np.cumsum(yPoints[baseIndex])))
+            baseCt = np.searchsorted(baseIndex, np.arange(nPts), 'right')
+            windowCt = np.maximum(np.minimum(baseCt, inBaseCt), 1)
+            baselineCalc[:] = (baseSums[baseCt] -
+                               baseSums[baseCt - windowCt]) / windowCt
+            baselineCalc[baseCt == 0] = yPoints[baseIndex[0]]
+        for pk in self.peaks:
+            baselineCalc[pk.peakStart:pk.peakEnd + 1] = pk.peakBaseline
+
+        self.baselineIndex = baseIndex.tolist()
+        self.baseline = []
+        self.baselineCalc = baselineCalc.tolist()
+        self._runStats().count('peaksEmitted', len(self.peaks))
+        return self.findNormalizedArea()
 
-    def manualPeaks(self, manualPeakList=[], baseStEnd=[]):
+    @_timedStage("manualPeaks")
+    def manualPeaks(self, manualPeakList=[], baseStEnd=[],
+                    baselineModel=None, areaChoice=None):
         """Routine to process peaks manually after they have been identified
         by user peak picking. First it merges and sorts the existing peaks with
-        those manually picked, if necessary. It then collects all points
-        in the peaks, and finds the baseline points by set difference.
-        A baseline is then calculated. Individual peaks are then processed
-        to find peakMax and peakArea (using the calculated baseline).
-        Finally peak areas are normalized.
+        those manually picked, if necessary. It then marks all points
+        in the peaks in a mask, and the baseline points are the rest.
+        A baseline is then calculated with baselineModel (a key of
+        baselineModels, default is the baselineModel global). Individual peaks
+        are then processed to find peakMax and peakArea (using the calculated
+        baseline). Finally peak areas are normalized. Returns a list of
+        AnalysisWarning (empty if there was no problem).
 
         Shortcoming: The baseline calculation takes into account the fact that
         the timepoints might not be evenly spaced; HOWEVER, the calculation
@@ -185,116 +629,103 @@ class GasChromatogram():
         peaks = self.peaks
 
         if manualPeakList == []:
-            gcaGlobals.mainwind.sendMessage("No Peaks",
-                                            "No manual peaks to process")
-            return
-        if peaks == []:     # There are no pre-existing peaks to contend with
+            return [AnalysisWarning("No Peaks", "No manual peaks to process")]
+        if len(peaks) == 0:  # There are no pre-existing peaks to contend with
             manualPeakList = list(zip(manualPeakList[::2],
                                       manualPeakList[1::2]))  # [(start, end)]
         else:
-            oldpeaks = []
-            for peak in peaks:      # Move existing peaks into list
-                oldpeaks.append((peak.peakStart, peak.peakEnd))
+            oldpeaks = list(zip(peaks.peakStart.tolist(),   # Move existing
+                                peaks.peakEnd.tolist()))    # peaks into list
             manualPeakList = list(zip(manualPeakList[::2],
                                       manualPeakList[1::2]))  # [(start, end)]
             manualPeakList = manualPeakList + oldpeaks
             manualPeakList.sort()
 
-        timePoints = self.trace[0]
-        yPoints = self.trace[1]
+        timeArray, yArray = self.trace
 
-        pkIndex = []        # List to contain all pts. incl. in peaks
+        pkMask = np.zeros(len(yArray), dtype=bool)  # True for pts. in peaks
         for pk in manualPeakList:
-            pkStart = pk[0]
-            pkEnd = pk[1]
-            if pkEnd != len(yPoints) + 1:
-                pkEnd = pkEnd + 1
-            pkIndex = pkIndex + list(range(pkStart, pkEnd))
+            pkMask[max(pk[0], 0):pk[1] + 1] = True
 
-# concatenate this peak's pts. to pkIndex list
+# baseline pts are all points not included in pks
         if baseStEnd == []:
-            self.baselineIndex = list(set(range(len(yPoints))) - set(pkIndex))
+            baseIndex = np.flatnonzero(~pkMask)
         else:
-            self.baselineIndex = list(set(range(baseStEnd[0], baseStEnd[1])) -
-                                      set(pkIndex))
-
-# baseline pts are all points not included in pks
-        self.baseline = []
-        baselineTimes = []
-        for i in self.baselineIndex:
-            self.baseline.append(yPoints[i])
-            baselineTimes.append(timePoints[i])
-
-        baselineCalc = self.calculateBaseline(self.baseline,
-                                              baselineTimes,
-                                              timePoints)
-
-        newpeaks = []
-        for pk in manualPeakList:
-            pkStart = pk[0]
-            pkEnd = pk[1]
-            pkMax = self.findPeakMax(yPoints, pkStart, pkEnd)
+            baseStart = max(baseStEnd[0], 0)
+            baseIndex = np.flatnonzero(~pkMask[baseStart:baseStEnd[1]]) + \
+                baseStart
+        self.baselineIndex = baseIndex.tolist()
+        self.baseline = yArray[baseIndex].tolist()
+        baselineTimes = timeArray[baseIndex].tolist()
+
+        if baselineModel is None:
+            baselineModel = setting('baselineModel')
+        baselineOrder = setting('baselineOrder')
+# only the last baseline is kept (peaks are usually edited one at a time)
+        key = (baselineModel, baselineOrder, baseIndex.tobytes())
+        cached = self._cache.get('baselineCalc')
+        if cached is None or cached[0] != key:
+            cached = (key, self.calculateBaseline(self.baseline,
+                                                  baselineTimes, timeArray,
+                                                  baselineModel,
+                                                  order=baselineOrder))
+            self._cache['baselineCalc'] = cached
+        baselineCalc = cached[1]
+
+        pkStarts = np.array([pk[0] for pk in manualPeakList], dtype=np.intp)
+        pkEnds = np.array([pk[1] for pk in manualPeakList], dtype=np.intp)
 
 # This calculation for current baseline assumes equal spacing of timepoints.
-            currentBaseline = sum(baselineCalc[pkStart:pkEnd])/(pkEnd-pkStart)
+        baseSums = np.concatenate(([0.0], np.cumsum(baselineCalc)))
+        pkBases = (baseSums[pkEnds] - baseSums[pkStarts]) / (pkEnds - pkStarts)
+        pkAreas = self.peakAreas(pkStarts, pkEnds, pkBases,
+                                 method=areaChoice)
 
-            pkArea = 100 * self.findPeakArea(yPoints, timePoints, pkStart,
-                                             pkEnd, currentBaseline,
-                                             gcaGlobals.areaChoice)
+        newpeaks = []
+        for pkStart, pkEnd, pkArea, currentBaseline in zip(
+                pkStarts.tolist(), pkEnds.tolist(), pkAreas.tolist(),
+                pkBases.tolist()):
+            pkMax = _arrayPeakMax(yArray, pkStart, pkEnd)
             newpeaks.append(Peak(pkStart,
                                  pkEnd, pkMax, pkArea, currentBaseline, 0))
         self.peaks = newpeaks
         self.baselineCalc = baselineCalc
-        self.findNormalizedArea()
-        gcaGlobals.manPeakList = []
-        gcaGlobals.baseSelect = []
-
-    def calculateBaseline(self,
-                          baseline, baselineTimes, timePoints, func="5th"):
-        """Calculate the baseline for entire GC trace.  Currently this is a
-        tenth order polynomial. This function seemed to work well with very
-        small peaks on a pretty flat baseline. The accuracy of this baseline
-        calculation has not been tested on multiple data sets. This routine
-        could be upgraded to allow other functions to be utilized to calculate
-        the baseline.
-        """
-        x = np.array(baselineTimes)
-        y = np.array(baseline)
-        if func == "5th":
-            fit = np.polyfit(x, y, 5)
-            ycalc = np.poly1d(fit)
-            baselineCalc = []
-            for i in timePoints:
-                baselineCalc.append(ycalc(i))
-        return baselineCalc
-
+        self._runStats().count('peaksEmitted', len(newpeaks))
+        return self.findNormalizedArea()
+
+    @_timedStage("calculateBaseline")
+    def calculateBaseline(self, baseline, baselineTimes, timePoints,
+                          func="5th", **options):
+        """Calculate the baseline for entire GC trace. func is the name of
+        a model in baselineModels (the original is "5th", a fifth order
+        polynomial, which seemed to work well with very small peaks on a
+        pretty flat baseline). options are passed on to the model, e.g.
+        order for "polynomial". The accuracy of these baseline calculations
+        has not been tested on multiple data sets.
+
+        Returns the baseline at every timepoint as a list.
+        """
+        if func not in baselineModels:
+            raise ValueError("Unknown baseline model: " + str(func))
+        x = np.asarray(baselineTimes, dtype=float)
+        y = np.asarray(baseline, dtype=float)
+        t = np.asarray(timePoints, dtype=float)
+        return baselineModels[func](x, y, t, **options).tolist()
+
+    @_timedStage("normalize")
     def findNormalizedArea(self):
-        """Returns normalized area for peaks that are held in the
-        GasChromatograph object that called it.
+        """Sets normalized area for peaks that are held in the
+        GasChromatograph object that called it. Returns a list of
+        AnalysisWarning (empty if there was no problem).
         """
-        import tkinter as tk
-        import warnings
-
-# To help catch mathematics calculation warnings to show users
-        warnings.filterwarnings('error', category=RuntimeWarning)
-
-        totalPeakArea = 0
-        msgStr = ""
-
-        for peak in self.peaks:
-            totalPeakArea += peak.peakArea
-        for i in range(len(self.peaks)):
-            try:
-                self.peaks[i].relativePeakArea = \
-                    100 * self.peaks[i].peakArea/totalPeakArea
-            except RuntimeWarning as msg:
-                msgStr = "There was an error in normalizing the peaks: \n\n" +\
-                    str(msg)
+        msgStr = self.peaks.normalize()
 
         if msgStr != "":
-            tk.messagebox.showerror("Error in Normalizing Peaks", msgStr)
+            return [AnalysisWarning("Error in Normalizing Peaks", msgStr)]
+        return []
 
-    def findStart(self, yPts, yGrads, currBase, currIndex):
+    @_timedStage("findStart")
+    def findStart(self, yPts, yGrads, currBase, currIndex, inBaseCt=None):
         """Find beginning of a peak using gradient method. The gradient
         threshold (gradThresh) and the height threshold (thresh) are held in
         the GasChromatograph object that called it.
@@ -322,34 +753,37 @@ class GasChromatogram():
         2) When a peakStart has been found, return it with the current baseline
         3) If no peakStart is found in remaining points, return None as pkStart
         """
+        if inBaseCt is None:
+            inBaseCt = setting('inBaseCt')
         found = False
 
         for i in range(len(yGrads) - currIndex - 1):
             if (yGrads[currIndex + i] > self.gradThresh) and \
                     (yGrads[currIndex + i + 1] > self.gradThresh) and \
                     (yPts[currIndex + i + 1] > (self.thresh + currBase)):
-                pkStart = currIndex + i - 1
+                pkStart = max(currIndex + i - 1, 0)
                 found = True
                 break
             else:
                 if (yPts[currIndex + i] < (2 * self.thresh + currBase)):
                     self.baselineIndex.append(currIndex + i)
                 self.baselineCalc[currIndex + i] = currBase
-                if len(self.baselineIndex) < gcaGlobals.inBaseCt:
+                if len(self.baselineIndex) < inBaseCt:
                     currBase = 0
                     for i in self.baselineIndex:
                         currBase += yPts[i]
                     currBase = currBase/len(self.baselineIndex)
                 else:
                     currBase = 0
-                    for i in self.baselineIndex[-gcaGlobals.inBaseCt:]:
+                    for i in self.baselineIndex[-inBaseCt:]:
                         currBase += yPts[i]
-                    currBase = currBase/gcaGlobals.inBaseCt
+                    currBase = currBase/inBaseCt
         if found:
             return pkStart, currBase
         else:
             return None, currBase
 
+    @_timedStage("findEnd")
     def findEnd(self, yPts, yGrads, currBase, pkStart):
         """Find end of a peak. The gradient
         threshold (gradThresh) and the height threshold (thresh) are held in
@@ -386,6 +820,7 @@ class GasChromatogram():
                     return pkStart + i, True     # Found peak valley
         return None, False           # Found no end
 
+    @_timedStage("peakMax")
     def findPeakMax(self, yPts, pkStart, pkEnd):
         """Find top of a peak. Finds peakMax by comparing successive points.
         If there are multiple consecutive points with some max value, takes
@@ -415,77 +850,897 @@ class GasChromatogram():
         Trapezoidal: utilizies numpy routine to estimate area, the yPoints that
             are passed are corrected by substracting out current baseline at
             each point.
+
+        For many peaks on the trace of this GasChromatogram use peakAreas,
+        which looks the areas up in the integration index instead.
         """
         pkArea = 0
-        yPtsCorr = list(yPts)
         if method == "addition":
-            for point in range(pkStart, pkEnd):
-                pkArea += yPts[point] - currBase
+            pkArea = sum(yPts[pkStart:pkEnd]) - currBase * (pkEnd - pkStart)
             pkArea = pkArea/(tPts[pkEnd]-tPts[pkStart])
         elif method == "trapezoidal":
-            for point in range(pkStart, pkEnd):
-                yPtsCorr[point] = yPts[point] - currBase
-            pkArea = np.trapz(yPtsCorr[pkStart:pkEnd], tPts[pkStart:pkEnd])
+            yPtsCorr = np.asarray(yPts[pkStart:pkEnd], dtype=float) - currBase
+            tPtsPk = np.asarray(tPts[pkStart:pkEnd], dtype=float)
+            pkArea = float(np.sum((yPtsCorr[1:] + yPtsCorr[:-1]) *
+                                  np.diff(tPtsPk)) / 2)
         return pkArea
 
+    @_timedStage("peakArea")
+    def peakAreas(self, starts, ends, baseline=0.0, baselineCurve=None,
+                  method=None):
+        """Returns the areas (scaled by 100, like peakArea) of the peaks
+        running from starts to ends (arrays of indices), calculated in the
+        same way as findPeakArea. The method defaults to the areaChoice
+        setting.
+
+        baseline is a constant baseline under each peak (a single value or
+        one per peak). baselineCurve is a baseline for the whole trace (e.g.
+        baselineArray()), subtracted point by point. Both can be given.
+
+        The areas come from cumulative sums of the trace made once and kept
+        in traceArrays (the integration index), so each peak takes a couple
+        of lookups whatever its width.
+        """
+        if method is None:
+            method = setting('areaChoice')
+        return 100 * _indexPeakAreas(self.traceArrays(), starts, ends,
+                                     baseline, baselineCurve, method)
+
+    @_timedStage("reintegrate")
+    def reintegrate(self, method=None):
+        """Recalculates the area of every peak (with its own peakBaseline)
+        from the integration index, e.g. after the area method was changed
+        or peaks were edited, then renormalizes. Returns a list of
+        AnalysisWarning.
+        """
+        peaks = self.peaks
+        if len(peaks) == 0:
+            return []
+        peaks.peakArea[:] = self.peakAreas(peaks.peakStart, peaks.peakEnd,
+                                           peaks.peakBaseline, method=method)
+        return self.findNormalizedArea()
+
+    @_timedStage("fitPeaks")
+    def fitPeaks(self, model=None, maxGap=0, maxIter=100):
+        """Fits each cluster of adjacent peaks (see gcafit.findClusters)
+        with a sum of model peaks ("gaussian" or "emg", default is the
+        fitModel setting; "none" fits nothing) on a straight baseline, and
+        stores the area of each fitted peak in its fittedArea (scaled by 100
+        like peakArea, as the integral over time). This separates peaks
+        riding on larger ones better than splitting at the valley. peakArea
+        is not changed.
+
+        Returns (list of gcafit.fitCluster results, one per cluster, list
+        of AnalysisWarning for clusters whose fit did not converge).
+        """
+        if model is None:
+            model = setting('fitModel')
+        if model == "none":
+            return [], []
+        peaks = self.peaks
+        peaks.sort('peakStart')
+        timePoints = self.traceArrays()['time']
+        yPoints = self.traceArrays()['y']
+        starts, ends = peaks.peakStart, peaks.peakEnd
+        results = []
+        warnings = []
+        for first, last in gcafit.findClusters(starts, ends, maxGap):
+            result = gcafit.fitCluster(timePoints, yPoints,
+                                       starts[first:last], ends[first:last],
+                                       peaks.peakMax[first:last],
+                                       float(peaks.peakBaseline[first]),
+                                       model, maxIter)
+            peaks.fittedArea[first:last] = 100 * result['areas']
+            results.append(result)
+            self._runStats().count('clustersFitted')
+            if not result['converged']:
+                warnings.append(AnalysisWarning(
+                    "Peak Fit", "Fit of peaks at " +
+                    str(round(float(timePoints[peaks.peakMax[first]]), 3)) +
+                    " min did not converge"))
+        return results, warnings
+
 
 class Peak():
     """Class for an individual peak within a gas chromatogram.
     Will hold peakStart, peakEnd, peakMax as (index, maximum value), peakArea
+    fittedArea is the area from fitPeaks (same scale as peakArea), NaN until
+    the peak has been fitted.
+
+    Uses __slots__ (no per-instance __dict__) to keep peaks small. Pickled
+    state is still a dictionary of the attributes, so peaks saved by older
+    versions (and by this one) can be read by either.
     """
+    __slots__ = ('peakStart', 'peakEnd', 'peakMax', 'peakArea',
+                 'peakBaseline', 'relativePeakArea', 'fittedArea')
 
     def __init__(self, peakStart, peakEnd, peakMax, peakArea, peakBaseline,
-                 relativePeakArea):
+                 relativePeakArea, fittedArea=float('nan')):
         self.peakStart = peakStart     # index of timePoints, yPoints
         self.peakEnd = peakEnd         # index of timePoints, yPoints
         self.peakMax = peakMax         # index of timePoint, yPoints
         self.peakArea = peakArea       # Area under curve
         self.peakBaseline = peakBaseline
         self.relativePeakArea = relativePeakArea
+        self.fittedArea = fittedArea   # Area of fitted peak shape
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):        # (dict state, slots state)
+            state = state[1]
+        self.fittedArea = float('nan')      # not in older files
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class PeakTable():
+    """Class holding all the peaks of a gas chromatogram in columns.
+
+    The peaks are kept in a numpy record array with one field for each
+    attribute of Peak (peakStart, peakEnd, peakMax, peakArea, peakBaseline,
+    relativePeakArea, fittedArea). A whole column is available as an
+    attribute of the table (e.g. table.peakArea is the array of all peak
+    areas), so that normalization, sorting, searches and export are done
+    on arrays.
+
+    The table can still be used like the old list of Peak objects: it has
+    len(), iteration and indexing (each row has the Peak attributes, and
+    changing a row changes the table), append() and del.
+    """
+
+    def __init__(self, peaks=()):
+        rows = [tuple(getattr(peak, name) for name in PEAK_DTYPE.names)
+                for peak in peaks]
+        self._rows = np.recarray(max(len(rows), 4), dtype=PEAK_DTYPE)
+        self._rows[:len(rows)] = rows
+        self._count = len(rows)
+
+    @property
+    def data(self):
+        """Record array of the peaks (a view, changes go into the table).
+        """
+        return self._rows[:self._count]
+
+    def __getattr__(self, name):
+        if name in PEAK_DTYPE.names:
+            return self.data[name]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PeakTable.fromArray(self.data[index])
+        return self.data[index]
+
+    def __delitem__(self, index):
+        keep = np.ones(self._count, dtype=bool)
+        keep[index] = False
+        self._setData(self.data[keep])
+
+    def __getstate__(self):
+        return {'peaks': self.toPeaks()}
+
+    def __setstate__(self, state):
+        self.__init__(state['peaks'])
+
+    @classmethod
+    def fromArray(cls, data):
+        """Makes a table from a record array with the PEAK_DTYPE fields.
+        """
+        table = cls()
+        table._setData(data)
+        return table
+
+    def _setData(self, data):
+        self._rows = np.array(data, dtype=PEAK_DTYPE).view(np.recarray)
+        self._count = len(data)
+
+    def append(self, peak):
+        """Adds a peak (Peak object or a row of another table) at the end.
+        """
+        if self._count == len(self._rows):      # double space as needed
+            rows = np.recarray(2 * len(self._rows), dtype=PEAK_DTYPE)
+            rows[:self._count] = self.data
+            self._rows = rows
+        self._rows[self._count] = tuple(getattr(peak, name)
+                                        for name in PEAK_DTYPE.names)
+        self._count += 1
+
+    def toPeaks(self):
+        """Returns the peaks as a list of Peak objects.
+        """
+        return [Peak(*row) for row in self.data.tolist()]
+
+    def normalize(self):
+        """Sets relativePeakArea of all peaks to percent of the total peak
+        area. Returns an error message ("" if there was no problem), in
+        which case the relative areas are not changed.
+        """
+        if self._count == 0:
+            return ""
+        totalPeakArea = np.sum(self.peakArea)
+        if totalPeakArea == 0 or not np.isfinite(totalPeakArea):
+            return "There was an error in normalizing the peaks: \n\n" + \
+                "total peak area is " + str(totalPeakArea)
+        self.data.relativePeakArea = 100 * self.peakArea / totalPeakArea
+        return ""
+
+    def sort(self, field='peakStart'):
+        """Sorts the peaks by the given field (stable sort).
+        """
+        self._setData(self.data[np.argsort(self.data[field],
+                                           kind='stable')])
+
+    def retentionTimes(self, timePoints):
+        """Returns array of the times of the peak maxima.
+        """
+        return np.asarray(timePoints)[self.peakMax]
+
+    def inTimeRange(self, timePoints, startTime, endTime):
+        """Returns a new table with the peaks whose maximum is between
+        startTime and endTime (inclusive).
+        """
+        retTimes = self.retentionTimes(timePoints)
+        return PeakTable.fromArray(self.data[(retTimes >= startTime) &
+                                             (retTimes <= endTime)])
+
+    def findContaining(self, index):
+        """Returns the position in the table of the first peak that
+        contains the trace point index, or None.
+        """
+        inPeak = np.flatnonzero((self.peakStart <= index) &
+                                (self.peakEnd >= index))
+        if len(inPeak) == 0:
+            return None
+        return int(inPeak[0])
+
+    def toText(self, timePoints, delimiter=",", precision=3):
+        """Returns the table as text, one line per peak with retention
+        time, area and relative area.
+        """
+        if self._count == 0:
+            return ""
+        columns = np.column_stack((self.retentionTimes(timePoints),
+                                   self.peakArea, self.relativePeakArea))
+        text = io.StringIO()
+        np.savetxt(text, columns, fmt="%." + str(precision) + "f",
+                   delimiter=delimiter)
+        return text.getvalue()
+
+
+class AnalysisWarning():
+    """A problem found while analysing a trace, returned to the caller
+    (title and message, as for a message box) rather than shown, so the
+    analysis can run without a display.
+    """
+    __slots__ = ('title', 'message')
+
+    def __init__(self, title, message):
+        self.title = title
+        self.message = message
+
+    def __repr__(self):
+        return "AnalysisWarning(%r, %r)" % (self.title, self.message)
+
+    def __str__(self):
+        return self.title + ": " + self.message
+
+
+class StreamingPeakFinder():
+    """Class to find peaks while the data is still being acquired.
+
+    Points are given one at a time to addPoint (from readwriteGC as they are
+    read from the Arduino). The same algorithm as findStart/findEnd of
+    GasChromatogram is run on each point as soon as the gradients it needs
+    are known (two points later), so a peak is closed (and returned by
+    addPoint) shortly after its end has been read. finish() is called after
+    the last point to close the final peak.
+
+    Only a few recent points, the last inBaseCt baseline values and running
+    sums for the current peak (area, peak maximum) are kept, so the cost per
+    point does not depend on the length of the run.
+
+    Peaks are provisional: relativePeakArea is only set when the peaks are
+    handed to a GasChromatogram (usePeakFinder) at the end of the run. Both
+    kinds of area are kept for every peak, and finish() sets peakArea from
+    areaChoice (if None, the areaChoice setting when the run finishes, as it
+    can be changed in the window during the run).
+    """
+
+    def __init__(self, thresh, gradThresh, inBaseCt=None, areaChoice=None):
+        self.thresh = thresh
+        self.gradThresh = gradThresh
+        if inBaseCt is None:
+            inBaseCt = setting('inBaseCt')
+        self.inBaseCt = inBaseCt
+        self.areaChoice = areaChoice
+        self.peakAreas = []         # {areaChoice: area} of each peak
+
+        self.recent = deque(maxlen=inBaseCt + 3)    # [time, y, gradient]
+        self.count = 0              # number of points added
+        self.nextIndex = 0          # next point to be processed
+        self.baselinePts = deque(maxlen=inBaseCt)
+        self.currBase = None
+        self.inPeak = False
+        self.peaks = []
+
+    def addPoint(self, timeVal, yVal):
+        """Adds a point to the trace. Returns list of peaks that have been
+        closed by this point (usually empty).
+        """
+        recent = self.recent
+        recent.append([timeVal, yVal, None])
+        self.count += 1
+        if self.count == 2:             # gradient as in np.gradient
+            recent[-2][2] = yVal - recent[-2][1]
+        elif self.count > 2:
+            recent[-2][2] = (yVal - recent[-3][1])/2
+
+        if self.currBase is None:
+            if self.count < self.inBaseCt:
+                return []
+            self.currBase = (sum(rec[1] for rec in
+                                 list(recent)[0:self.inBaseCt-1]) /
+                             self.inBaseCt)     # 1st 15 pts init baseline
+            self.baselinePts.append(recent[0][1])
+
+        newPeaks = []
+        while self.nextIndex + 2 < self.count:
+            newPeaks += self._process(self.nextIndex)
+            self.nextIndex += 1
+        return newPeaks
+
+    def finish(self):
+        """Called at end of run. Processes the last points and closes the
+        final peak at the last data point if no peak end was found. Returns
+        list of peaks closed.
+        """
+        if self.count <= self.inBaseCt:    # Data set has less than 15 pts.
+            self.peaks = []
+            return []
+        self.recent[-1][2] = self.recent[-1][1] - self.recent[-2][1]
+        newPeaks = []
+        while self.nextIndex < self.count - 1:
+            newPeaks += self._process(self.nextIndex)
+            self.nextIndex += 1
+        if self.inPeak:
+            newPeaks.append(self._makePeak(self.count - 1))
+        areaChoice = self._areaChoice()
+        for peak, areas in zip(self.peaks, self.peakAreas):
+            peak.peakArea = 100 * areas.get(areaChoice, 0)
+        return newPeaks
+
+    def _areaChoice(self):
+        if self.areaChoice is None:
+            return setting('areaChoice')
+        return self.areaChoice
+
+    def _point(self, index):
+        """Returns [time, y, gradient] of a recent point.
+        """
+        return self.recent[index - self.count + len(self.recent)]
+
+    def _process(self, index):
+        if self.inPeak:
+            return self._peakStep(index)
+        return self._searchStep(index)
+
+    def _searchStep(self, index):
+        """One step of findStart.
+        """
+        t0, y0, g0 = self._point(index)
+        t1, y1, g1 = self._point(index + 1)
+        if (g0 > self.gradThresh) and (g1 > self.gradThresh) and \
+                (y1 > (self.thresh + self.currBase)):
+            pkStart = max(index - 1, 0)
+            self._openPeak(pkStart)
+            newPeaks = self._peakStep(pkStart)
+            if pkStart != index:
+                newPeaks += self._process(index)
+            return newPeaks
+        if y0 < (2 * self.thresh + self.currBase):
+            self.baselinePts.append(y0)
+        self.currBase = sum(self.baselinePts)/len(self.baselinePts)
+        return []
+
+    def _openPeak(self, pkStart):
+        self.inPeak = True
+        self.pkStart = pkStart
+        self.pkBase = self.currBase
+        self.downslope = False
+        self.tStart = self._point(pkStart)[0]
+        self.sumY = 0
+        self.nPts = 0
+        self.trapSum = 0
+        self.lastPt = None
+        self.pkMax = 0
+        self.pkMaxPoint = 0
+        self.multiple = 1
+
+    def _peakStep(self, index):
+        """One step of findEnd, adds point to running sums of the peak if
+        it is not the peak end.
+        """
+        t0, y0, g0 = self._point(index)
+        if (not self.downslope) and (g0 < 0):
+            self.downslope = True
+        elif self.downslope and (abs(g0) < self.gradThresh/5) and \
+                (y0 < (self.pkBase + self.thresh)):
+            return self._closePeak(index, False)     # Found peak end
+        elif self.downslope and (g0 > 0) and (self._point(index + 1)[2] > 0):
+            return self._closePeak(index, True)      # Found peak valley
+
+        self.sumY += y0
+        self.nPts += 1
+        if self.lastPt is not None:
+            self.trapSum += (y0 + self.lastPt[1]) * (t0 - self.lastPt[0]) / 2
+        self.lastPt = (t0, y0)
+        if y0 == self.pkMax:
+            self.multiple += 1
+            self.pkMaxPoint += index
+        elif y0 > self.pkMax:
+            self.pkMaxPoint = index
+            self.pkMax = y0
+            self.multiple = 1
+        return []
+
+    def _makePeak(self, pkEnd):
+        """Builds Peak from the running sums, in the same way as findPeakMax
+        and findPeakArea.
+        """
+        areas = {"addition": 0, "trapezoidal": 0}
+        span = self._point(pkEnd)[0] - self.tStart
+        if span != 0:
+            areas["addition"] = (self.sumY - self.pkBase * self.nPts) / span
+        if self.lastPt is not None:
+            areas["trapezoidal"] = self.trapSum - \
+                self.pkBase * (self.lastPt[0] - self.tStart)
+        peak = Peak(self.pkStart, pkEnd, int(self.pkMaxPoint/self.multiple),
+                    100 * areas.get(self._areaChoice(), 0), self.pkBase, 0)
+        self.peaks.append(peak)
+        self.peakAreas.append(areas)
+        self.inPeak = False
+        return peak
+
+    def _closePeak(self, pkEnd, valley):
+        """Closes current peak. A valley starts the next peak at the same
+        point with the same baseline, otherwise search for the next peak
+        start begins at the peak end.
+        """
+        newPeaks = [self._makePeak(pkEnd)]
+        if valley:
+            self._openPeak(pkEnd)
+            newPeaks += self._peakStep(pkEnd)
+        else:
+            newPeaks += self._searchStep(pkEnd)
+        return newPeaks
+
+
+# Fields of PeakTable, same names and order as the Peak attributes
+PEAK_DTYPE = np.dtype([('peakStart', np.int64), ('peakEnd', np.int64),
+                       ('peakMax', np.int64), ('peakArea', np.float64),
+                       ('peakBaseline', np.float64),
+                       ('relativePeakArea', np.float64),
+                       ('fittedArea', np.float64)])
 
 
-def gcProcessing(newData, timeStamp, instrName):
-    """Procedure for taking initial data from experiment and processing it into
-    GasChromatogram class.  Calls individual methods within GasChromatogram
-    to do the various processing. It then adds the new instance of
-    GasChromatogram to the global list of experiments.
+def _traceArray(values):
+    """Returns values as a contiguous float array (float32 or float64
+    arrays are kept, anything else is converted to float64).
     """
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        return np.ascontiguousarray(values)
+    return np.asarray(values, dtype=float)
 
-    newGCExp = GasChromatogram(newData, timeStamp,
-                               gcaGlobals.thresh, gcaGlobals.gradThresh,
-                               gcaGlobals.comment, instrName)
-    newGCExp.findPeaks()
-    gcaGlobals.mainwind.dataList.append(newGCExp)
 
+# Size of the first block searched by findPeaksVectorized (doubles after each)
+_FIRST_BLOCK = 256
+# Number of points findPeaksVectorized steps through one at a time (as
+# findPeaks does) before using blocks, at the start of a search and after a
+# wrong baseline guess. Noisy traces have many short peaks and gaps, for
+# which array operations cost more than they save.
+_SCALAR_STEPS = 32
 
-def gcReProcessing(dataListIndex, thresh, gradThresh):
-    """Procedure for taking existing data from experiment and processing it
-    into GasChromatogram class.  Calls individual methods within
-    GasChromatogram to do the various processing. It then replaces the existing
-    instance of GasChromatogram in the global list of experiments with new one.
+
+def _firstTrue(maskFunc, start, stop):
+    """Returns the index of the first True value of maskFunc(a, b) between
+    start and stop, or None. maskFunc returns a boolean array for the points
+    a to b. Blocks of increasing size are checked so that only the points up
+    to the first True value (roughly) are evaluated.
+    """
+    blockSize = _FIRST_BLOCK
+    while start < stop:
+        end = min(start + blockSize, stop)
+        mask = maskFunc(start, end)
+        if mask.any():
+            return start + int(np.argmax(mask))
+        start = end
+        blockSize *= 2
+    return None
+
+
+def _arrayPeakMax(yPts, pkStart, pkEnd):
+    """Array version of findPeakMax. Returns index of peakMax (average index
+    if several consecutive points share the maximum value).
     """
-    reprocGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
-    gcClearPeaks(dataListIndex)
-    gcClearBaseline(dataListIndex)
-    reprocGCExp.thresh = thresh
-    reprocGCExp.gradThresh = gradThresh
-    reprocGCExp.findPeaks()
-    gcaGlobals.mainwind.dataList[dataListIndex] = reprocGCExp
+    if pkEnd - pkStart <= _SCALAR_STEPS:     # as findPeakMax
+        pkMax = 0
+        multiple = 1
+        pkMaxPoint = 0
+        for point, y in enumerate(yPts[pkStart:pkEnd].tolist(), pkStart):
+            if y == pkMax:
+                multiple += 1
+                pkMaxPoint += point
+            elif y > pkMax:
+                pkMaxPoint = point
+                pkMax = y
+                multiple = 1
+        return int(pkMaxPoint/multiple)
+    yPeak = yPts[pkStart:pkEnd]
+    top = yPeak.max()
+    if top <= 0:      # findPeakMax starts from 0 at point 0
+        maxIndex = np.flatnonzero(yPeak == 0) + pkStart
+        return int(np.sum(maxIndex)/(len(maxIndex) + 1))
+    maxIndex = np.flatnonzero(yPeak == top) + pkStart
+    return int(np.sum(maxIndex)/len(maxIndex))
+
+
+def _integralSums(timePoints, values):
+    """Returns the integration index of values over timePoints: the
+    cumulative sum (sums[i] = sum of values[:i]) and the cumulative
+    trapezoidal integral (trapSums[i] = integral from point 0 to point i).
+    """
+    sums = np.concatenate(([0.0], np.cumsum(values, dtype=float)))
+    trapSums = np.concatenate(
+        ([0.0], np.cumsum(np.add(values[1:], values[:-1], dtype=float) *
+                          np.diff(timePoints.astype(float, copy=False)) / 2)))
+    return sums, trapSums
 
 
-def gcClearPeaks(dataListIndex):
-    """Procedure for removing peaks from a given data set.
+def _indexPeakAreas(arrays, starts, ends, baseline=0.0, baselineCurve=None,
+                    method="addition"):
+    """Vectorized _sumsPeakArea for arrays of peak starts and ends (see
+    GasChromatogram.peakAreas), not scaled by 100.
+    """
+    tPts = arrays['time']
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = np.asarray(ends, dtype=np.intp)
+    baseline = np.asarray(baseline, dtype=float)
+    if baselineCurve is not None:
+        baseSums, baseTrapSums = _integralSums(
+            tPts, np.asarray(baselineCurve, dtype=float))
+    if method == "addition":
+        sums = arrays['ySums'][ends] - arrays['ySums'][starts] - \
+            baseline * (ends - starts)
+        if baselineCurve is not None:
+            sums -= baseSums[ends] - baseSums[starts]
+        return sums / np.subtract(tPts[ends], tPts[starts], dtype=float)
+    elif method == "trapezoidal":
+        lasts = np.maximum(ends - 1, starts)   # no area with < 2 points
+        sums = arrays['trapSums'][lasts] - arrays['trapSums'][starts] - \
+            baseline * np.subtract(tPts[lasts], tPts[starts], dtype=float)
+        if baselineCurve is not None:
+            sums -= baseTrapSums[lasts] - baseTrapSums[starts]
+        return sums
+    return np.zeros(np.broadcast(starts, ends).shape)
+
+
+def _sumsPeakArea(arrays, pkStart, pkEnd, currBase, method="addition"):
+    """Array version of findPeakArea, same two methods (addition and
+    trapezoidal), using the cumulative sums from traceArrays.
+    """
+    tPts = arrays['time']
+    if method == "addition":
+        ySum = arrays['ySums'][pkEnd] - arrays['ySums'][pkStart]
+        return float((ySum - currBase * (pkEnd - pkStart)) /
+                     (float(tPts[pkEnd]) - float(tPts[pkStart])))
+    elif method == "trapezoidal":
+        if pkEnd - pkStart < 2:
+            return 0.0
+        trapSum = arrays['trapSums'][pkEnd - 1] - arrays['trapSums'][pkStart]
+        return float(trapSum - currBase * (float(tPts[pkEnd - 1]) -
+                                           float(tPts[pkStart])))
+    return 0
+
+
+def _windowMeans(poolVals, poolCt, inBaseCt):
+    """Returns, for each count in poolCt, the mean of the last inBaseCt
+    values of poolVals[:count] (all of them if there are fewer). The values
+    are added one at a time, oldest first, as findStart does, so the means
+    are the same to the last bit.
+    """
+    padded = np.concatenate((np.zeros(inBaseCt), poolVals))
+    sums = padded[poolCt]
+    for offset in range(1, inBaseCt):
+        sums = sums + padded[poolCt + offset]
+    return sums / np.minimum(poolCt, inBaseCt)
+
+
+def _findStartBlock(yPts, rising, baseCalc, thresh, currBase, basePool,
+                    currIndex, inBaseCt):
+    """Block version of findStart used by _searchPeaks.
+
+    Searches blocks of increasing size starting at currIndex.  Within a
+    block, points less than 2 * thresh above the baseline are added to
+    the baseline pool and the running baseline at every point is the
+    mean of the last inBaseCt pool values.  Whether a point is a baseline
+    point depends on the baseline before it, so the test is first made
+    against a guess (the baseline at the start of the block) and then
+    checked against the running baseline that results.  Everything up to
+    the first point where the two differ is exactly what findStart gives;
+    the rest of the block is done again from that point, with the running
+    baseline as the new guess.  The first _SCALAR_STEPS points, and those
+    after each wrong guess, are stepped through one at a time instead
+    (see _findStartSteps), so that noise near the baseline does not make
+    blocks be done again and again.  basePool holds the pool values
+    carried over from earlier blocks (at most inBaseCt of them).
+
+    Returns peakStart (or None), the baseline at the peak start and the
+    updated basePool.
+    """
+    lastIndex = len(yPts) - 1
+    blockStart = currIndex
+    blockSize = _FIRST_BLOCK
+    guess = None                        # step through the first points
+
+    while blockStart < lastIndex:
+        if guess is None:
+            stepEnd = min(blockStart + _SCALAR_STEPS, lastIndex)
+            peakStart, currBase, basePool = _findStartSteps(
+                yPts, rising, baseCalc, thresh, currBase, basePool,
+                blockStart, stepEnd, inBaseCt)
+            if peakStart is not None:
+                return peakStart, currBase, basePool
+            guess = currBase
+            blockStart = stepEnd
+            continue
+        blockEnd = min(blockStart + blockSize, lastIndex)
+        yBlock = yPts[blockStart:blockEnd]
+        isBase = yBlock < (2 * thresh + guess)
+        poolVals = np.concatenate((basePool, yBlock[isBase]))
+        poolCt = len(basePool) + np.cumsum(isBase)     # pool after each pt.
+        blockBase = np.concatenate(([currBase], _windowMeans(
+            poolVals, poolCt[:-1], inBaseCt)))
+        wrong = isBase != (yBlock < (2 * thresh + blockBase))
+        checked = int(np.argmax(wrong)) if wrong.any() else len(yBlock)
+
+        found = rising[blockStart:blockEnd] & \
+            (yPts[blockStart + 1:blockEnd + 1] > (thresh + blockBase))
+        if found.any() and int(np.argmax(found)) <= checked:
+            i = int(np.argmax(found))
+            baseCalc[blockStart:blockStart + i] = blockBase[:i]
+            if i > 0:
+                basePool = poolVals[max(poolCt[i - 1] - inBaseCt, 0):
+                                    poolCt[i - 1]]
+            return max(blockStart + i - 1, 0), float(blockBase[i]), basePool
+
+        if checked == len(yBlock):
+            baseCalc[blockStart:blockEnd] = blockBase
+            basePool = poolVals[-inBaseCt:]
+            currBase = float(_windowMeans(poolVals, poolCt[-1:],
+                                          inBaseCt)[0])
+            guess = currBase
+            blockStart = blockEnd
+            blockSize *= 2
+        else:
+# keep the points before the first wrong test, step through the next ones
+            baseCalc[blockStart:blockStart + checked] = blockBase[:checked]
+            basePool = poolVals[max(poolCt[checked - 1] - inBaseCt, 0):
+                                poolCt[checked - 1]]
+            currBase = float(blockBase[checked])
+            guess = None
+            blockStart += checked
+    return None, currBase, basePool
+
+
+def _findStartSteps(yPts, rising, baseCalc, thresh, currBase, basePool,
+                    start, stop, inBaseCt):
+    """Point by point findStart (the same tests and sums) from start up to
+    stop, used by _findStartBlock for a few points. Returns peakStart (or
+    None), the baseline at the peak start (or at stop) and the updated
+    basePool.
+    """
+    yList = yPts[start:stop + 1].tolist()
+    pool = basePool.tolist()
+    bases = []
+    for i, isRising in enumerate(rising[start:stop].tolist()):
+        if isRising and yList[i + 1] > (thresh + currBase):
+            baseCalc[start:start + i] = bases
+            return max(start + i - 1, 0), currBase, np.array(pool)
+        if yList[i] < (2 * thresh + currBase):
+            pool.append(yList[i])
+            del pool[:-inBaseCt]
+        bases.append(currBase)
+        currBase = 0.0
+        for value in pool:
+            currBase += value
+        currBase = currBase/len(pool)
+    baseCalc[start:stop] = bases
+    return None, currBase, np.array(pool)
+
+
+def _findEndBlock(yPts, falling, flat, valleys, thresh, currBase, pkStart):
+    """Block version of findEnd used by _searchPeaks.
+
+    The downslope starts at the first negative gradient after pkStart.
+    After that, the first point that is flat (gradient < gradThresh/5)
+    and less than thresh above currBase is the peak end; if two rising
+    gradients come first, that point is a valley.
+
+    The first _SCALAR_STEPS points are stepped through one at a time, as
+    most peaks of a noisy trace end within a few points.
+
+    Returns peakEnd (or None) and valley.
     """
-    clearPeakGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
-    clearPeakGCExp.peaks = []
-    gcaGlobals.mainwind.dataList[dataListIndex] = clearPeakGCExp
+    lastIndex = len(yPts) - 1
+    stepEnd = min(pkStart + _SCALAR_STEPS, lastIndex)
+    downslope = None
+    for i, (isFalling, isFlat, isValley, y) in enumerate(zip(
+            falling[pkStart:stepEnd].tolist(), flat[pkStart:stepEnd].tolist(),
+            valleys[pkStart:stepEnd].tolist(),
+            yPts[pkStart:stepEnd].tolist()), pkStart):
+        if downslope is None:
+            if isFalling:
+                downslope = i
+        elif isFlat and y < (currBase + thresh):
+            return i, False
+        elif isValley:
+            return i, True
+    if downslope is None:
+        downslope = _firstTrue(lambda a, b: falling[a:b], stepEnd, lastIndex)
+        if downslope is None:
+            return None, False
+        searchStart = downslope + 1
+    else:
+        searchStart = stepEnd
+
+    def endOrValley(a, b):
+        return (flat[a:b] & (yPts[a:b] < (currBase + thresh))) | \
+            valleys[a:b]
+
+    pkEnd = _firstTrue(endOrValley, searchStart, lastIndex)
+    if pkEnd is None:
+        return None, False
+    isEnd = flat[pkEnd] and (yPts[pkEnd] < (currBase + thresh))
+    return pkEnd, not isEnd
+
+
+def _baselineSegments(x, y):
+    """Splits the baseline points into the runs of points between peaks
+    (a gap in time of more than 1.5 times the usual spacing ends a run).
+    Returns the mean time and mean value of each run.
+    """
+    steps = np.diff(x)
+    if len(steps) == 0:
+        return x, y
+    breaks = np.flatnonzero(steps > 1.5 * np.median(steps)) + 1
+    starts = np.concatenate(([0], breaks))
+    counts = np.diff(np.concatenate((starts, [len(x)])))
+    return (np.add.reduceat(x, starts) / counts,
+            np.add.reduceat(y, starts) / counts)
+
+
+def polynomialBaseline(x, y, timePoints, order=5, **options):
+    """Least squares polynomial of the given order through the baseline
+    points.
+    """
+    return np.polyval(np.polyfit(x, y, order), timePoints)
+
 
+def fifthOrderBaseline(x, y, timePoints, **options):
+    """The original baseline, a fifth order polynomial."""
+    return polynomialBaseline(x, y, timePoints, 5)
 
-def gcClearBaseline(dataListIndex):
-    """Procedure for removing baseline information from a data set.
+
+def linearBaseline(x, y, timePoints, **options):
+    """Straight lines joining the baseline segments between peaks (each
+    segment is represented by its mean), flat before the first and after
+    the last segment.
+    """
+    segX, segY = _baselineSegments(x, y)
+    return np.interp(timePoints, segX, segY)
+
+
+def splineBaseline(x, y, timePoints, **options):
+    """Natural cubic spline through the baseline segments between peaks
+    (each segment is represented by its mean), flat before the first and
+    after the last segment. Falls back to linear with fewer than 3 segments.
+    """
+    segX, segY = _baselineSegments(x, y)
+    n = len(segX)
+    if n < 3:
+        return np.interp(timePoints, segX, segY)
+    h = np.diff(segX)
+    slopes = np.diff(segY) / h
+# Solve the tridiagonal system for the second derivatives at inner knots
+    diag = 2 * (h[:-1] + h[1:])
+    rhs = 6 * np.diff(slopes)
+    off = h[1:-1].copy()
+    for i in range(1, n - 2):           # Thomas algorithm, forward sweep
+        w = off[i - 1] / diag[i - 1]
+        diag[i] -= w * off[i - 1]
+        rhs[i] -= w * rhs[i - 1]
+    m = np.zeros(n)
+    m[n - 2] = rhs[-1] / diag[-1]
+    for i in range(n - 4, -1, -1):      # back substitution
+        m[i + 1] = (rhs[i] - off[i] * m[i + 2]) / diag[i]
+
+    t = np.clip(timePoints, segX[0], segX[-1])
+    k = np.clip(np.searchsorted(segX, t) - 1, 0, n - 2)
+    a = segX[k + 1] - t
+    b = t - segX[k]
+    hk = h[k]
+    return ((m[k] * a**3 + m[k + 1] * b**3) / (6 * hk) +
+            (segY[k] / hk - m[k] * hk / 6) * a +
+            (segY[k + 1] / hk - m[k + 1] * hk / 6) * b)
+
+
+# Available baseline models, chosen with baselineModel in GasChromino.cfg.
+# Each is called as model(baselineTimes, baseline, timePoints, **options)
+# with numpy arrays, and returns the baseline at every timepoint as an array.
+baselineModels = {"5th": fifthOrderBaseline,
+                  "polynomial": polynomialBaseline,
+                  "linear": linearBaseline,
+                  "spline": splineBaseline}
+
+
+# Available peak finding routines, chosen with peakEngine in GasChromino.cfg
+peakEngines = {"loop": GasChromatogram.findPeaks,
+               "vectorized": GasChromatogram.findPeaksVectorized}
+
+
+def runPeakEngine(gcExp, engine=None, **options):
+    """Runs the automatic peak finding routine named by engine (default is
+    the peakEngine setting) on gcExp. options (areaChoice, inBaseCt) are
+    passed on to the routine. Returns its list of AnalysisWarning.
+    """
+    if engine is None:
+        engine = setting('peakEngine')
+    return peakEngines[engine](gcExp, **options)
+
+
+# Settings used when gcaglobals has not been loaded (no GUI), or when the
+# GasChromino.cfg in use is older than the setting
+analysisDefaults = {'inBaseCt': 15,
+                    'areaChoice': "trapezoidal",
+                    'peakEngine': "vectorized",
+                    'traceDtype': "float64",
+                    'baselineModel': "5th",
+                    'baselineOrder': 5,
+                    'fitModel': "none",
+                    'collectStats': False,
+                    'thresh': 0.001,
+                    'gradThresh': 0.0005,
+                    'memmapTraces': False,
+                    'loadWorkers': 2,
+                    'reprocessOnOpen': False,
+                    'gcardVersion': 2,
+                    'compressTraces': "",
+                    'exportDelimiter': " ",
+                    'exportPrecision': 6,
+                    'exportPerRun': False,
+                    'exportPeaks': False,
+                    'useCatalog': True,
+                    'catalogFile': "",
+                    'useJournal': True,
+                    'journalDir': "",
+                    'journalBlockPoints': 64,
+                    'journalSyncSeconds': 5.0}
+
+
+def setting(name):
+    """Returns the value of an analysis setting. If gcaglobals has already
+    been imported (by the GUI, which reads GasChromino.cfg), its value is
+    used so that changes made in the window take effect. Otherwise the
+    value comes from analysisDefaults. gcaglobals is never imported from
+    here, since importing it reads the config file and looks for ports.
     """
-    clearBaseGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
-    clearBaseGCExp.baselineIndex = []
-    clearBaseGCExp.baseline = []
-    clearBaseGCExp.baselineCalc = []
-    gcaGlobals.mainwind.dataList[dataListIndex] = clearBaseGCExp
+    gcaGlobals = sys.modules.get('gcaglobals')
+    return getattr(gcaGlobals, name, analysisDefaults[name])
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Module for reprocessing many GC traces at once without the tk interface.
+
+reprocessBatch takes a list of GasChromatogram objects and/or paths to
+.gcard files and one or more processing settings, and finds the peaks for
+every trace with every setting. The work is spread over a pool of processes
+(one trace or file per task), and the peak tables are returned in the same
+order as the traces were given.
+
+A processing setting is a tuple (thresh, gradThresh) or
+(thresh, gradThresh, areaChoice). If areaChoice is not given, the
+areaChoice setting is used.
+
+Only the analysis core (gaschromatogram.py) is imported, not the GUI
+globals, so worker processes start quickly and need no display.
+
+A peak table is a list with one tuple per peak:
+    (retention time, area, relative area, peakStart, peakEnd)
+
+It can also be run from the command line on directories (and/or files) of
+.gcard and text traces (two columns, time and intensity), writing one
+consolidated csv peak report:
+
+    python gcabatch.py "Example Data Sets" -t 0.001 -g 0.0005 -o report.csv
+
+Use -h for all of the options.
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import csv
+import glob
+import os
+import sys
+import gaschromatogram as gc
+import gcaformat
+import gcaimport
+
+
+# File types read by loadGCExps (anything else is taken as a text trace)
+traceExtensions = (".gcard", ".gcarc", ".csv", ".txt", ".dat")
+
+
+def loadGCExps(filename):
+    """Returns the list of GasChromatogram objects held in a .gcard file or
+    .gcarc archive, or a list with one GasChromatogram made from a text trace
+    (see loadTextTrace).
+    """
+    if os.path.splitext(filename)[1].lower() not in (".gcard", ".gcarc"):
+        return [loadTextTrace(filename)]
+    return gcaformat.readGCard(filename)
+
+
+def loadTextTrace(filename):
+    """Makes a GasChromatogram from a text file with time and intensity in
+    the first two columns (delimiter and header lines are found by
+    gcaimport.sniffFormat). Thresholds are the thresh and gradThresh
+    settings until processing sets them.
+    """
+    return gcaimport.importTrace(filename)
+
+
+def findTraceFiles(paths, pattern=None):
+    """Returns the sorted list of trace files in the given directories
+    (files with one of the traceExtensions, or matching the glob pattern
+    if one is given). Paths that are files are included as they are.
+    """
+    filenames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filenames.append(path)
+            continue
+        if pattern is not None:
+            found = glob.glob(os.path.join(path, pattern))
+        else:
+            found = [os.path.join(path, name) for name in os.listdir(path)
+                     if os.path.splitext(name)[1].lower() in traceExtensions]
+        filenames += sorted(name for name in found if os.path.isfile(name))
+    return filenames
+
+
+def peakTable(gcExp):
+    """Returns the peak table (see module docstring) for a processed
+    GasChromatogram.
+    """
+    peaks = gcExp.peaks
+    return list(zip(peaks.retentionTimes(gcExp.trace[0]).tolist(),
+                    peaks.peakArea.tolist(), peaks.relativePeakArea.tolist(),
+                    peaks.peakStart.tolist(), peaks.peakEnd.tolist()))
+
+
+def processGCExp(gcExp, settings, engine=None, areaChoice=None):
+    """Finds peaks in one GasChromatogram for each of the processing
+    settings. Returns a list of peak tables, one for each setting. The
+    GasChromatogram is left processed with the last setting (its cached
+    arrays are released, so that a file of many runs does not keep them
+    all).
+    """
+    tables = []
+    for setting in settings:
+        thresh, gradThresh = setting[0], setting[1]
+        settingArea = setting[2] if len(setting) > 2 else areaChoice
+        gcExp.peaks = []
+        gcExp.baselineIndex = []
+        gcExp.baseline = []
+        gcExp.baselineCalc = []
+        gcExp.thresh = thresh
+        gcExp.gradThresh = gradThresh
+        gc.runPeakEngine(gcExp, engine, areaChoice=settingArea)
+        tables.append(peakTable(gcExp))
+    gcExp.releaseCache()
+    return tables
+
+
+def _sourceGCExps(source):
+    """Returns the GasChromatogram objects of a source (filename or
+    GasChromatogram) to be processed.
+    """
+    if isinstance(source, str):
+        return loadGCExps(source)
+    return [copy.copy(source)]          # peaks etc. are replaced, not changed
+
+
+def _sourceName(source):
+    if isinstance(source, str):
+        return source
+    return source.filename or source.tabTitle or ""
+
+
+def _reportError(source, error):
+    """Writes why a source could not be processed to standard error (the
+    other sources are still processed).
+    """
+    sys.stderr.write("Skipped " + _sourceName(source) + ": " +
+                     type(error).__name__ + ": " + str(error) + "\n")
+
+
+def _processSource(job):
+    """Task run in the process pool. job is (source, settings, engine,
+    areaChoice) where source is a GasChromatogram or a .gcard filename.
+    Returns a list (one entry per GasChromatogram in the source) of lists of
+    peak tables (one per setting); an empty list if the source could not be
+    read or processed (the error is written to standard error).
+    """
+    source, settings, engine, areaChoice = job
+    try:
+        return [processGCExp(gcExp, settings, engine, areaChoice)
+                for gcExp in _sourceGCExps(source)]
+    except Exception as error:
+        _reportError(source, error)
+        return []
+
+
+def _reportSource(job):
+    """Task run in the process pool for batchReport. Same job as
+    _processSource; returns the report rows for the source (none if it
+    could not be read or processed).
+    """
+    source, settings, engine, areaChoice = job
+    sourceName = _sourceName(source)
+    rows = []
+    try:
+        for runIndex, gcExp in enumerate(_sourceGCExps(source)):
+            tables = processGCExp(gcExp, settings, engine, areaChoice)
+            for setting, table in zip(settings, tables):
+                for peakIndex, peak in enumerate(table):
+                    rows.append((sourceName, runIndex, gcExp.instrName,
+                                 gcExp.timeStamp, gcExp.comment,
+                                 setting[0], setting[1],
+                                 peakIndex + 1) + peak)
+    except Exception as error:
+        _reportError(source, error)
+        return []
+    return rows
+
+
+def _runJobs(task, sources, settings, engine, processes):
+    """Runs task on every source (see reprocessBatch) and returns the
+    results in order.
+    """
+    if len(settings) > 0 and not isinstance(settings[0], (list, tuple)):
+        settings = [settings]
+    settings = [tuple(setting) for setting in settings]
+    if engine is None:
+        engine = gc.setting('peakEngine')
+    jobs = [(source, settings, engine, gc.setting('areaChoice'))
+            for source in sources]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+    if processes <= 1:
+        return [task(job) for job in jobs]
+    chunksize = max(1, len(jobs) // (4 * processes))    # fewer round trips
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(task, jobs, chunksize=chunksize))
+
+
+def reprocessBatch(sources, settings, engine=None, processes=None):
+    """Reprocesses a list of sources (GasChromatogram objects or .gcard
+    filenames) with a list of settings (see module docstring; a single
+    setting tuple is also accepted).
+
+    Returns a list with one entry per source, in the order given. Each
+    entry is a list with one entry per GasChromatogram in the source (a
+    .gcard file may hold several), and each of those is a list of peak
+    tables, one per setting. A source that cannot be read or processed
+    gives an empty list, and the error is written to standard error.
+
+    processes is the number of worker processes (default: number of cpus).
+    With processes=1 everything is done in the calling process. The
+    GasChromatogram objects passed in are not changed.
+    """
+    return _runJobs(_processSource, sources, settings, engine, processes)
+
+
+# Columns of the rows returned by batchReport
+reportColumns = ("file", "run", "instrument", "timestamp", "comment",
+                 "thresh", "gradThresh", "peak", "retention time", "area",
+                 "relative area", "peakStart", "peakEnd")
+
+
+def batchReport(sources, settings, engine=None, processes=None):
+    """Processes the sources like reprocessBatch, but returns one flat list
+    of rows (columns in reportColumns), one row per peak, for all sources,
+    runs and settings.
+    """
+    rows = []
+    for sourceRows in _runJobs(_reportSource, sources, settings, engine,
+                               processes):
+        rows += sourceRows
+    return rows
+
+
+def writeReport(rows, outf, delimiter=","):
+    """Writes the rows from batchReport, with a header line, to the open
+    text file outf.
+    """
+    writer = csv.writer(outf, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(reportColumns)
+    writer.writerows(rows)
+
+
+def main(argv=None):
+    """Command line entry point (see module docstring).
+    """
+    parser = argparse.ArgumentParser(
+        description="Find peaks in many GC traces and write one peak report.")
+    parser.add_argument("paths", nargs="+",
+                        help="directories and/or files of traces")
+    parser.add_argument("-t", "--thresh", type=float, default=0.001,
+                        help="peak height threshold (default 0.001)")
+    parser.add_argument("-g", "--grad-thresh", type=float, default=0.0005,
+                        help="gradient threshold (default 0.0005)")
+    parser.add_argument("-a", "--area", choices=["addition", "trapezoidal"],
+                        default=gc.setting('areaChoice'),
+                        help="peak area method")
+    parser.add_argument("-e", "--engine", choices=sorted(gc.peakEngines),
+                        default=None, help="peak finding routine "
+                        "(default: the peakEngine setting)")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="number of worker processes (default: cpus)")
+    parser.add_argument("--pattern", default=None,
+                        help="glob pattern for files in the directories")
+    parser.add_argument("-d", "--delimiter", default=",",
+                        help="delimiter of the report (default ,)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="report file (default: standard output)")
+    args = parser.parse_args(argv)
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if len(missing) > 0:
+        parser.error("not found: " + ", ".join(missing))
+    filenames = findTraceFiles(args.paths, args.pattern)
+    if len(filenames) == 0:
+        parser.error("no trace files found")
+    rows = batchReport(filenames, [(args.thresh, args.grad_thresh,
+                                    args.area)],
+                       args.engine, args.processes)
+    if args.output is None:
+        writeReport(rows, sys.stdout, args.delimiter)
+    else:
+        with open(args.output, 'w', newline="") as outf:
+            writeReport(rows, outf, args.delimiter)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the analysis in gaschromatogram.py
+
+Times each stage of the processing (trace arrays, the two peak finding
+routines, peak areas, normalization, baselines, manual peaks, peak fitting)
+on the Example Data Sets and on synthetic traces (gcasynth) of 1e3 to 1e7
+points with different numbers of peaks. For each trace and stage it reports
+the time (best of a few repeats), the throughput in points per second and
+the peak memory allocated during the stage (from tracemalloc, in a separate
+run so the timing is not slowed down).
+
+Results can be saved as JSON and later runs compared with them, so that
+speedups can be shown and slowdowns are noticed:
+
+    python gcabench.py --save bench.json
+    python gcabench.py --compare bench.json
+
+Stages that loop over every point in python (findPeaks, findPeakArea) are
+skipped above --loop-limit points (default 1e6).
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import gaschromatogram as gc
+import gcaformat
+import gcasynth
+
+# Directory with the .gcard example files, relative to this file
+exampleDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "Example Data Sets")
+
+
+def loadTraces(sizes, peakCounts, seed=0):
+    """Returns list of (name, GasChromatogram) for the example data and the
+    synthetic traces.
+    """
+    traces = []
+    for filename in sorted(glob.glob(os.path.join(exampleDir, "*.gcard"))):
+        for gcExp in gcaformat.readGCard(filename, lazy=False):
+            traces.append((os.path.basename(filename), gcExp))
+    for nPts in sizes:
+        for nPeaks in peakCounts:
+            trace, truePeaks = gcasynth.syntheticTrace(nPts, nPeaks, seed)
+            gcExp = gc.GasChromatogram(trace, "", 0.001, 0.0005)
+# syntheticTrace makes at most nPts // 100 peaks, so counts above that
+# give the same trace again
+            name = "synthetic %d pts %d peaks" % (nPts,
+                                                  len(truePeaks['centre']))
+            if name not in [traceName for traceName, other in traces]:
+                traces.append((name, gcExp))
+    return traces
+
+
+def _clear(gcExp):
+    gcExp.invalidateCache()
+    gcExp.peaks = []
+    gcExp.baselineIndex = []
+    gcExp.baseline = []
+    gcExp.baselineCalc = []
+
+
+def _withPeaks(gcExp):
+    """Finds the peaks with the vectorized routine (not timed) and returns
+    the warm GasChromatogram.
+    """
+    _clear(gcExp)
+    gcExp.findPeaksVectorized()
+    return gcExp
+
+
+def _baselinePoints(gcExp):
+    _withPeaks(gcExp)
+    index = np.asarray(gcExp.baselineIndex)
+    timePoints, yPoints = gcExp.trace
+    return yPoints[index], timePoints[index], timePoints
+
+
+def _peakAreaLoop(gcExp, state):
+    timePoints, yPoints = state
+    peaks = gcExp.peaks
+    for start, end, base in zip(peaks.peakStart.tolist(),
+                                peaks.peakEnd.tolist(),
+                                peaks.peakBaseline.tolist()):
+        gcExp.findPeakArea(yPoints, timePoints, start, end, base,
+                           "trapezoidal")
+
+
+def _manualPeakList(gcExp):
+    _withPeaks(gcExp)
+    manualPeakList = np.column_stack((gcExp.peaks.peakStart,
+                                      gcExp.peaks.peakEnd)).ravel().tolist()
+    _clear(gcExp)
+    return manualPeakList
+
+
+# Benchmark stages: (name, prepare(gcExp) -> state, run(gcExp, state),
+# loops over every point in python). prepare is not timed.
+stages = [
+    ("traceArrays", lambda g: _clear(g), lambda g, s: g.traceArrays(),
+     False),
+    ("findPeaks", lambda g: _clear(g), lambda g, s: g.findPeaks(), True),
+    ("findPeaksVectorized", lambda g: _clear(g),
+     lambda g, s: g.findPeaksVectorized(), False),
+    ("findPeakArea", lambda g: _withPeaks(g).traceLists(), _peakAreaLoop,
+     True),
+    ("peakAreas", lambda g: _withPeaks(g),
+     lambda g, s: g.peakAreas(g.peaks.peakStart, g.peaks.peakEnd,
+                              g.peaks.peakBaseline), False),
+    ("findNormalizedArea", lambda g: _withPeaks(g),
+     lambda g, s: g.findNormalizedArea(), False),
+] + [
+    ("calculateBaseline " + model, _baselinePoints,
+     (lambda model: lambda g, s: g.calculateBaseline(*s, func=model))(model),
+     False) for model in gc.baselineModels
+] + [
+    ("manualPeaks", _manualPeakList, lambda g, s: g.manualPeaks(s), False),
+    ("fitPeaks", lambda g: _withPeaks(g), lambda g, s: g.fitPeaks("gaussian"),
+     False),
+]
+
+
+def timeStage(gcExp, prepare, run, repeat=3):
+    """Returns (best time in seconds, peak memory in bytes) of run."""
+    best = float('inf')
+    for i in range(repeat):
+        state = prepare(gcExp)
+        start = time.perf_counter()
+        run(gcExp, state)
+        best = min(best, time.perf_counter() - start)
+    state = prepare(gcExp)
+    tracemalloc.start()
+    run(gcExp, state)
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peakMemory
+
+
+def runBenchmarks(traces, stageNames=None, loopLimit=10**6, repeat=3,
+                  out=sys.stdout):
+    """Runs the stages on every trace, printing a line per result to out
+    (if not None). Returns the list of results (dictionaries).
+    """
+    results = []
+    for name, gcExp in traces:
+        nPts = len(gcExp.trace[1])
+        for stageName, prepare, run, pointLoop in stages:
+            if stageNames is not None and stageName not in stageNames:
+                continue
+            if pointLoop and nPts > loopLimit:
+                continue
+            seconds, peakMemory = timeStage(gcExp, prepare, run, repeat)
+            result = {'trace': name, 'points': nPts,
+                      'peaks': len(gcExp.peaks), 'stage': stageName,
+                      'seconds': seconds,
+                      'pointsPerSecond': nPts / seconds if seconds else None,
+                      'peakMemory': peakMemory}
+            results.append(result)
+            if out is not None:
+                out.write(formatResult(result) + "\n")
+                out.flush()
+        _clear(gcExp)
+    return results
+
+
+def formatResult(result):
+    return "%-34s %-28s %10.6f s %12.3g pts/s %10.1f MB" % (
+        result['trace'], result['stage'], result['seconds'],
+        result['pointsPerSecond'] or 0, result['peakMemory'] / 1e6)
+
+
+def saveResults(results, filename):
+    """Saves results (with the versions and machine used) as JSON."""
+    info = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'results': results}
+    with open(filename, 'w') as outf:
+        json.dump(info, outf, indent=1)
+
+
+def compareResults(results, filename, tolerance=1.5, out=sys.stdout):
+    """Compares results with those saved in filename. Prints the ratio of
+    new time to old time for every trace and stage in both, marking those
+    slower than tolerance times the old one. Returns the list of
+    (trace, stage, ratio) of the slower ones.
+    """
+    with open(filename, 'r') as inputf:
+        old = {(r['trace'], r['stage']): r
+               for r in json.load(inputf)['results']}
+    slower = []
+    for result in results:
+        key = (result['trace'], result['stage'])
+        if key not in old or not old[key]['seconds']:
+            continue
+        ratio = result['seconds'] / old[key]['seconds']
+        flag = ""
+        if ratio > tolerance:
+            slower.append(key + (ratio,))
+            flag = "  SLOWER"
+        out.write("%-34s %-28s %6.2fx%s\n" % (key + (ratio, flag)))
+    return slower
+
+
+def main(argv=None):
+    """Command line entry point (see module docstring)."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the GC analysis stages.")
+    parser.add_argument("--sizes", type=float, nargs="+",
+                        default=[1e3, 1e4, 1e5, 1e6, 1e7],
+                        help="numbers of points of the synthetic traces")
+    parser.add_argument("--peaks", type=int, nargs="+", default=[10, 1000],
+                        help="numbers of peaks of the synthetic traces")
+    parser.add_argument("--stages", nargs="+", default=None,
+                        help="only run these stages")
+    parser.add_argument("--loop-limit", type=float, default=1e6,
+                        help="largest trace for the point by point stages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None,
+                        help="save results as JSON to this file")
+    parser.add_argument("--compare", default=None,
+                        help="compare with results saved in this file")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="ratio to old time counted as slower")
+    args = parser.parse_args(argv)
+
+    traces = loadTraces([int(size) for size in args.sizes], args.peaks,
+                        args.seed)
+    results = runBenchmarks(traces, args.stages, int(args.loop_limit),
+                            args.repeat)
+    if args.save is not None:
+        saveResults(results, args.save)
+    if args.compare is not None:
+        if len(compareResults(results, args.compare, args.tolerance)) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Module keeping a catalog of saved runs in an SQLite database, so runs can
+be found without opening the files.
+
+For every run in every .gcard file and .gcarc archive indexed, the catalog
+holds the file path (and the run's place in the file), time stamp,
+instrument, comment, thresholds, number of points and the peak table
+(retention time, area, relative area, fitted area, start and end). Runs and
+peaks are indexed by time, instrument and retention time, so searches like
+"all GC 2 runs last March with a peak near 3.2 min" take milliseconds:
+
+    findRuns(conn, instrName="GC 2", since="2026-03-01",
+             until="2026-04-01", peakNear=3.2)
+
+The GUI updates the catalog whenever a file is saved (see
+gcafileio.updateCatalog). A directory can be indexed (again) at any time;
+files that have not changed since they were indexed are skipped:
+
+    python gcacatalog.py index "Example Data Sets"
+    python gcacatalog.py find --instrument "GC 2" --peak 3.2
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import numpy as np
+import gcaformat
+
+# File types indexed by indexDirectory
+catalogExtensions = (".gcard", ".gcarc")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    runIndex INTEGER NOT NULL,
+    time TEXT,
+    timeStamp TEXT,
+    instrName TEXT,
+    comment TEXT,
+    tabTitle TEXT,
+    thresh REAL,
+    gradThresh REAL,
+    points INTEGER,
+    UNIQUE (path, runIndex)
+);
+CREATE TABLE IF NOT EXISTS peaks (
+    runId INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    peakIndex INTEGER,
+    retentionTime REAL,
+    area REAL,
+    relativeArea REAL,
+    fittedArea REAL,
+    peakStart INTEGER,
+    peakEnd INTEGER
+);
+CREATE INDEX IF NOT EXISTS runsTime ON runs(time);
+CREATE INDEX IF NOT EXISTS runsInstrument ON runs(instrName, time);
+CREATE INDEX IF NOT EXISTS peaksRetention ON peaks(retentionTime);
+CREATE INDEX IF NOT EXISTS peaksRun ON peaks(runId);
+"""
+
+# Columns of the rows returned by findRuns
+runColumns = ("id", "path", "runIndex", "time", "timeStamp", "instrName",
+              "comment", "tabTitle", "thresh", "gradThresh", "points")
+
+
+def openCatalog(dbPath):
+    """Opens (making it if needed) the catalog database dbPath and returns
+    the sqlite3 connection.
+    """
+    conn = sqlite3.connect(dbPath)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def isoTime(timeStamp):
+    """Returns a time stamp of this program ('2016-06-03-12:01:33') as
+    '2016-06-03 12:01:33' (sorts and compares as text), None if it cannot
+    be read.
+    """
+    try:
+        return datetime.datetime.strptime(
+            timeStamp, '%Y-%m-%d-%H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def indexRuns(conn, path, gcExps, mtime=None, size=None):
+    """Puts the runs of the file path (list of GasChromatogram objects) in
+    the catalog, replacing what was there for path.
+    """
+    path = os.path.abspath(path)
+    with conn:
+        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        conn.execute("INSERT INTO files VALUES (?, ?, ?)", (path, mtime, size))
+        for runIndex, gcExp in enumerate(gcExps):
+            cursor = conn.execute(
+                "INSERT INTO runs (path, runIndex, time, timeStamp, "
+                "instrName, comment, tabTitle, thresh, gradThresh, points) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, runIndex, isoTime(gcExp.timeStamp), gcExp.timeStamp,
+                 gcExp.instrName, gcExp.comment, gcExp.tabTitle,
+                 _number(gcExp.thresh), _number(gcExp.gradThresh),
+                 len(gcExp.trace[0])))
+            runId = cursor.lastrowid
+            peaks = gcExp.peaks
+            if len(peaks) == 0:
+                continue
+            columns = [np.full(len(peaks), runId),
+                       np.arange(1, len(peaks) + 1),
+                       peaks.retentionTimes(gcExp.trace[0]), peaks.peakArea,
+                       peaks.relativePeakArea, peaks.fittedArea,
+                       peaks.peakStart, peaks.peakEnd]
+            rows = zip(*[column.tolist() for column in columns])
+            conn.executemany("INSERT INTO peaks VALUES (?, ?, ?, ?, ?, ?, "
+                             "?, ?)", rows)      # NaN is stored as NULL
+
+
+def _number(value):
+    return None if value is None else float(value)
+
+
+def indexFile(conn, filename, force=False):
+    """Indexes one .gcard file or .gcarc archive. Skipped (returns False)
+    if the file has not changed since it was last indexed, unless force.
+    The arrays of version 2 files are memory mapped, so only the pages
+    needed for the retention times are read.
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    if not force:
+        row = conn.execute("SELECT mtime, size FROM files WHERE path = ?",
+                           (path,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime and \
+                row[1] == stat.st_size:
+            return False
+    gcExps = gcaformat.readGCard(path, mmap=True)
+    indexRuns(conn, path, gcExps, stat.st_mtime, stat.st_size)
+    return True
+
+
+def indexDirectory(conn, directory, recursive=True, force=False, out=None):
+    """Indexes every .gcard and .gcarc file in directory (and its
+    subdirectories if recursive), and drops the files under directory that
+    no longer exist from the catalog. Files that cannot be read are
+    reported to out (if not None) and skipped. Unchanged files are skipped
+    unless force. Returns the number of files (re)indexed.
+    """
+    directory = os.path.abspath(directory)
+    found = set()
+    for root, dirs, files in os.walk(directory):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in catalogExtensions:
+                found.add(os.path.join(root, name))
+        if not recursive:
+            break
+    count = 0
+    for filename in sorted(found):
+        try:
+            count += indexFile(conn, filename, force)
+        except Exception as error:
+            if out is not None:
+                out.write("Could not index %s: %s\n" % (filename, error))
+    prefix = os.path.join(directory, "")
+    with conn:
+        for path, in conn.execute("SELECT path FROM files").fetchall():
+            if path.startswith(prefix) and path not in found and \
+                    (recursive or os.path.dirname(path) == directory):
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+    return count
+
+
+def removeFile(conn, filename):
+    """Removes a file and its runs from the catalog."""
+    with conn:
+        conn.execute("DELETE FROM files WHERE path = ?",
+                     (os.path.abspath(filename),))
+
+
+def findRuns(conn, instrName=None, since=None, until=None, comment=None,
+             peakNear=None, tolerance=0.05, limit=None):
+    """Returns the runs (dictionaries with the runColumns) matching all the
+    conditions given, newest first:
+        instrName       instrument name
+        since, until    time range ('2026-03-01' or '2026-03-01 12:00'),
+                        since included, until not
+        comment         text in the comment (case insensitive)
+        peakNear        with a peak within tolerance minutes of this
+                        retention time
+    """
+    where = []
+    values = []
+    if instrName is not None:
+        where.append("instrName = ?")
+        values.append(instrName)
+    if since is not None:
+        where.append("time >= ?")
+        values.append(since)
+    if until is not None:
+        where.append("time < ?")
+        values.append(until)
+    if comment is not None:
+        where.append("comment LIKE ?")
+        values.append("%" + comment + "%")
+    if peakNear is not None:
+        where.append("id IN (SELECT runId FROM peaks WHERE retentionTime "
+                     "BETWEEN ? AND ?)")
+        values += [peakNear - tolerance, peakNear + tolerance]
+    query = "SELECT " + ", ".join(runColumns) + " FROM runs"
+    if len(where) > 0:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY time DESC"
+    if limit is not None:
+        query += " LIMIT %d" % limit
+    return [dict(zip(runColumns, row))
+            for row in conn.execute(query, values).fetchall()]
+
+
+def runPeaks(conn, runId):
+    """Returns the peak table of a run in the catalog: a list of
+    (retention time, area, relative area, fitted area, start, end).
+    """
+    return conn.execute("SELECT retentionTime, area, relativeArea, "
+                        "fittedArea, peakStart, peakEnd FROM peaks "
+                        "WHERE runId = ? ORDER BY peakIndex",
+                        (runId,)).fetchall()
+
+
+def main(argv=None):
+    """Command line entry point (see module docstring)."""
+    parser = argparse.ArgumentParser(
+        description="Index saved GC runs and search them.")
+    parser.add_argument("--catalog", default="GasChromino catalog.sqlite",
+                        help="catalog database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index = commands.add_parser("index", help="index directories or files")
+    index.add_argument("paths", nargs="+")
+    index.add_argument("--force", action="store_true",
+                       help="index files again even if unchanged")
+    find = commands.add_parser("find", help="search the catalog")
+    find.add_argument("--instrument", default=None)
+    find.add_argument("--since", default=None,
+                      help="from this time (e.g. 2026-03-01)")
+    find.add_argument("--until", default=None,
+                      help="before this time (e.g. 2026-04-01)")
+    find.add_argument("--comment", default=None,
+                      help="text in the comment")
+    find.add_argument("--peak", type=float, default=None,
+                      help="retention time (min) of a peak in the run")
+    find.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    conn = openCatalog(args.catalog)
+    try:
+        if args.command == "index":
+            count = 0
+            for path in args.paths:
+                if os.path.isdir(path):
+                    count += indexDirectory(conn, path, force=args.force,
+                                            out=sys.stderr)
+                else:
+                    count += indexFile(conn, path, args.force)
+            print("%d files indexed" % count)
+        else:
+            for run in findRuns(conn, args.instrument, args.since,
+                                args.until, args.comment, args.peak,
+                                args.tolerance):
+                print("%s  %-12s %s [%d]  %s" % (
+                    run["time"] or run["timeStamp"], run["instrName"] or "",
+                    run["path"], run["runIndex"], run["comment"] or ""))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
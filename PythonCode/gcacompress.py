@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Module for compressing the arrays saved in .gcard files and .gcarc
+archives (see gcaformat).
+
+The Arduino sends times with 5 decimals and intensities with 8 (finer than
+the 16 bit resolution of the ADS1115), so every value is a whole number of
+1e-5 min or 1e-8 V. encodeArray finds the number of decimals of an array
+and stores those whole numbers, delta coded: times, taken about every
+0.1 s, are stored as their difference from the previous step (so a
+perfectly even time grid is all zeros), and intensities, which change
+slowly, as their difference from the previous point. The differences are
+stored in the smallest integer type that holds them (often 1 byte), then
+compressed with zlib or lzma from the standard library. Decoding gives
+back exactly the values saved: an array is only stored this way if
+decoding it gives the same numbers, otherwise its bytes are compressed as
+they are.
+
+Decoding is done with array operations (np.cumsum), not point by point.
+
+The encoding of an array is described by a dictionary kept in the file
+header:
+    codec       "zlib", "lzma" or "none"
+    length      bytes of the encoded data
+    decimals    values are whole numbers / 10**decimals, or None if the
+                raw bytes are stored (byte shuffled)
+    order       1: differences, 2: differences of the differences
+    start       the first order values (whole numbers) not in the data
+    deltaType   dtype of the differences
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import lzma
+import zlib
+import numpy as np
+
+# Compression available (gcaformat compression argument, cfg
+# compressTraces)
+codecs = ("zlib", "lzma", "none")
+
+# Most decimals looked for, and largest whole number stored (exact in
+# float64)
+_MAX_DECIMALS = 12
+_MAX_WHOLE = 2.0**53
+
+# Values checked before the whole array when looking for the decimals
+_SAMPLE = 1024
+
+_deltaTypes = (np.int8, np.int16, np.int32, np.int64)
+
+
+def encodeArray(values, codec="zlib"):
+    """Returns (encoding, data) for a 1-D array: the dictionary describing
+    the encoding (see module docstring) and the encoded bytes.
+    """
+    if codec not in codecs:
+        raise ValueError("Unknown compression: " + str(codec))
+    values = np.asarray(values)
+    decimals = findDecimals(values)
+    if decimals is None:
+# bytes of the same significance together compress better
+        raw = np.ascontiguousarray(values, values.dtype.newbyteorder('<'))
+        shuffled = raw.view(np.uint8).reshape(-1, raw.itemsize).T
+        encoding = {"decimals": None, "order": 0, "start": [],
+                    "deltaType": None}
+        data = _compress(np.ascontiguousarray(shuffled).tobytes(), codec)
+    else:
+        whole = _wholeNumbers(values, decimals)
+        best = None
+        for order in (1, 2):
+            if len(whole) <= order:
+                start, deltas = whole.tolist(), whole[:0]
+            else:
+                start = [int(whole[0])]
+                if order == 2:
+                    start.append(int(whole[1] - whole[0]))
+                deltas = np.diff(whole, n=order)
+            deltaType = _smallestType(deltas)
+            if best is None or np.dtype(deltaType).itemsize < \
+                    np.dtype(best[2]).itemsize:
+                best = (order, start, deltaType, deltas)
+        order, start, deltaType, deltas = best
+        encoding = {"decimals": decimals, "order": order, "start": start,
+                    "deltaType": np.dtype(deltaType).newbyteorder('<').str}
+        data = _compress(deltas.astype(encoding["deltaType"]).tobytes(),
+                         codec)
+    encoding["codec"] = codec
+    encoding["length"] = len(data)
+    return encoding, data
+
+
+def decodeArray(data, encoding, dtype, count):
+    """Returns the array (count values of dtype) encoded in data (bytes or
+    a uint8 array) by encodeArray.
+    """
+    dtype = np.dtype(dtype)
+    raw = _decompress(data, encoding["codec"])
+    if encoding["decimals"] is None:
+        shuffled = np.frombuffer(raw, dtype=np.uint8)
+        if len(shuffled) != count * dtype.itemsize:
+            raise ValueError("Encoded array has the wrong length")
+        return np.ascontiguousarray(
+            shuffled.reshape(dtype.itemsize, count).T).view(dtype).ravel()
+
+    deltas = np.frombuffer(raw, dtype=encoding["deltaType"])
+    order = encoding["order"]
+    start = encoding["start"]
+    if len(deltas) + len(start) != count:
+        raise ValueError("Encoded array has the wrong length")
+    whole = np.empty(count, dtype=np.int64)
+    if count <= order:
+        whole[:] = start
+    elif order == 1:
+        whole[0] = start[0]
+        np.cumsum(deltas, out=whole[1:], dtype=np.int64)
+        whole[1:] += start[0]
+    else:
+        steps = np.empty(count - 1, dtype=np.int64)
+        steps[0] = start[1]
+        np.cumsum(deltas, out=steps[1:], dtype=np.int64)
+        steps[1:] += start[1]
+        whole[0] = start[0]
+        np.cumsum(steps, out=whole[1:])
+        whole[1:] += start[0]
+    return _fromWhole(whole, encoding["decimals"], dtype)
+
+
+def findDecimals(values):
+    """Returns the fewest decimals with which every value is written
+    exactly (decoded to the same number), or None if there are none up to
+    _MAX_DECIMALS (or values are not numbers).
+    """
+    if values.dtype.kind not in "fiu" or len(values) == 0:
+        return None
+    if values.dtype.kind in "iu":
+        if np.abs(values.astype(float)).max() >= _MAX_WHOLE:
+            return None
+        return 0
+    if not np.all(np.isfinite(values)):
+        return None
+    largest = np.abs(values).max()
+    sample = values[:_SAMPLE]
+    for decimals in range(_MAX_DECIMALS + 1):
+        if largest * 10.0**decimals >= _MAX_WHOLE:
+            return None
+        if _exact(sample, decimals) and _exact(values, decimals):
+            return decimals
+    return None
+
+
+def _exact(values, decimals):
+    whole = _wholeNumbers(values, decimals)
+    return np.array_equal(_fromWhole(whole, decimals, values.dtype), values)
+
+
+def _wholeNumbers(values, decimals):
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64)
+    return np.rint(values.astype(np.float64) * 10.0**decimals).astype(
+        np.int64)
+
+
+def _fromWhole(whole, decimals, dtype):
+    if dtype.kind in "iu":
+        return whole.astype(dtype)
+    return (whole / 10.0**decimals).astype(dtype)
+
+
+def _smallestType(deltas):
+    if len(deltas) == 0:
+        return np.int8
+    low, high = deltas.min(), deltas.max()
+    for deltaType in _deltaTypes:
+        info = np.iinfo(deltaType)
+        if info.min <= low and high <= info.max:
+            return deltaType
+    return np.int64
+
+
+def _compress(raw, codec):
+    if codec == "zlib":
+        return zlib.compress(raw, 6)
+    if codec == "lzma":
+        return lzma.compress(raw)
+    return raw
+
+
+def _decompress(data, codec):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lzma":
+        return lzma.decompress(data)
+    return bytes(data)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Module for exporting traces and peak tables as text (csv, space or tab
+separated).
+
+formatColumns turns a block of rows into text with one % formatting of a
+format repeated for every row (not a python call per value), and the files
+are written a block of rows at a time. The numbers are rounded exactly as
+"%.6f" % value rounds them, so the files are the same as those written one
+value at a time.
+
+Numbers are written with a fixed number of decimals (precision), or with
+all their digits (precision=None, as repr() gives, which is slower).
+
+exportRuns writes many runs, either one after the other in one file
+(separated by a blank line, as saveMultipleFileAs always has) or one file
+per run.
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import os
+import numpy as np
+
+# Rows formatted and written at a time
+CHUNK_ROWS = 65536
+
+# Columns of the exported peak table
+peakColumns = ("Retention Time", "Area", "Relative Area", "Fitted Area",
+               "Peak Start", "Peak End")
+
+
+def formatColumns(columns, delimiter=" ", precision=6, lineEnd="\r\n"):
+    """Returns the rows of columns (equal length 1-D arrays) as text
+    (bytes), values separated by delimiter and rows ended by lineEnd.
+    precision is the number of decimals (0 for integers), a list with one
+    for each column, or None for all the digits of each value.
+    """
+    if len(columns) == 0 or len(columns[0]) == 0:
+        return b""
+    if not isinstance(precision, (list, tuple)):
+        precision = [precision] * len(columns)
+    values = [np.asarray(column, dtype=float) for column in columns]
+    formats = ["%r" if p is None else "%." + str(p) + "f" for p in precision]
+    rowFormat = delimiter.join(formats) + lineEnd
+    rows = np.column_stack(values)
+    if any(p is None for p in precision):     # repr of python floats
+        rows = rows.tolist()
+        return "".join(rowFormat % tuple(row) for row in rows).encode()
+    return ((rowFormat * len(rows)) % tuple(rows.ravel().tolist())).encode()
+
+
+def writeColumns(outf, columns, delimiter=" ", precision=6, lineEnd="\r\n",
+                 chunkRows=CHUNK_ROWS):
+    """Writes the rows of columns to the binary file outf, formatted by
+    formatColumns a chunk of rows at a time.
+    """
+    nRows = len(columns[0]) if len(columns) > 0 else 0
+    for start in range(0, nRows, chunkRows):
+        outf.write(formatColumns([column[start:start + chunkRows]
+                                  for column in columns],
+                                 delimiter, precision, lineEnd))
+
+
+def writeTrace(outf, gcExp, delimiter=" ", precision=6, lineEnd="\r\n"):
+    """Writes the trace of a GasChromatogram to the binary file outf, one
+    line of time and intensity per point.
+    """
+    writeColumns(outf, gcExp.trace, delimiter, precision, lineEnd)
+
+
+def writePeakTable(outf, gcExp, delimiter=",", precision=6, lineEnd="\r\n",
+                   header=True):
+    """Writes the peak table of a GasChromatogram to the binary file outf
+    (columns in peakColumns, with a header line if header is True).
+    """
+    if header:
+        outf.write((delimiter.join(peakColumns) + lineEnd).encode())
+    peaks = gcExp.peaks
+    columns = [peaks.retentionTimes(gcExp.trace[0]), peaks.peakArea,
+               peaks.relativePeakArea, peaks.fittedArea, peaks.peakStart,
+               peaks.peakEnd]
+    if precision is None or isinstance(precision, int):
+        precision = [precision] * 4 + [0, 0]
+    writeColumns(outf, columns, delimiter, precision, lineEnd)
+
+
+def runFilenames(filename, count):
+    """Filenames of count runs exported one file per run: filename for the
+    first, then with " 2", " 3", ... before the extension.
+    """
+    base, ext = os.path.splitext(filename)
+    return [filename] + [base + " " + str(i) + ext
+                         for i in range(2, count + 1)]
+
+
+def exportRuns(gcExps, filename, content="trace", perRun=False,
+               delimiter=" ", precision=6, lineEnd="\r\n"):
+    """Exports a list of GasChromatogram objects as text: content is
+    "trace" or "peaks" (the peak tables). With perRun=False all runs go in
+    filename, each followed by a blank line; with perRun=True each run is
+    written to its own file (see runFilenames). Returns the list of files
+    written.
+    """
+    writers = {"trace": writeTrace, "peaks": writePeakTable}
+    if content not in writers:
+        raise ValueError("Unknown export content: " + str(content))
+    write = writers[content]
+    if not perRun:
+        with open(filename, 'wb') as outf:
+            for gcExp in gcExps:
+                write(outf, gcExp, delimiter, precision, lineEnd)
+                outf.write(lineEnd.encode())
+        return [filename]
+    filenames = runFilenames(filename, len(gcExps))
+    for gcExp, runFilename in zip(gcExps, filenames):
+        with open(runFilename, 'wb') as outf:
+            write(outf, gcExp, delimiter, precision, lineEnd)
+    return filenames
+
+
+def peakFilename(filename):
+    """Filename for the peak table exported with a trace to filename."""
+    base, ext = os.path.splitext(filename)
+    return base + " peaks" + ext
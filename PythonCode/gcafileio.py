@@ -13,83 +13,73 @@ Grinnell, IA 50112
 mobleyt@grinnell.edu
 """
 import gcaglobals as gcaGlobals
+import gaschromatogram as gc
 import tkinter.filedialog as filedialog
 import os
+import re
 from tkinter import messagebox
-import pickle
+import gcacatalog
+import gcaexport
+import gcaformat
+import gcajournal
+import gcaloader
 
+# Extensions of text traces that can be opened
+textExtensions = gcaloader.textExtensions
 
-def openFile():
-    """Opens file for further processing.
-    Current Limitations: The only file type that currently can be opened is the
-    native .gcard datatype. Maybe should extend to be able to open simple csv
-    files of time, intensity.
+
+def askOpenFilename():
+    """Asks for a file to open. Returns the filename, or None if cancelled
+    or not a type this program opens (.gcard, .gcarc, or a text file, see
+    gcaloader.textExtensions).
     """
     if gcaGlobals.workingDir == "":
         gcaGlobals.workingDir = gcaGlobals.gasChrominoHome
     filename = filedialog.askopenfilename(initialdir=gcaGlobals.workingDir)
+    if filename == "":
+        return None
     waste, ext = os.path.splitext(filename)
     gcaGlobals.workingDir, shortfilename = os.path.split(filename)
-    if filename != "" and ext != ".gcard":
+    if ext.lower() not in textExtensions and ext not in (".gcard", ".gcarc"):
         messagebox.showinfo("Invalid filetype", "This program can currently \
-only open the gcard file type (native to this program).")
+only open the gcard and gcarc file types (native to this program) and \
+csv, txt or dat text files.")
         return None
-    elif filename != "":
-        with open(filename, 'rb') as inputf:
-            try:
-                return pickle.load(inputf), filename, shortfilename
-            except:
-                messagebox.showinfo("File open error", "Trouble reading file")
-                return None, None, None
+    return filename
 
 
 def saveFile(gcExp, extension=".gcard"):
     """Saves file.
-    Saves two types of file:
-        .gcard native format (with pickle to save GasChromatogram object)
-        .csv or any other ext (space separated time intensity line feed)
+    Saves three types of file:
+        .gcard native format (see gcaformat; version set by gcardVersion)
+        .gcarc archive, the run is added to it (see addToArchive)
+        .csv or any other ext (time intensity lines, see exportText)
+    A run opened from an archive (or never saved) is saved under a new
+    name: saving it to its archive's name would overwrite the archive.
     """
-    if (gcExp.filename is None):
+    if gcExp.filename is None or isArchiveRun(gcExp.filename):
         filename = getFilename(extension)
     else:
         filename = gcExp.filename
-    waste, ext = os.path.splitext(filename)
-    waste, shortfilename = os.path.split(filename)
-    if ext == ".gcard":
-        try:
-            gcExp.shortfile, waste = os.path.splitext(shortfilename)
-            gcExp.filename = filename
-            gcExp.tabTitle = gcExp.shortfile
-            with open(filename, 'wb') as outf:
-                pickle.dump([gcExp], outf, pickle.HIGHEST_PROTOCOL)
-            return filename
-        except:
-            messagebox.showinfo("File write error", "There was a problem \
-writing to the " + ext + " file.")
-            return None
-    else:
-        try:
-            with open(filename, 'w') as outf:
-                timePoints = gcExp.trace[0]
-                yPoints = gcExp.trace[1]
-                for i in len(timePoints):
-                    outf.write(timePoints[i] + " " +
-                               yPoints[i] + "\r\n")
-                outf.write("\r\n")
-            return filename
-        except:
-            messagebox.showinfo("File write error", "There was a problem \
-writing to the " + ext + " file.")
-            return None
+    if filename == "":
+        return None
+    return saveRun(gcExp, filename)
 
 
 def saveFileAs(gcExp, extension=".gcard"):
     """Saves file with new name or in different format with different extension
-    Saves two types of file:
-        .gcard native format (with pickle to save GasChromatogram object)
-        .csv or any other ext (space separated time intensity line feed)
+    Saves the same types of file as saveFile.
     """
     filename = getFilename(extension)
+    if filename == "":
+        return None
+    return saveRun(gcExp, filename)
+
+
+def saveRun(gcExp, filename):
+    """Saves one GasChromatogram to filename, in the format given by its
+    extension (see saveFile). Returns filename, or None if it failed.
+    """
     waste, ext = os.path.splitext(filename)
     waste, shortfilename = os.path.split(filename)
     if ext == ".gcard":
@@ -97,22 +87,25 @@ def saveFileAs(gcExp, extension=".gcard"):
             gcExp.shortfile, waste = os.path.splitext(shortfilename)
             gcExp.filename = filename
             gcExp.tabTitle = gcExp.shortfile
-            with open(filename, 'wb') as outf:
-                pickle.dump([gcExp], outf, pickle.HIGHEST_PROTOCOL)
+            gcaformat.writeGCard(filename, [gcExp], gc.setting('gcardVersion'),
+                                 compression())
+            gcajournal.removeJournal(gcExp)
+            updateCatalog(filename)
             return filename
         except:
             messagebox.showinfo("File write error", "There was a problem \
 writing to the " + ext + " file.")
             return None
+    elif ext == ".gcarc":
+        try:
+            return addToArchive([gcExp], filename)
+        except:
+            messagebox.showinfo("File write error", "There was a problem \
+adding to the archive " + filename + ".")
+            return None
     else:
         try:
-            with open(filename, 'w') as outf:
-                timePoints = gcExp.trace[0]
-                yPoints = gcExp.trace[1]
-                for i in range(len(timePoints)):
-                    outf.write(str(timePoints[i]) + " " +
-                               str(yPoints[i]) + "\r\n")
-                outf.write("\r\n")
+            exportText([gcExp], filename)
             return filename
         except:
             messagebox.showinfo("File write error", "There was a problem \
@@ -120,38 +113,36 @@ writing to the " + ext + " file.")
             return None
 
 
-def saveMultipleFileAs(listOfGCExp, extension=".gcard"):
-    """Stub for future development.
-    Should take list of GasChromatogram objects and save them.
-    To develop, need to implement method to choose list from current
-    experiments, and then save the list, possibly to a different extension
-    (lgcard?) or to the same extension. If the former (easier), openFile then
-    recognizes new extension and executes opening of a list rather than
-    individual GasChromatogram object. If the latter, then it is necessary
-    for openFile to recognize the difference in the format (that it is a list)
-    and open the file appropriately.
+def isArchiveRun(filename):
+    """True if filename is the name given to a run of a .gcarc archive by
+    nameRuns ("x.gcarc", "x.gcarc 2", ...), not a file of its own.
+    """
+    return re.search(r"\.gcarc( \d+)?$", filename, re.IGNORECASE) is not None
+
+
+def saveMultipleFileAs(listOfGCExp, extension=".gcarc"):
+    """Saves a list of GasChromatogram objects in one file:
+        .gcarc multi-run archive (see gcaformat), from which single runs can
+            be listed and opened and to which runs can be added later
+        .gcard native format, all runs read together when opened
+        .txt or any other ext (time intensity lines, see exportText)
     """
     import sys
 
     filename = getFilename(extension)
     waste, ext = os.path.splitext(filename)
     waste, shortfilename = os.path.split(filename)
-    if ext == ".gcard":
+    if ext in (".gcard", ".gcarc"):
         try:
-            counter = 1
-            for exp in listOfGCExp:
-                if counter > 1:
-                    exp.shortfile, waste = os.path.splitext(shortfilename)
-                    exp.shortfile = exp.shortfile + " " + str(counter)
-                    exp.filename = filename + " " + str(counter)
-                    exp.tabTitle = exp.shortfile
-                else:
-                    exp.shortfile, waste = os.path.splitext(shortfilename)
-                    exp.filename = filename
-                    exp.tabTitle = exp.shortfile
-                counter += 1
-            with open(filename, 'wb') as outf:
-                pickle.dump(listOfGCExp, outf, pickle.HIGHEST_PROTOCOL)
+            nameRuns(listOfGCExp, filename)
+            if ext == ".gcarc":
+                gcaformat.writeArchive(filename, listOfGCExp, compression())
+            else:
+                gcaformat.writeGCard(filename, listOfGCExp,
+                                     gc.setting('gcardVersion'), compression())
+            for gcExp in listOfGCExp:
+                gcajournal.removeJournal(gcExp)
+            updateCatalog(filename)
             return filename
         except:
             messagebox.showinfo("File write error", "There was a problem \
@@ -160,14 +151,7 @@ writing to the " + ext + " file.")
             return None
     else:
         try:
-            with open(filename, 'w') as outf:
-                for gcExp in listOfGCExp:
-                    timePoints = gcExp.trace[0]
-                    yPoints = gcExp.trace[1]
-                    for i in range(len(timePoints)):
-                        outf.write(str(timePoints[i]) + " " +
-                                   str(yPoints[i]) + "\r\n")
-                    outf.write("\r\n")
+            exportText(listOfGCExp, filename)
             return filename
         except:
             messagebox.showinfo("File write error", "There was a problem \
@@ -175,6 +159,124 @@ writing to the " + ext + " file.")
             return None
 
 
+def appendToArchive(listOfGCExp):
+    """Adds a list of GasChromatogram objects to the end of a .gcarc
+    archive (made if it does not exist yet). The runs already in the
+    archive are not rewritten.
+    """
+    filename = filedialog.asksaveasfilename(
+        initialdir=gcaGlobals.outDirectory, defaultextension=".gcarc",
+        filetypes=[("gcarc archive", "*.gcarc")], confirmoverwrite=False)
+    if filename == "":
+        return None
+    gcaGlobals.outDirectory = os.path.dirname(filename)
+    try:
+        return addToArchive(listOfGCExp, filename)
+    except:
+        messagebox.showinfo("File write error", "There was a problem \
+adding to the archive " + filename + ".")
+        return None
+
+
+def addToArchive(listOfGCExp, filename):
+    """Adds GasChromatogram objects to the end of the archive filename
+    (made if it does not exist), naming them after the runs already in it.
+    Returns filename.
+    """
+    first = 1
+    if os.path.exists(filename):
+        first = len(gcaformat.listArchive(filename)) + 1
+    nameRuns(listOfGCExp, filename, first)
+    gcaformat.appendArchive(filename, listOfGCExp, compression())
+    for gcExp in listOfGCExp:
+        gcajournal.removeJournal(gcExp)
+    updateCatalog(filename)
+    return filename
+
+
+def compression():
+    """Compression of the arrays of saved files (compressTraces in the cfg
+    file: "zlib", "lzma", or "" for none), for gcaformat.
+    """
+    compressTraces = gc.setting('compressTraces')
+    if compressTraces == "":
+        return None
+    return compressTraces
+
+
+def nameRuns(listOfGCExp, filename, first=1):
+    """Sets the file and tab names of runs saved together in filename:
+    the file's name for run 1, with " 2", " 3", ... added for the others.
+    """
+    waste, shortfilename = os.path.split(filename)
+    for counter, exp in enumerate(listOfGCExp, first):
+        exp.shortfile, waste = os.path.splitext(shortfilename)
+        exp.filename = filename
+        if counter > 1:
+            exp.shortfile = exp.shortfile + " " + str(counter)
+            exp.filename = filename + " " + str(counter)
+        exp.tabTitle = exp.shortfile
+
+
+def exportText(listOfGCExp, filename):
+    """Writes the traces of a list of GasChromatogram objects as text
+    (gcaexport) with the export settings: exportDelimiter (comma for .csv
+    files), exportPrecision (decimals), exportPerRun (a file for each run
+    instead of one file) and exportPeaks (also write the peak tables, to
+    the same name with " peaks" added).
+    """
+    delimiter = gc.setting('exportDelimiter')
+    if os.path.splitext(filename)[1].lower() == ".csv":
+        delimiter = ","
+    perRun = gc.setting('exportPerRun')
+    precision = gc.setting('exportPrecision')
+    gcaexport.exportRuns(listOfGCExp, filename, "trace", perRun, delimiter,
+                         precision)
+    if gc.setting('exportPeaks'):
+        gcaexport.exportRuns(listOfGCExp, gcaexport.peakFilename(filename),
+                             "peaks", perRun, delimiter, precision)
+
+
+def catalogPath():
+    """Returns the path of the run catalog database (catalogFile, or
+    "GasChromino catalog.sqlite" in gasChrominoHome if not set).
+    """
+    catalogFile = gc.setting('catalogFile')
+    if catalogFile != "":
+        return catalogFile
+    return os.path.join(gcaGlobals.gasChrominoHome,
+                        "GasChromino catalog.sqlite")
+
+
+def journalDirectory():
+    """Returns the directory of the acquisition journals (journalDir, or
+    "Journal" in gasChrominoSupport if not set), making it if needed.
+    """
+    directory = gc.setting('journalDir')
+    if directory == "":
+        directory = os.path.join(gcaGlobals.gasChrominoSupport, "Journal")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def updateCatalog(filename):
+    """Indexes a saved .gcard or .gcarc file in the run catalog (if
+    useCatalog is set). A problem with the catalog is written to the log
+    file; it does not stop the save.
+    """
+    if not gc.setting('useCatalog'):
+        return
+    try:
+        conn = gcacatalog.openCatalog(catalogPath())
+        try:
+            gcacatalog.indexFile(conn, filename, force=True)
+        finally:
+            conn.close()
+    except Exception as error:
+        gcaGlobals.writeLogFile(["Catalog update failed for ", filename,
+                                 ": ", str(error)])
+
+
 def getFilename(extension):
     """Routine to return a filename using OS filedialog request.
     """
@@ -182,6 +284,8 @@ def getFilename(extension):
                                             defaultextension=extension,
                                             filetypes=[("gcard file",
                                                         "*.gcard"),
+                                                       ("gcarc archive",
+                                                        "*.gcarc"),
                                                        ("txt file", "*.txt")])
     gcaGlobals.outDirectory = os.path.dirname(filename)
     return filename
@@ -0,0 +1,628 @@
+# -*- coding: utf-8 -*-
+"""
+Module for reading and writing .gcard files.
+
+Two formats are read:
+    version 1   a pickled list of GasChromatogram objects (all versions of
+                the program before this one)
+    version 2   a header with the metadata of every run, followed by the
+                raw arrays
+
+A version 2 file is laid out as:
+    magic           8 bytes, b"\\x89GCARD\\r\\n"
+    version         unsigned 16 bit, little-endian (2)
+    header length   unsigned 32 bit, little-endian
+    header          JSON (utf-8), see below
+    padding         zeros up to a multiple of 8 bytes
+    data            the arrays, raw little-endian, each starting on a
+                    multiple of 8 bytes from the start of the data
+
+The header is {"version": 2, "runs": [run, ...]}. Each run has the time
+stamp, instrument, comment, thresholds, file and tab names, the peak table
+(one list per PeakTable column) and "arrays": for each of "time", "y",
+"baselineIndex", "baseline" and "baselineCalc" either
+{"offset": bytes from the start of the data, "dtype": "<f8", "count": n}
+or, for values that are not lists (e.g. a baselineCalc of 0 from
+fixBkwdCompat), {"value": value}. Arrays written with compression also
+have "encoding" (see gcacompress): the data holds "length" bytes of
+compressed, delta coded values instead of the raw array.
+
+readGCardHeader reads only the header. readGCard returns GasChromatogram
+objects whose arrays are read from the file when first used (see
+GasChromatogram.setLazyArrays), so opening a file with many long runs is
+quick. Nothing is unpickled from a version 2 file. Other attributes added
+to a GasChromatogram (not part of the class) are not saved in version 2.
+
+Many runs (a day's or a month's) can be kept in one multi-run archive
+(.gcarc, see the end of this module), with a table of contents so that the
+runs can be listed without reading them, and new runs appended without
+rewriting the file.
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import json
+import os
+import pickle
+import struct
+import weakref
+import numpy as np
+import gaschromatogram as gc
+import gcacompress
+
+MAGIC = b"\x89GCARD\r\n"
+VERSION = 2
+_PREFIX = struct.Struct("<HI")          # version, header length
+_ALIGN = 8
+
+# Attributes of GasChromatogram saved in the header
+headerAttributes = ("timeStamp", "instrName", "comment", "thresh",
+                    "gradThresh", "saved", "filename", "shortfile",
+                    "tabTitle")
+
+# Arrays saved in the data section: (name, attribute, dtype if not float)
+_arrays = (("time", None, None), ("y", None, None),
+           ("baselineIndex", "baselineIndex", "<i8"),
+           ("baseline", "baseline", "<f8"),
+           ("baselineCalc", "baselineCalc", "<f8"))
+
+
+def fileVersion(filename):
+    """Returns the format version of a .gcard file (1 or 2)."""
+    with open(filename, 'rb') as inputf:
+        return _readVersion(inputf)
+
+
+def _readVersion(inputf):
+    if inputf.read(len(MAGIC)) != MAGIC:
+        inputf.seek(0)
+        return 1
+    version, = struct.unpack("<H", inputf.read(2))
+    inputf.seek(0)
+    return version
+
+
+def writeGCard(filename, gcExps, version=VERSION, compression=None):
+    """Writes a list of GasChromatogram objects to filename in the format
+    version (2, or 1 for files to be read by older versions of the
+    program). The file is written to a temporary file that then replaces
+    filename, so an existing file is not lost if writing fails.
+
+    compression ("zlib" or "lzma", version 2 only) stores the arrays
+    encoded by gcacompress, a fraction of their raw size.
+    """
+    releaseRuns(filename)
+    tmpname = filename + ".tmp"
+    with open(tmpname, 'wb') as outf:
+        if version == 1:
+            pickle.dump(list(gcExps), outf, pickle.HIGHEST_PROTOCOL)
+        elif version == 2:
+            _writeVersion2(outf, gcExps, compression)
+        else:
+            raise ValueError("Unknown .gcard version: " + str(version))
+    os.replace(tmpname, filename)
+
+
+def _writeVersion2(outf, gcExps, compression=None):
+    runs = []
+    blocks = []
+    offset = 0
+    for gcExp in gcExps:
+        run, runBlocks, offset = _runHeader(gcExp, offset, compression)
+        runs.append(run)
+        blocks += runBlocks
+
+    header = json.dumps({"version": VERSION, "runs": runs},
+                        default=_jsonValue).encode('utf-8')
+    outf.write(MAGIC)
+    outf.write(_PREFIX.pack(VERSION, len(header)))
+    outf.write(header)
+    _pad(outf, len(MAGIC) + _PREFIX.size + len(header))
+    _writeBlocks(outf, blocks)
+
+
+def _runHeader(gcExp, offset=0, compression=None):
+    """Returns (run, blocks, offset) for one GasChromatogram: the run
+    dictionary of the header, the list of arrays to write in the data
+    section (starting offset bytes into it) and the offset after them.
+    With compression the arrays are encoded by gcacompress.
+    """
+    run = {name: getattr(gcExp, name, None) for name in headerAttributes}
+    peaks = gcExp.peaks
+    run["peaks"] = {name: peaks.data[name].tolist()
+                    for name in gc.PEAK_DTYPE.names}
+    run["arrays"] = {}
+    blocks = []
+    for name, attribute, dtype in _arrays:
+        if attribute is None:
+            values = gcExp.trace[0 if name == "time" else 1]
+            dtype = values.dtype.newbyteorder('<')
+        else:
+            values = getattr(gcExp, attribute)
+            if not isinstance(values, (list, tuple, np.ndarray)):
+                run["arrays"][name] = {"value": values}
+                continue
+        data = np.ascontiguousarray(values, dtype=dtype)
+        run["arrays"][name] = {"offset": offset, "dtype": data.dtype.str,
+                               "count": len(data)}
+        if compression is not None:
+            encoding, encoded = gcacompress.encodeArray(data, compression)
+            run["arrays"][name]["encoding"] = encoding
+            data = np.frombuffer(encoded, dtype=np.uint8)
+        blocks.append(data)
+        offset += _padded(data.nbytes)
+    return run, blocks, offset
+
+
+def _writeBlocks(outf, blocks):
+    for data in blocks:
+        data.tofile(outf)
+        _pad(outf, data.nbytes)
+
+
+def _jsonValue(value):
+    """Converts numpy numbers (e.g. thresholds) for json."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Cannot save " + repr(value) + " in a .gcard header")
+
+
+def _padded(nbytes):
+    return -(-nbytes // _ALIGN) * _ALIGN
+
+
+def _pad(outf, nbytes):
+    outf.write(b"\0" * (_padded(nbytes) - nbytes))
+
+
+def readGCardHeader(filename):
+    """Returns (header, offset of the data) of a version 2 .gcard file
+    without reading the arrays. header is the dictionary described in the
+    module docstring.
+    """
+    with open(filename, 'rb') as inputf:
+        return _readHeader(inputf)
+
+
+def _readHeader(inputf):
+    if inputf.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a version 2 .gcard file")
+    version, length = _PREFIX.unpack(inputf.read(_PREFIX.size))
+    if version != VERSION:
+        raise ValueError("Unknown .gcard version: " + str(version))
+    header = json.loads(inputf.read(length).decode('utf-8'))
+    return header, _padded(len(MAGIC) + _PREFIX.size + length)
+
+
+def readGCard(filename, lazy=True, allowPickle=True, mmap=False):
+    """Returns the list of GasChromatogram objects in a .gcard file of
+    either version (or all the runs of an archive, see readArchive). For
+    version 2 the arrays are read when first used
+    (lazy=False reads them now). Version 1 files are unpickled, which should
+    only be done for trusted files: with allowPickle=False they raise
+    ValueError instead.
+
+    With mmap=True the arrays of a version 2 file are not read but memory
+    mapped (see FileMap): only the pages that are used are read from disk.
+    """
+    if isArchive(filename):
+        return readArchive(filename, mmap=mmap)
+    with open(filename, 'rb') as inputf:
+        if _readVersion(inputf) == 1:
+            if not allowPickle:
+                raise ValueError(filename + " is a version 1 (pickled) "
+                                 ".gcard file")
+            return pickle.load(inputf)
+        header, dataStart = _readHeader(inputf)
+        identity = _fileIdentity(inputf)
+    fileMap = FileMap(filename, dataStart, identity) if mmap else None
+    gcExps = [_makeGCExp(filename, run, dataStart, fileMap, identity)
+              for run in header["runs"]]
+    if not lazy:
+        for gcExp in gcExps:
+            gcExp.loadLazyArrays()
+    return gcExps
+
+
+def _makeGCExp(filename, run, dataStart, fileMap=None, identity=None):
+    """Makes the GasChromatogram of one run of a version 2 header, with its
+    arrays left to be read from filename (or taken from fileMap). identity
+    (see _fileIdentity) is that of the file the header was read from: the
+    arrays are not read if the file has changed since.
+    """
+    gcExp = gc.GasChromatogram([[], []], run["timeStamp"], run["thresh"],
+                               run["gradThresh"], run["comment"],
+                               run["instrName"])
+    for name in headerAttributes:
+        setattr(gcExp, name, run.get(name))
+    columns = run["peaks"]
+    peaks = np.zeros(len(columns["peakStart"]), dtype=gc.PEAK_DTYPE)
+    for name in gc.PEAK_DTYPE.names:
+        if name in columns:
+            peaks[name] = columns[name]
+        else:
+            peaks[name] = np.nan
+    gcExp.peaks = gc.PeakTable.fromArray(peaks)
+
+    specs = run["arrays"]
+    lazyNames = ["trace"]
+    for name, attribute, dtype in _arrays[2:]:
+        if "value" in specs[name]:
+            setattr(gcExp, attribute, specs[name]["value"])
+        else:
+            lazyNames.append(attribute)
+
+    def loader():
+        if fileMap is not None:
+            return _runArrays(fileMap.arrays(specs,
+                                             dataStart - fileMap.dataStart),
+                              asLists=False)
+        return _runArrays(_readArrays(filename, specs, dataStart, identity))
+
+    gcExp.setLazyArrays(loader, lazyNames)
+    _openRuns[gcExp] = (filename, fileMap)
+    return gcExp
+
+
+def _readArrays(filename, specs, dataStart, identity=None):
+    """Reads the arrays of one run from filename. Returns a dictionary of
+    the arrays (by their names in the header). Raises ValueError if the
+    file's identity is no longer identity (if given).
+    """
+    arrays = {}
+    with open(filename, 'rb') as inputf:
+        _checkIdentity(filename, _fileIdentity(inputf), identity)
+        for name, spec in specs.items():
+            if "value" in spec:
+                continue
+            inputf.seek(dataStart + spec["offset"])
+            if "encoding" in spec:
+                length = spec["encoding"]["length"]
+                data = inputf.read(length)
+                if len(data) != length:
+                    raise ValueError(filename + " is shorter than its header")
+                arrays[name] = gcacompress.decodeArray(
+                    data, spec["encoding"], spec["dtype"], spec["count"])
+                continue
+            data = np.fromfile(inputf, dtype=spec["dtype"],
+                               count=spec["count"])
+            if len(data) != spec["count"]:
+                raise ValueError(filename + " is shorter than its header")
+            arrays[name] = data
+    return arrays
+
+
+def _fileIdentity(inputf):
+    """Returns (inode, size, modification time) of an open file, which
+    change when the file is replaced or written to.
+    """
+    stat = os.fstat(inputf.fileno())
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _checkIdentity(filename, current, identity):
+    """Raises ValueError if a file no longer has the identity it had when
+    its header was read (offsets in the header would point into whatever
+    was written since).
+    """
+    if identity is not None and current != identity:
+        raise ValueError(filename + " has been changed since it was "
+                         "opened; open it again")
+
+
+def _runArrays(arrays, asLists=True):
+    """Returns the dictionary for GasChromatogram.loadLazyArrays: the trace
+    and the baseline arrays saved in the data section (as lists, as the
+    analysis keeps them, unless asLists is False).
+    """
+    result = {"trace": [arrays["time"], arrays["y"]]}
+    for name, attribute, dtype in _arrays[2:]:
+        if name in arrays:
+            result[attribute] = arrays[name].tolist() if asLists \
+                else arrays[name]
+    return result
+
+
+# Runs that read their arrays from a file (lazily or from a FileMap), with
+# the filename and the map (or None), see releaseRuns
+_openRuns = weakref.WeakKeyDictionary()
+
+
+def releaseRuns(filename):
+    """Reads the arrays of the runs opened from filename that have not been
+    read yet, copies the arrays of those memory mapped from it and drops
+    their maps, so that the file can be replaced, appended to or truncated
+    (the runs do not read from it afterwards). A map is closed once nothing
+    else uses it.
+    """
+    path = os.path.normcase(os.path.abspath(filename))
+    fileMaps = set()
+    for gcExp, (runFile, fileMap) in list(_openRuns.items()):
+        if os.path.normcase(os.path.abspath(runFile)) != path:
+            continue
+        try:
+            gcExp.loadLazyArrays()
+        except ValueError:      # file already changed, run cannot be read
+            del _openRuns[gcExp]
+            continue
+        if fileMap is not None:
+            gcExp.trace = [np.array(values) for values in gcExp.trace]
+            for name in ("baselineIndex", "baseline", "baselineCalc"):
+                values = getattr(gcExp, name, None)
+                if isinstance(values, np.ndarray):
+                    setattr(gcExp, name, np.array(values))
+            fileMaps.add(fileMap)
+        del _openRuns[gcExp]
+    for fileMap in fileMaps:
+        fileMap._data = None
+
+
+class FileMap():
+    """The data section of a version 2 .gcard file, memory mapped when it is
+    first used and shared by all the runs read from the file (one map per
+    file, not one per array).
+
+    The map is copy-on-write: the arrays can be changed in memory, but
+    nothing is written back to the file. A mapped file cannot be replaced
+    on Windows, and reading pages cut off the end of a mapped file crashes
+    the program, so before the file is written its runs are copied out of
+    the map (see releaseRuns).
+    """
+
+    def __init__(self, filename, dataStart, identity=None):
+        self.filename = filename
+        self.dataStart = dataStart
+        self.identity = identity
+        self._data = None
+
+    def data(self):
+        """Returns the whole data section as a memory mapped byte array
+        (ValueError if the file has changed since it was opened).
+        """
+        if self._data is None:
+            with open(self.filename, 'rb') as inputf:
+                _checkIdentity(self.filename, _fileIdentity(inputf),
+                               self.identity)
+            size = os.path.getsize(self.filename) - self.dataStart
+            if size <= 0:
+                self._data = np.zeros(0, dtype=np.uint8)
+            else:
+                self._data = np.memmap(self.filename, dtype=np.uint8,
+                                       mode='c', offset=self.dataStart,
+                                       shape=(size,))
+        return self._data
+
+    def arrays(self, specs, base=0):
+        """Returns a dictionary of the arrays of one run (specs from the
+        header, offsets from base bytes into the map) as views of the map;
+        nothing is copied (except compressed arrays, which are decoded).
+        """
+        data = self.data()
+        arrays = {}
+        for name, spec in specs.items():
+            if "value" in spec:
+                continue
+            dtype = np.dtype(spec["dtype"])
+            start = base + spec["offset"]
+            if "encoding" in spec:
+                end = start + spec["encoding"]["length"]
+            else:
+                end = start + spec["count"] * dtype.itemsize
+            if end > len(data):
+                raise ValueError(self.filename +
+                                 " is shorter than its header")
+            if "encoding" in spec:
+                arrays[name] = gcacompress.decodeArray(
+                    data[start:end], spec["encoding"], dtype, spec["count"])
+            else:
+                arrays[name] = data[start:end].view(dtype)
+        return arrays
+
+
+# Multi-run archives (.gcarc)
+#
+# An archive keeps many runs in one file, each as its own record, with a
+# table of contents at the end of the file:
+#     magic           8 bytes, b"\x89GCARC\r\n", then version (unsigned 16
+#                     bit) and zeros to 16 bytes
+#     records         one per run: _RECORD (record magic, header length,
+#                     data length), the run header (JSON, as a run of a
+#                     version 2 .gcard file) and its arrays, 8 byte aligned
+#     contents        JSON list with one entry per run (see listArchive)
+#     footer          _FOOTER (offset and length of the contents, magic)
+# Runs are appended by writing new records over the old contents and then
+# a new contents and footer, so the runs already in the file are not
+# rewritten. If an append is interrupted (the contents are missing or
+# damaged), the runs are found from the records when the archive is read,
+# and the next append (or rebuildArchiveIndex) writes new contents.
+ARCHIVE_MAGIC = b"\x89GCARC\r\n"
+ARCHIVE_VERSION = 1
+_ARCHIVE_HEADER = struct.Struct("<8sH6x")
+_RECORD = struct.Struct("<8sQQ")        # magic, header length, data length
+_RECORD_MAGIC = b"GCRECORD"
+_FOOTER = struct.Struct("<QQ8s")        # contents offset, length, magic
+_FOOTER_MAGIC = b"GCARCTOC"
+
+# Fields of the runs in the contents of an archive
+contentsFields = ("timeStamp", "instrName", "comment", "tabTitle",
+                  "filename")
+
+
+def isArchive(filename):
+    """True if filename is a multi-run archive."""
+    with open(filename, 'rb') as inputf:
+        return inputf.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+def listArchive(filename):
+    """Returns the contents of an archive without reading any run: a list
+    with one dictionary per run, with its "offset" in the file, the
+    contentsFields and the numbers of "points" and "peaks".
+    """
+    with open(filename, 'rb') as inputf:
+        return _readContents(inputf)[0]
+
+
+def _readContents(inputf):
+    """Returns (contents, offset of the contents) of the open archive. If
+    the contents are missing or damaged (an append was interrupted), they
+    are found from the records instead (see _scanRecords).
+    """
+    header = inputf.read(_ARCHIVE_HEADER.size)
+    if len(header) < _ARCHIVE_HEADER.size:
+        raise ValueError("Not a .gcarc archive")
+    magic, version = _ARCHIVE_HEADER.unpack(header)
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("Not a .gcarc archive")
+    if version != ARCHIVE_VERSION:
+        raise ValueError("Unknown .gcarc version: " + str(version))
+    size = os.fstat(inputf.fileno()).st_size
+    if size >= _ARCHIVE_HEADER.size + _FOOTER.size:
+        inputf.seek(size - _FOOTER.size)
+        offset, length, magic = _FOOTER.unpack(inputf.read(_FOOTER.size))
+        if magic == _FOOTER_MAGIC and \
+                offset + length + _FOOTER.size == size:
+            inputf.seek(offset)
+            try:
+                return (json.loads(inputf.read(length).decode('utf-8')),
+                        offset)
+            except ValueError:
+                pass
+    return _scanRecords(inputf)
+
+
+def _scanRecords(inputf):
+    """Returns (contents, end of the last whole record) of the open archive
+    made from its records, for an archive whose contents are missing or
+    damaged. Reading stops at the first record cut off or damaged.
+    """
+    contents = []
+    size = os.fstat(inputf.fileno()).st_size
+    offset = _ARCHIVE_HEADER.size
+    while offset + _RECORD.size <= size:
+        try:
+            run, dataStart, end = _readRecord(inputf, offset)
+        except ValueError:          # also bad json of a partial header
+            break
+        if end > size:
+            break
+        contents.append(_contentsEntry(run, offset))
+        offset = end
+    return contents, offset
+
+
+def _readRecord(inputf, offset):
+    """Returns (run header, start of data, end of record) of the record at
+    offset in the open archive.
+    """
+    inputf.seek(offset)
+    magic, headerLength, dataLength = _RECORD.unpack(
+        inputf.read(_RECORD.size))
+    if magic != _RECORD_MAGIC:
+        raise ValueError("No archive record at offset " + str(offset))
+    run = json.loads(inputf.read(headerLength).decode('utf-8'))
+    dataStart = offset + _padded(_RECORD.size + headerLength)
+    return run, dataStart, dataStart + dataLength
+
+
+def readArchive(filename, mmap=False):
+    """Returns the GasChromatogram objects of all the runs of an archive.
+    Only the run headers are read; the arrays are read (or memory mapped,
+    mmap=True) when first used.
+    """
+    gcExps = []
+    with open(filename, 'rb') as inputf:
+        contents, end = _readContents(inputf)
+        identity = _fileIdentity(inputf)
+        fileMap = FileMap(filename, 0, identity) if mmap else None
+        for entry in contents:
+            run, dataStart, end = _readRecord(inputf, entry["offset"])
+            gcExps.append(_makeGCExp(filename, run, dataStart, fileMap,
+                                     identity))
+    return gcExps
+
+
+def appendArchive(filename, gcExps, compression=None):
+    """Adds GasChromatogram objects to the end of an archive, making it if
+    it does not exist. The runs already in the archive are not rewritten.
+    Returns the new contents (see listArchive). compression is as for
+    writeGCard (runs in one archive need not all use the same).
+    """
+    releaseRuns(filename)
+    if not os.path.exists(filename):
+        with open(filename, 'wb') as outf:
+            outf.write(_ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION))
+            _writeContents(outf, [])
+    with open(filename, 'r+b') as outf:
+        contents, offset = _readContents(outf)
+        outf.seek(offset)
+        for gcExp in gcExps:
+            contents.append(_writeRecord(outf, gcExp, compression))
+        _writeContents(outf, contents)
+        outf.truncate()
+        outf.flush()
+        os.fsync(outf.fileno())
+    return contents
+
+
+def writeArchive(filename, gcExps, compression=None):
+    """Writes GasChromatogram objects to a new archive (replacing filename,
+    through a temporary file as writeGCard).
+    """
+    releaseRuns(filename)
+    tmpname = filename + ".tmp"
+    if os.path.exists(tmpname):
+        os.remove(tmpname)
+    appendArchive(tmpname, gcExps, compression)
+    os.replace(tmpname, filename)
+
+
+def _writeRecord(outf, gcExp, compression=None):
+    """Writes the record of a GasChromatogram at the current position of
+    outf. Returns its contents entry.
+    """
+    offset = outf.tell()
+    run, blocks, dataLength = _runHeader(gcExp, 0, compression)
+    header = json.dumps(run, default=_jsonValue).encode('utf-8')
+    outf.write(_RECORD.pack(_RECORD_MAGIC, len(header), dataLength))
+    outf.write(header)
+    _pad(outf, _RECORD.size + len(header))
+    _writeBlocks(outf, blocks)
+    return _contentsEntry(run, offset)
+
+
+def _contentsEntry(run, offset):
+    entry = {"offset": offset}
+    for name in contentsFields:
+        entry[name] = run.get(name)
+    entry["points"] = run["arrays"]["y"]["count"]
+    entry["peaks"] = len(run["peaks"]["peakStart"])
+    return entry
+
+
+def _writeContents(outf, contents):
+    offset = outf.tell()
+    data = json.dumps(contents, default=_jsonValue).encode('utf-8')
+    outf.write(data)
+    outf.write(_FOOTER.pack(offset, len(data), _FOOTER_MAGIC))
+
+
+def rebuildArchiveIndex(filename):
+    """Rebuilds the contents of an archive from its records (after an
+    interrupted append). Anything after the last whole record is dropped.
+    Returns the new contents.
+    """
+    releaseRuns(filename)
+    with open(filename, 'r+b') as outf:
+        contents, offset = _scanRecords(outf)
+        outf.seek(offset)
+        _writeContents(outf, contents)
+        outf.truncate()
+    return contents
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Module for importing time/intensity traces from text files (csv, tab or
+space separated, as exported by this program or by other data systems).
+
+sniffFormat looks at the start of a file to find the delimiter (comma, tab,
+semicolon or spaces), whether numbers use a decimal comma (1,5 with ; or
+tab delimiters) and how many header lines come before the numbers.
+
+readTextTrace then reads the file in chunks of bytes; each chunk (cut at
+the last whole line) is parsed by numpy's loadtxt straight into an array,
+so no python list is made per line. A chunk with lines that are not
+numbers (a footer, a second header, missing values) is parsed again
+skipping the bad lines. importTrace wraps the arrays as a GasChromatogram
+ready for the peak finding.
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import datetime
+import io
+import os
+import warnings
+import numpy as np
+import gaschromatogram as gc
+
+# Bytes read at a time
+CHUNK_BYTES = 1 << 22
+
+# Bytes and lines looked at by sniffFormat
+_SNIFF_BYTES = 1 << 16
+_SNIFF_LINES = 200
+
+# Delimiters tried by sniffFormat, in order (None is any whitespace)
+_DELIMITERS = (",", "\t", ";", None)
+
+
+class TextFormat():
+    """Layout of a text trace found by sniffFormat.
+        delimiter       "," "\\t" ";" or None (whitespace)
+        decimalComma    True if numbers are written 1,5
+        headerLines     number of lines before the numbers
+        nColumns        number of columns of numbers
+        columnNames     fields of the last header line ([] if none)
+    """
+
+    def __init__(self, delimiter, decimalComma, headerLines, nColumns,
+                 columnNames):
+        self.delimiter = delimiter
+        self.decimalComma = decimalComma
+        self.headerLines = headerLines
+        self.nColumns = nColumns
+        self.columnNames = columnNames
+
+    def __repr__(self):
+        return ("TextFormat(delimiter=%r, decimalComma=%r, headerLines=%r, "
+                "nColumns=%r)" % (self.delimiter, self.decimalComma,
+                                  self.headerLines, self.nColumns))
+
+
+def _numbers(line, delimiter, decimalComma):
+    """Returns the number of fields of line if they are all numbers, else
+    0.
+    """
+    fields = line.split(delimiter)
+    if delimiter is not None and len(fields) > 0 and fields[-1].strip() == "":
+        fields = fields[:-1]                # trailing delimiter
+    if len(fields) == 0:
+        return 0
+    for field in fields:
+        field = field.strip().strip('"')
+        if decimalComma:
+            field = field.replace(",", ".")
+        try:
+            float(field)
+        except ValueError:
+            return 0
+    return len(fields)
+
+
+def sniffFormat(filename):
+    """Returns the TextFormat of a text trace from its first lines. Raises
+    ValueError if no delimiter gives lines of numbers.
+    """
+    with open(filename, 'rb') as inputf:
+        sample = inputf.read(_SNIFF_BYTES)
+    lines = sample.decode('latin-1').splitlines()
+    if len(sample) == _SNIFF_BYTES and len(lines) > 1:
+        lines = lines[:-1]                  # last line may be cut off
+    lines = lines[:_SNIFF_LINES]
+
+    for first, line in enumerate(lines):
+        if line.strip() == "":
+            continue
+        for delimiter in _DELIMITERS:
+            for decimalComma in ((False, True) if delimiter != "," else
+                                 (False,)):
+                nColumns = _numbers(line, delimiter, decimalComma)
+                if nColumns == 0 or \
+                        (nColumns == 1 and delimiter is not None):
+                    continue
+# most of the next few lines must have the same layout (allowing for a
+# footer or a missing value)
+                following = [_numbers(l, delimiter, decimalComma)
+                             for l in lines[first + 1:first + 6]
+                             if l.strip() != ""]
+                if 2 * following.count(nColumns) >= len(following):
+                    names = []
+                    if first > 0:
+                        names = [name.strip().strip('"') for name in
+                                 lines[first - 1].split(delimiter)]
+                    return TextFormat(delimiter, decimalComma, first,
+                                      nColumns, names)
+    raise ValueError("No columns of numbers found in " + filename)
+
+
+def readTextTrace(filename, textFormat=None, columns=(0, 1),
+                  chunkBytes=CHUNK_BYTES):
+    """Reads the columns (time, intensity by default) of a text trace.
+    textFormat is found with sniffFormat if not given. Returns a 2-D float
+    array, one column for each of columns.
+    """
+    if textFormat is None:
+        textFormat = sniffFormat(filename)
+    columns = tuple(columns)
+    blocks = []
+    with open(filename, 'rb') as inputf:
+        for i in range(textFormat.headerLines):
+            inputf.readline()
+        rest = b""
+        while True:
+            chunk = inputf.read(chunkBytes)
+            if chunk == b"":
+                break
+            chunk = rest + chunk
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:                    # no whole line yet
+                rest = chunk
+                continue
+            rest = chunk[end:]
+            blocks.append(_parseChunk(chunk[:end], textFormat, columns))
+        if rest.strip() != b"":
+            blocks.append(_parseChunk(rest, textFormat, columns))
+    if len(blocks) == 0:
+        return np.empty((0, len(columns)))
+    return np.concatenate(blocks)
+
+
+def _parseChunk(chunk, textFormat, columns):
+    """Parses whole lines of a text trace into an array (rows x columns).
+    """
+    text = chunk.decode('latin-1')
+    if textFormat.decimalComma:
+        text = text.replace(",", ".")
+    try:
+        return np.loadtxt(io.StringIO(text), delimiter=textFormat.delimiter,
+                          usecols=columns, ndmin=2, quotechar='"')
+    except ValueError:
+        pass
+# some lines are not numbers: parse again, skipping them
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        data = np.genfromtxt(io.StringIO(text.replace('"', '')),
+                             delimiter=textFormat.delimiter, usecols=columns,
+                             invalid_raise=False)
+    data = np.asarray(data, dtype=float).reshape(-1, len(columns))
+    return data[~np.isnan(data).any(axis=1)]
+
+
+def importTrace(filename, thresh=None, gradThresh=None, textFormat=None,
+                columns=(0, 1), timeScale=1.0, traceDtype=None):
+    """Returns a GasChromatogram of a text trace (see readTextTrace).
+    timeScale multiplies the times (e.g. 1/60 for files in seconds). The
+    time stamp is the modification time of the file. The thresholds are
+    those used when the peaks are found (None for the thresh and gradThresh
+    settings).
+    """
+    if thresh is None:
+        thresh = gc.setting('thresh')
+    if gradThresh is None:
+        gradThresh = gc.setting('gradThresh')
+    data = readTextTrace(filename, textFormat, columns)
+    timeStamp = datetime.datetime.fromtimestamp(
+        os.path.getmtime(filename)).strftime('%Y-%m-%d-%H:%M:%S')
+    gcExp = gc.GasChromatogram([data[:, 0] * timeScale, data[:, 1]],
+                               timeStamp, thresh, gradThresh,
+                               traceDtype=traceDtype)
+    gcExp.filename = filename
+    gcExp.shortfile = os.path.splitext(os.path.basename(filename))[0]
+    gcExp.tabTitle = gcExp.shortfile
+    return gcExp
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Module for the acquisition journal: the points of a run written to disk
+while the run is collected, so a run is not lost if the program crashes
+(or the computer loses power) before the run ends.
+
+An AcquisitionJournal is opened for each channel when its run starts.
+addPoint only appends to two arrays; every blockPoints points the block is
+written to the file (with a CRC so a block cut off by a crash is found)
+and handed to the operating system, and at most every syncSeconds the
+file is synced to disk. So a crash of the program loses at most the last
+block, and a loss of power at most the last syncSeconds. When the run
+ends the journal is closed but kept (keepJournal) until the run has been
+saved (removeJournal), so a run that was processed but not saved is not
+lost either.
+
+On the next start findJournals lists the journals left behind, and
+recoverJournal rebuilds the GasChromatogram of each from its header and
+the blocks that were written whole.
+
+A journal file is laid out as:
+    magic           8 bytes, b"\\x89GCJRNL\\r\\n"
+    version         unsigned 16 bit, little-endian (1)
+    header length   unsigned 32 bit, little-endian
+    header          JSON (utf-8): channel, timeStamp, instrName, comment,
+                    thresh, gradThresh
+    blocks          _BLOCK (magic, number of points, CRC32 of the data),
+                    then the times and the intensities of the block
+                    (little-endian float64)
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+from array import array
+import glob
+import json
+import os
+import struct
+import sys
+import time
+import weakref
+import zlib
+import numpy as np
+import gaschromatogram as gc
+
+MAGIC = b"\x89GCJRNL\r\n"
+VERSION = 1
+_PREFIX = struct.Struct("<HI")          # version, header length
+_BLOCK = struct.Struct("<4sII")         # magic, points, CRC32 of the data
+_BLOCK_MAGIC = b"GCJB"
+
+# Extension of journal files, and of journals already recovered
+JOURNAL_EXT = ".gcjournal"
+RECOVERED_EXT = ".recovered"
+
+# Points per block written, and most seconds between syncs to disk
+BLOCK_POINTS = 64
+SYNC_SECONDS = 5.0
+
+# Journal files kept for the runs (GasChromatogram objects) not yet saved
+_keptJournals = weakref.WeakKeyDictionary()
+
+
+def journalFilename(directory, channel, timeStamp):
+    """Name of the journal of a run ("channel 1 2016-06-03-12.01.33" with
+    JOURNAL_EXT, as : cannot be in a Windows filename).
+    """
+    return os.path.join(directory, "channel " + str(channel) + " " +
+                        str(timeStamp).replace(":", ".") + JOURNAL_EXT)
+
+
+class AcquisitionJournal():
+    """Journal of the points of one run (see module docstring)."""
+
+    def __init__(self, filename, channel, timeStamp, instrName="",
+                 comment="", thresh=None, gradThresh=None,
+                 blockPoints=BLOCK_POINTS, syncSeconds=SYNC_SECONDS):
+        self.filename = filename
+        self.blockPoints = blockPoints
+        self.syncSeconds = syncSeconds
+        self.points = 0
+        self._times = array('d')
+        self._yVals = array('d')
+        header = json.dumps({"channel": channel, "timeStamp": timeStamp,
+                             "instrName": instrName, "comment": comment,
+                             "thresh": thresh, "gradThresh": gradThresh},
+                            default=_jsonValue).encode('utf-8')
+        self._outf = open(filename, 'wb')
+        self._outf.write(MAGIC)
+        self._outf.write(_PREFIX.pack(VERSION, len(header)))
+        self._outf.write(header)
+        self.sync()
+
+    def addPoint(self, timeVal, yVal):
+        """Adds a point, writing the block if it is full."""
+        self._times.append(timeVal)
+        self._yVals.append(yVal)
+        if len(self._times) >= self.blockPoints:
+            self.writeBlock()
+
+    def writeBlock(self):
+        """Writes the points not yet written as a block, and syncs the file
+        if it was last synced syncSeconds ago.
+        """
+        nPoints = len(self._times)
+        if nPoints == 0:
+            return
+        data = _littleEndian(self._times) + _littleEndian(self._yVals)
+        self._outf.write(_BLOCK.pack(_BLOCK_MAGIC, nPoints,
+                                     zlib.crc32(data)))
+        self._outf.write(data)
+        self._outf.flush()                  # safe from a crash of the program
+        self.points += nPoints
+        self._times = array('d')
+        self._yVals = array('d')
+        if time.monotonic() - self._lastSync >= self.syncSeconds:
+            self.sync()
+
+    def sync(self):
+        """Syncs the file to disk (safe from a loss of power)."""
+        self._outf.flush()
+        os.fsync(self._outf.fileno())
+        self._lastSync = time.monotonic()
+
+    def close(self, remove=False):
+        """Writes the last points and closes the journal. The file is
+        removed if remove; otherwise it is kept until the run has been
+        saved (see keepJournal).
+        """
+        if self._outf is None:
+            return
+        try:
+            self.writeBlock()
+            self.sync()
+        finally:
+            self._outf.close()
+            self._outf = None
+        if remove:
+            os.remove(self.filename)
+
+
+def _littleEndian(values):
+    if sys.byteorder != "little":
+        values = array('d', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _jsonValue(value):
+    """Converts numpy numbers (e.g. thresholds) for json."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Cannot save " + repr(value) + " in a journal header")
+
+
+def findJournals(directory):
+    """Returns the journals left in directory by runs that did not end
+    (not yet recovered), oldest first.
+    """
+    return sorted(glob.glob(os.path.join(glob.escape(directory),
+                                         "*" + JOURNAL_EXT)),
+                  key=os.path.getmtime)
+
+
+def readJournal(filename):
+    """Returns (header, time, y) of a journal: the header dictionary and
+    arrays of the points of every whole block. Reading stops at a block
+    cut off by a crash (or damaged), so the points before it are kept.
+    """
+    with open(filename, 'rb') as inputf:
+        contents = inputf.read()
+    if contents[:len(MAGIC)] != MAGIC:
+        raise ValueError(filename + " is not an acquisition journal")
+    version, length = _PREFIX.unpack_from(contents, len(MAGIC))
+    if version != VERSION:
+        raise ValueError("Unknown journal version: " + str(version))
+    start = len(MAGIC) + _PREFIX.size
+    header = json.loads(contents[start:start + length].decode('utf-8'))
+
+    times = []
+    yVals = []
+    offset = start + length
+    while offset + _BLOCK.size <= len(contents):
+        magic, nPoints, crc = _BLOCK.unpack_from(contents, offset)
+        dataStart = offset + _BLOCK.size
+        end = dataStart + 16 * nPoints
+        if magic != _BLOCK_MAGIC or end > len(contents) or \
+                zlib.crc32(contents[dataStart:end]) != crc:
+            break
+        block = np.frombuffer(contents, dtype='<f8', count=2 * nPoints,
+                              offset=dataStart)
+        times.append(block[:nPoints])
+        yVals.append(block[nPoints:])
+        offset = end
+    if len(times) == 0:
+        return header, np.zeros(0), np.zeros(0)
+    return header, np.concatenate(times), np.concatenate(yVals)
+
+
+def recoverJournal(filename):
+    """Returns the GasChromatogram of the run in a journal (peaks not yet
+    found), or None if no points were written.
+    """
+    header, times, yVals = readJournal(filename)
+    if len(times) == 0:
+        return None
+    return gc.GasChromatogram([times, yVals], header["timeStamp"],
+                              header["thresh"], header["gradThresh"],
+                              header["comment"], header["instrName"])
+
+
+def markRecovered(filename):
+    """Renames a journal once its run has been recovered, so it is not
+    recovered again (the file is kept in case the run is not saved).
+    Returns the new filename.
+    """
+    os.replace(filename, filename + RECOVERED_EXT)
+    return filename + RECOVERED_EXT
+
+
+def keepJournal(gcExp, filename):
+    """Keeps the journal file of the run gcExp (a GasChromatogram) until the
+    run has been saved, when removeJournal removes it. If the program stops
+    first, the run is recovered from the journal at the next start.
+    """
+    if filename is not None:
+        _keptJournals[gcExp] = filename
+
+
+def removeJournal(gcExp):
+    """Removes the journal kept for gcExp (see keepJournal), once the run
+    has been saved or deliberately closed. Does nothing if there is none.
+    """
+    filename = _keptJournals.pop(gcExp, None)
+    if filename is not None:
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Module for opening data files in the background, so the window does not
+freeze while a large file or archive is read.
+
+A BackgroundLoader opens files on a pool of worker threads. Reading the
+file, reading (or mapping) the arrays, the backwards compatibility fixes
+and, if asked for, finding the peaks again are all done on the worker.
+Each run is put on a queue as soon as it is ready; the GUI takes them off
+with poll() from a root.after() callback and adds a tab for each, so tabs
+appear one at a time while the rest of the file is still being read.
+
+Nothing here uses tkinter: all tk calls stay on the GUI thread.
+
+Messages on the queue are tuples (kind, filename, shortfilename, value):
+    ("run", ..., GasChromatogram)   one run of the file, ready to show
+    ("done", ..., number of runs)   all runs of the file have been sent
+    ("error", ..., message)         the file could not be opened
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import threading
+import numpy as np
+import gaschromatogram as gc
+import gcaformat
+import gcaimport
+
+# Extensions of text traces (opened with gcaimport)
+textExtensions = (".csv", ".txt", ".dat")
+
+
+def fixBkwdCompat(dataset, shortfilename):
+    """Function to deal with backwards compatibility of datasets.
+
+    This function is likely to be constantly in flux with each revision
+    of the program. Anytime that there is a change in the format of the
+    GasChromatogram object, these changes would need to be reflected
+    here so that old data could still be read.
+
+    Traces saved as lists and peaks saved before Peak used __slots__
+    are converted while unpickling (__setstate__ of GasChromatogram
+    and Peak), so they arrive here already in the current format.
+    """
+    try:
+        if dataset.tabTitle == "":
+            dataset.tabTitle = shortfilename
+    except AttributeError:
+        dataset.tabTitle = shortfilename
+    try:
+        if dataset.instrName == "":
+            dataset.instrName = ""
+    except AttributeError:
+        dataset.instrName = ""
+    try:
+        if np.size(dataset.baselineCalc) > 0:
+            pass
+        else:
+            dataset.baselineCalc = 0
+    except:
+        dataset.baselineCalc = 0
+
+    return dataset
+
+
+def loadFile(filename, mmap=False, thresh=None, gradThresh=None):
+    """Returns the list of GasChromatogram objects in a .gcard file, .gcarc
+    archive or text trace (thresholds are given to text traces).
+    """
+    if os.path.splitext(filename)[1].lower() in textExtensions:
+        return [gcaimport.importTrace(filename, thresh, gradThresh)]
+    return gcaformat.readGCard(filename, mmap=mmap)
+
+
+class BackgroundLoader():
+    """Opens files on worker threads and queues their runs for the GUI
+    (see module docstring).
+    """
+
+    def __init__(self, workers=2):
+        self.results = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, filename, mmap=False, thresh=None, gradThresh=None,
+               reprocess=False, engine=None):
+        """Starts opening filename. Text traces get the thresholds thresh
+        and gradThresh (None for the thresh and gradThresh settings). If
+        reprocess, the peaks of every run are found again with those
+        thresholds (and the peak finding routine engine).
+        """
+        if thresh is None:
+            thresh = gc.setting('thresh')
+        if gradThresh is None:
+            gradThresh = gc.setting('gradThresh')
+        with self._lock:
+            self._pending += 1
+        self._pool.submit(self._load, filename, mmap, thresh, gradThresh,
+                          reprocess, engine)
+
+    @property
+    def busy(self):
+        """True while files are being opened."""
+        with self._lock:
+            return self._pending > 0
+
+    def poll(self, maxItems=1):
+        """Returns up to maxItems messages from the queue without waiting
+        (an empty list if there are none).
+        """
+        messages = []
+        while len(messages) < maxItems:
+            try:
+                messages.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+    def shutdown(self, wait=False):
+        """Stops the workers (files being read are finished if wait)."""
+        self._pool.shutdown(wait=wait)
+
+    def _load(self, filename, mmap, thresh, gradThresh, reprocess, engine):
+        shortfilename = os.path.basename(filename)
+        try:
+            gcExps = loadFile(filename, mmap, thresh, gradThresh)
+            for gcExp in gcExps:
+                gcExp.loadLazyArrays()      # read here, not on the GUI thread
+                fixBkwdCompat(gcExp, shortfilename)
+                if reprocess:
+                    gcExp.thresh = thresh
+                    gcExp.gradThresh = gradThresh
+                    gcExp.peaks = []
+                    gcExp.baselineIndex = []
+                    gcExp.baseline = []
+                    gcExp.baselineCalc = []
+                    gc.runPeakEngine(gcExp, engine)
+                    gcExp.releaseCache()    # made again when drawn
+                self.results.put(("run", filename, shortfilename, gcExp))
+            self.results.put(("done", filename, shortfilename, len(gcExps)))
+        except Exception as error:
+            self.results.put(("error", filename, shortfilename, str(error)))
+        finally:
+            with self._lock:
+                self._pending -= 1
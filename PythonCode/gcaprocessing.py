@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Module connecting the GUI to the analysis in gaschromatogram.py
+
+gaschromatogram.py does not use the config globals, the main window or
+tkinter. The procedures here take the settings from gcaglobals, run the
+analysis on the experiments held in the main window's dataList and show any
+warnings the analysis returns.
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import gaschromatogram as gc
+import gcaglobals as gcaGlobals
+import gcajournal
+
+
+def gcProcessing(newData, timeStamp, instrName, engine=None,
+                 peakFinder=None, journal=None):
+    """Procedure for taking initial data from experiment and processing it into
+    GasChromatogram class.  Calls individual methods within GasChromatogram
+    to do the various processing. It then adds the new instance of
+    GasChromatogram to the global list of experiments.
+
+    If a StreamingPeakFinder that was run during acquisition is passed, its
+    peaks are used and the peak finding routine is not run again.
+
+    The acquisition journal file of the run (if given) is kept until the run
+    is saved (see gcajournal.keepJournal).
+    """
+
+    newGCExp = gc.GasChromatogram(newData, timeStamp,
+                                  gcaGlobals.thresh, gcaGlobals.gradThresh,
+                                  gcaGlobals.comment, instrName)
+    if peakFinder is None:
+        warnings = gc.runPeakEngine(newGCExp, engine)
+    else:
+        newGCExp.thresh = peakFinder.thresh
+        newGCExp.gradThresh = peakFinder.gradThresh
+        warnings = newGCExp.usePeakFinder(peakFinder)
+    warnings += fitPeaks(newGCExp)
+    gcajournal.keepJournal(newGCExp, journal)
+    gcaGlobals.mainwind.dataList.append(newGCExp)
+    logStats(newGCExp, "Processing " + timeStamp)
+    showWarnings(warnings)
+
+
+def gcRecovered(recoveredGCExp, engine=None):
+    """Procedure for processing a run recovered from an acquisition journal
+    (see gcajournal), with the thresholds it was collected with, and adding
+    it to the global list of experiments.
+    """
+    if recoveredGCExp.thresh is None:
+        recoveredGCExp.thresh = gcaGlobals.thresh
+    if recoveredGCExp.gradThresh is None:
+        recoveredGCExp.gradThresh = gcaGlobals.gradThresh
+    warnings = gc.runPeakEngine(recoveredGCExp, engine)
+    warnings += fitPeaks(recoveredGCExp)
+    gcaGlobals.mainwind.dataList.append(recoveredGCExp)
+    logStats(recoveredGCExp, "Recovering " + str(recoveredGCExp.timeStamp))
+    showWarnings(warnings)
+
+
+def gcReProcessing(dataListIndex, thresh, gradThresh, engine=None):
+    """Procedure for taking existing data from experiment and processing it
+    into GasChromatogram class.  Calls individual methods within
+    GasChromatogram to do the various processing. It then replaces the existing
+    instance of GasChromatogram in the global list of experiments with new one.
+    """
+    reprocGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
+    gcClearPeaks(dataListIndex)
+    gcClearBaseline(dataListIndex)
+    reprocGCExp.thresh = thresh
+    reprocGCExp.gradThresh = gradThresh
+    warnings = gc.runPeakEngine(reprocGCExp, engine)
+    warnings += fitPeaks(reprocGCExp)
+    gcaGlobals.mainwind.dataList[dataListIndex] = reprocGCExp
+    logStats(reprocGCExp, "Reprocessing " + str(reprocGCExp.timeStamp))
+    showWarnings(warnings)
+
+
+def fitPeaks(gcExp):
+    """Procedure for fitting the clusters of overlapping peaks of a processed
+    GasChromatogram with the fitModel peak shape ("none" to not fit), which
+    sets the fittedArea of the peaks. Returns the fit warnings.
+    """
+    if gcaGlobals.fitModel == "none":
+        return []
+    results, warnings = gcExp.fitPeaks(gcaGlobals.fitModel)
+    return warnings
+
+
+def gcClearPeaks(dataListIndex):
+    """Procedure for removing peaks from a given data set.
+    """
+    clearPeakGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
+    clearPeakGCExp.peaks = []
+    gcaGlobals.mainwind.dataList[dataListIndex] = clearPeakGCExp
+
+
+def gcClearBaseline(dataListIndex):
+    """Procedure for removing baseline information from a data set.
+    """
+    clearBaseGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
+    clearBaseGCExp.baselineIndex = []
+    clearBaseGCExp.baseline = []
+    clearBaseGCExp.baselineCalc = []
+    gcaGlobals.mainwind.dataList[dataListIndex] = clearBaseGCExp
+
+
+def manualPeaks(dataListIndex):
+    """Procedure for integrating the peaks picked by hand (manPeakList, with
+    the baseline range in baseSelect) in a data set. The picked peaks are
+    then cleared.
+    """
+    manGCExp = gcaGlobals.mainwind.dataList[dataListIndex]
+    warnings = manGCExp.manualPeaks(gcaGlobals.manPeakList,
+                                    gcaGlobals.baseSelect)
+    gcaGlobals.manPeakList = []
+    gcaGlobals.baseSelect = []
+    showWarnings(warnings)
+
+
+def logStats(gcExp, title):
+    """Writes the processing stats collected for a GasChromatogram (if the
+    collectStats setting is on) to the log file, then clears them.
+    """
+    if gcExp.stats is not None:
+        gcaGlobals.writeLogFile(gcExp.stats.reportLines(title))
+        gcExp.stats.reset()
+
+
+def showWarnings(warnings):
+    """Shows the warnings returned by the analysis routines in message
+    boxes.
+    """
+    for warning in warnings:
+        gcaGlobals.mainwind.sendMessage(warning.title, warning.message)
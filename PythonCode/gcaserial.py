@@ -15,9 +15,13 @@ mobleyt@grinnell.edu
 """
 import gcaglobals as gcaGlobals
 import gaschromatogram as gc
+import gcaprocessing as gcaproc
+import gcafileio as gcafio
+import gcajournal
 import sys
 import threading
 import queue
+from array import array
 
 
 class GCArduinoSerial():
@@ -29,6 +33,9 @@ class GCArduinoSerial():
         self.queue1 = None
         self.queue2 = None
         self.exp = None
+        self.peakFinder1 = None
+        self.peakFinder2 = None
+        self.journals = {}          # AcquisitionJournal of running channels
 
     def openArduino(self):
         """Opens serial connection to Arduino.
@@ -183,15 +190,19 @@ troubleshooting")
                 else:
                     noExper = len(mw.dataList)
                     if channel == 1:
-                        [timeVals, yVals] = self.queue1.get(0)
+                        [timeVals, yVals, peakFinder, journal] = \
+                            self.queue1.get(0)
                         instrName = gcaGlobals.instrName[0]
                     else:
-                        [timeVals, yVals] = self.queue2.get(0)
+                        [timeVals, yVals, peakFinder, journal] = \
+                            self.queue2.get(0)
                         instrName = gcaGlobals.instrName[1]
-                    gc.gcProcessing([timeVals,  # exp finished, process
-                                     yVals],
-                                    timeStamp,
-                                    instrName)
+                    gcaproc.gcProcessing([timeVals,  # exp finished, process
+                                          yVals],
+                                         timeStamp,
+                                         instrName,
+                                         peakFinder=peakFinder,
+                                         journal=journal)
                     mw.rightFrame.checkAddNewData(noExper, channel)
                     isDone = True
             except queue.Empty:         # Whenever queue is empty, avoid error
@@ -219,6 +230,14 @@ troubleshooting")
 
         Need to think about necessary loop structure if queues and channels
             are described as lists (expansion to more channels)
+
+        Each point is also given to a StreamingPeakFinder for its channel
+        (self.peakFinder1, self.peakFinder2) so that peaks are found during
+        the run. The finder is put on the queue with the data at the end of
+        the run, so gcProcessing does not need to search for peaks again.
+
+        Each point is also written to the acquisition journal of its channel
+        (see journalPoint), so the run can be recovered after a crash.
         """
         import time
 
@@ -231,10 +250,16 @@ troubleshooting")
             except:
                 gcaGlobals.mainwind.printError(sys.exc_info())
 
-        timeVals = []
-        timeVals2 = []
-        yVals = []
-        yVals2 = []
+        def newPeakFinder():
+            return gc.StreamingPeakFinder(gcaGlobals.thresh,
+                                          gcaGlobals.gradThresh)
+
+        timeVals = array('d')           # compact storage, 8 bytes per point
+        timeVals2 = array('d')
+        yVals = array('d')
+        yVals2 = array('d')
+        self.peakFinder1 = newPeakFinder()
+        self.peakFinder2 = newPeakFinder()
 
         self.inline = ""
 
@@ -272,21 +297,34 @@ troubleshooting")
                             q1.put([float(lTimePot[2]), float(lTimePot[3])])
                             timeVals.append(float(lTimePot[2]))
                             yVals.append(float(lTimePot[3]))
-                        elif timeVals != []:
+                            self.peakFinder1.addPoint(timeVals[-1], yVals[-1])
+                            self.journalPoint(1, timeVals[-1], yVals[-1])
+                        elif len(timeVals) > 0:
+                            journal = self.closeJournal(1)
+                            self.peakFinder1.finish()
                             q1.put("quit")
-                            q1.put([timeVals, yVals])
-                            timeVals = []
-                            yVals = []
+                            q1.put([timeVals, yVals, self.peakFinder1,
+                                    journal])
+                            timeVals = array('d')
+                            yVals = array('d')
+                            self.peakFinder1 = newPeakFinder()
                             gcaGlobals.ch1Running = False
                         if lTimePot[4] != "q":
                             q2.put([float(lTimePot[4]), float(lTimePot[5])])
                             timeVals2.append(float(lTimePot[4]))
                             yVals2.append(float(lTimePot[5]))
-                        elif timeVals2 != []:
+                            self.peakFinder2.addPoint(timeVals2[-1],
+                                                      yVals2[-1])
+                            self.journalPoint(2, timeVals2[-1], yVals2[-1])
+                        elif len(timeVals2) > 0:
+                            journal = self.closeJournal(2)
+                            self.peakFinder2.finish()
                             q2.put("quit")
-                            q2.put([timeVals2, yVals2])
-                            timeVals2 = []
-                            yVals2 = []
+                            q2.put([timeVals2, yVals2, self.peakFinder2,
+                                    journal])
+                            timeVals2 = array('d')
+                            yVals2 = array('d')
+                            self.peakFinder2 = newPeakFinder()
                             gcaGlobals.ch2Running = False
 
                     """As the next line is read in, this checks to see if
@@ -317,21 +355,93 @@ troubleshooting")
                         writeStringToGC(msg)
                     if not gcaGlobals.runRWgc:  # Looks for closing of program
                         break
-            if timeVals != []:          # If data lists are not empty,
+            if len(timeVals) > 0:       # If data arrays are not empty,
+                journal = self.closeJournal(1)
+                self.peakFinder1.finish()
                 q1.put("quit")          # put on queue
-                q1.put([timeVals, yVals])
-                timeVals = []
-                yVals = []
+                q1.put([timeVals, yVals, self.peakFinder1, journal])
+                timeVals = array('d')
+                yVals = array('d')
+                self.peakFinder1 = newPeakFinder()
                 gcaGlobals.ch1Done = True
-            if timeVals2 != []:
+            if len(timeVals2) > 0:
+                journal = self.closeJournal(2)
+                self.peakFinder2.finish()
                 q2.put("quit")
-                q2.put([timeVals2, yVals2])
-                timeVals2 = []
-                yVals2 = []
+                q2.put([timeVals2, yVals2, self.peakFinder2, journal])
+                timeVals2 = array('d')
+                yVals2 = array('d')
+                self.peakFinder2 = newPeakFinder()
                 gcaGlobals.ch2Done = True
             gcaGlobals.ch1Running = False   # If all the way here, no channel
             gcaGlobals.ch2Running = False   # is running
 
+    def journalPoint(self, channel, timeVal, yVal):
+        """Adds a point to the acquisition journal of channel, opening the
+        journal at the first point of a run. If the journal cannot be
+        written the run goes on without it: no error gets out of here into
+        readwriteGC.
+        """
+        journal = self.journals.get(channel)
+        try:
+            if journal is None:
+                journal = self.openJournal(channel)
+                self.journals[channel] = journal
+            if journal:
+                journal.addPoint(timeVal, yVal)
+        except:
+            self.journals[channel] = False
+            self.journalError()
+            try:
+                if journal:
+                    journal.close(remove=False)
+            except:
+                pass
+
+    def openJournal(self, channel):
+        """Returns a new AcquisitionJournal for the run on channel, or
+        False if journals are not used (useJournal) or it cannot be made.
+        """
+        try:
+            if not gc.setting('useJournal'):
+                return False
+            if channel == 1:
+                timeStamp = gcaGlobals.startString1
+            else:
+                timeStamp = gcaGlobals.startString2
+            directory = gcafio.journalDirectory()
+            return gcajournal.AcquisitionJournal(
+                gcajournal.journalFilename(directory, channel, timeStamp),
+                channel, timeStamp, gcaGlobals.instrName[channel-1],
+                gcaGlobals.comment, gcaGlobals.thresh, gcaGlobals.gradThresh,
+                gc.setting('journalBlockPoints'),
+                gc.setting('journalSyncSeconds'))
+        except:
+            self.journalError()
+            return False
+
+    def closeJournal(self, channel):
+        """Closes the journal of a run that has ended and returns its
+        filename (None if there is none). The file is kept until the run is
+        saved (see gcajournal.keepJournal); if the program is closed first,
+        the run is recovered at the next start.
+        """
+        journal = self.journals.pop(channel, None)
+        if journal:
+            try:
+                journal.close()
+                return journal.filename
+            except:
+                self.journalError()
+        return None
+
+    def journalError(self):
+        """Reports an error of the acquisition journal (without raising)."""
+        try:
+            gcaGlobals.mainwind.printError(sys.exc_info())
+        except:
+            pass
+
     def setupExperiments(self, channel):
         """
         Procedure to send instructions to Arduino.
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Module for timing the stages of the processing of a GC trace.
+
+A ProcessingStats object keeps, for each named stage, the total wall time
+and the number of calls, and named counters (points scanned, peaks found,
+...). Times are inclusive: a stage run inside another counts in both.
+
+Collection is opt-in (collectStats in GasChromino.cfg, or
+GasChromatogram.collectStats()). When it is off the analysis uses noStats,
+whose methods do nothing, so the cost is one method call per stage.
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import time
+
+
+class ProcessingStats():
+    """Wall time and call count per stage, and counters, for one
+    GasChromatogram.
+    """
+
+    def __init__(self):
+        self.times = {}         # stage name: total seconds
+        self.calls = {}         # stage name: number of calls
+        self.counters = {}      # counter name: total
+
+    def stage(self, name):
+        """Context manager timing one call of the stage name:
+            with stats.stage("findStart"):
+                ...
+        """
+        return _StageTimer(self, name)
+
+    def add(self, name, seconds, calls=1):
+        """Adds time (and calls) measured elsewhere to stage name."""
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def count(self, name, n=1):
+        """Adds n to counter name."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        self.times.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+    def asDict(self):
+        """Returns the stats as plain dictionaries:
+            {'stages': {name: {'seconds': s, 'calls': n}},
+             'counters': {name: n}}
+        """
+        return {'stages': {name: {'seconds': self.times[name],
+                                  'calls': self.calls[name]}
+                           for name in self.times},
+                'counters': dict(self.counters)}
+
+    def reportLines(self, title=""):
+        """Returns the stats as lines of text (stages slowest first)."""
+        lines = []
+        if title != "":
+            lines.append(title + "\n")
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            lines.append("%-24s %10.6f s %8d calls\n" %
+                         (name, self.times[name], self.calls[name]))
+        for name in sorted(self.counters):
+            lines.append("%-24s %10d\n" % (name, self.counters[name]))
+        return lines
+
+    def dump(self, outf, title=""):
+        """Writes reportLines to the open text file outf."""
+        outf.writelines(self.reportLines(title))
+
+
+class _StageTimer():
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *excInfo):
+        self.stats.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoStageTimer():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        return False
+
+
+class _NoStats():
+    """Stand-in for ProcessingStats when collection is off."""
+    __slots__ = ()
+    _timer = _NoStageTimer()
+
+    def stage(self, name):
+        return self._timer
+
+    def add(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+noStats = _NoStats()
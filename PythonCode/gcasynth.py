@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Module for making synthetic GC traces, for testing, benchmarks and the
+live plot demonstration without an instrument.
+
+syntheticTrace makes a chromatogram of any length and sample rate from a
+seed (the same seed always gives the same trace) with:
+    nPeaks peaks with random heights, widths and tailing (exponentially
+        modified Gaussians, see gcafit.peakShape)
+    a fraction of the peaks placed overlapping the peak before them
+    baseline offset, linear drift and slow wander of the baseline
+    white noise
+
+Each peak is only evaluated over a window of points around it and all the
+windows are calculated in one array call, so a trace of a million points
+with a thousand peaks is made in well under a second.
+
+syntheticGC gives the trace as a GasChromatogram, emitTrace gives its
+points one at a time (as they would come from the Arduino).
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import datetime
+import numpy as np
+import gcafit
+import gaschromatogram as gc
+
+
+def syntheticTrace(nPts=1500, nPeaks=5, seed=None, timeStep=0.00315,
+                   widths=(0.03, 0.09), heights=(0.02, 1.0),
+                   tailing=(0.0, 0.0), overlap=0.0, baseline=0.05,
+                   drift=0.0, wander=0.0, noise=1e-4):
+    """Returns ([time, intensity], peaks) of a synthetic trace.
+
+    nPts points, timeStep minutes apart (1 / sample rate).
+    nPeaks peaks, centres spread at random over the run (the number is
+        limited to nPts // 100).
+    widths, heights, tailing are (low, high) ranges: sigma in minutes,
+        height above the baseline, and tau as a fraction of sigma (0 for
+        Gaussian peaks).
+    overlap is the fraction of peaks placed 1 to 3 sigma after the peak
+        before them, so they overlap or ride on it.
+    baseline is the starting baseline, drift its total change over the run
+        and wander the amplitude of a slow random variation.
+    noise is the standard deviation of the white noise.
+
+    peaks is a dictionary of arrays (sorted by centre) with the true
+    'centre', 'sigma', 'tau', 'height' and 'area' of each peak.
+    """
+    rng = np.random.default_rng(seed)
+    timePoints = np.arange(nPts) * timeStep
+    span = max(timePoints[-1], timeStep) if nPts > 0 else timeStep
+
+    nPeaks = max(0, min(nPeaks, nPts // 100))
+    sigma = rng.uniform(widths[0], widths[1], nPeaks)
+    tau = sigma * rng.uniform(tailing[0], tailing[1], nPeaks)
+    height = rng.uniform(heights[0], heights[1], nPeaks)
+    centre = np.sort(rng.uniform(0.05 * span, 0.9 * span, nPeaks))
+    riding = rng.random(nPeaks) < overlap
+    for i in np.flatnonzero(riding[1:]) + 1:    # after the previous peak
+        centre[i] = centre[i - 1] + rng.uniform(1, 3) * sigma[i - 1]
+    order = np.argsort(centre, kind='stable')
+    centre, sigma, tau, height = (centre[order], sigma[order], tau[order],
+                                  height[order])
+# area giving the height for a Gaussian (close for small tailing)
+    area = height * sigma * np.sqrt(2 * np.pi)
+
+    yPoints = baseline + drift * timePoints / span
+    if wander != 0:
+        freqs = rng.uniform(0.5, 3, 3) * 2 * np.pi / span
+        phases = rng.uniform(0, 2 * np.pi, 3)
+        yPoints = yPoints + wander / 3 * np.sin(
+            np.outer(timePoints, freqs) + phases).sum(axis=1)
+    yPoints = yPoints + rng.normal(0, noise, nPts)
+
+    if nPeaks > 0:
+# window of points for each peak: 6 sigma before, 6 sigma + 10 tau after
+        first = np.clip(np.floor((centre - 6 * sigma) / timeStep), 0,
+                        nPts - 1).astype(np.int64)
+        last = np.clip(np.ceil((centre + 6 * sigma + 10 * tau) / timeStep),
+                       0, nPts - 1).astype(np.int64)
+        lengths = last - first + 1
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        index = np.repeat(first, lengths) + np.arange(lengths.sum()) - \
+            offsets
+        values = np.repeat(area, lengths) * gcafit.peakShape(
+            timePoints[index] - np.repeat(centre, lengths),
+            np.repeat(sigma, lengths), np.repeat(tau, lengths))
+        yPoints = yPoints + np.bincount(index, weights=values,
+                                        minlength=nPts)
+
+    peaks = {'centre': centre, 'sigma': sigma, 'tau': tau,
+             'height': height, 'area': area}
+    return [timePoints, yPoints], peaks
+
+
+def syntheticGC(thresh=0.001, gradThresh=0.0005, comment="Synthetic trace",
+                instrName="synthetic", **options):
+    """Returns a GasChromatogram of a syntheticTrace (options are passed
+    on to it). The true peaks are kept in its syntheticPeaks attribute.
+    """
+    trace, peaks = syntheticTrace(**options)
+    timeStamp = datetime.datetime.strftime(datetime.datetime.now(),
+                                           '%Y-%m-%d-%H:%M:%S')
+    gcExp = gc.GasChromatogram(trace, timeStamp, thresh, gradThresh,
+                               comment, instrName)
+    gcExp.syntheticPeaks = peaks
+    return gcExp
+
+
+def emitTrace(**options):
+    """Generator giving the points of a syntheticTrace (options are passed
+    on to it) one at a time as [time, intensity].
+    """
+    trace, peaks = syntheticTrace(**options)
+    for point in zip(trace[0].tolist(), trace[1].tolist()):
+        yield list(point)
@@ -17,11 +17,14 @@ import matplotlib
 from matplotlib.backends.backend_tkagg \
     import FigureCanvasTkAgg, NavigationToolbar2TkAgg
 import numpy as np
-import gaschromatogram as gc
 import matplotlib.animation as animation
 import tkinter as tk
 from tkinter import ttk
+import gaschromatogram
 import gcafileio as gcafio
+import gcaloader
+import gcajournal
+import gcaprocessing as gcaproc
 import gcaglobals as gcaGlobals
 from livegctrace import LiveGCTrace
 import time
@@ -86,6 +89,46 @@ def connectToArduino():
         gcaGlobals.ard.startCommunicationQueues()
 
 
+def recoverJournals():
+    """Function to recover runs that were being collected when the program
+    last stopped (crash, loss of power) from their acquisition journals.
+    Each run is processed and opened in a new tab, to be saved by the user.
+    """
+    mw = gcaGlobals.mainwind
+
+    try:
+        if not gaschromatogram.setting('useJournal'):
+            return
+        journals = gcajournal.findJournals(gcafio.journalDirectory())
+    except:
+        mw.printError(sys.exc_info())
+        return
+    recovered = []
+    for journal in journals:
+        try:
+            gcExp = gcajournal.recoverJournal(journal)
+            if gcExp is not None:
+                gcaproc.gcRecovered(gcExp)
+                gcExp.tabTitle = "Recovered " + \
+                    str(gcExp.timeStamp).split('-')[-1]
+                gcExp.filename = gcExp.tabTitle
+                mw.dataNB.addDataFrame(gcExp.tabTitle)
+                mw.dataNB.datanb.select(len(mw.dataList)+1)
+                recovered.append(gcExp.tabTitle + " (" + gcExp.instrName +
+                                 ", " + str(len(gcExp.trace[0])) +
+                                 " points)")
+                gcajournal.keepJournal(gcExp,
+                                       gcajournal.markRecovered(journal))
+            else:
+                gcajournal.markRecovered(journal)
+        except:
+            mw.printError(sys.exc_info())
+    if len(recovered) > 0:
+        mw.sendMessage("Runs Recovered", "These runs did not finish when \
+the program last closed and were recovered:\n\n" + "\n".join(recovered) +
+                       "\n\nPlease save them.")
+
+
 def selectLiveTab():
     """Function that is periodically called (callback) that looks at
     global variable changeChannel. If changeChannel is different than the
@@ -218,6 +261,22 @@ class dataNotebook():
         self.datanb.grid(row=0, column=0,
                          sticky=(tk.N, tk.E, tk.S, tk.W),
                          padx=10, pady=10)
+        self.datanb.bind('<<NotebookTabChanged>>', self.releaseHiddenRuns)
+
+    def releaseHiddenRuns(self, event=None):
+        """Frees the arrays cached for drawing and analysis (see
+        GasChromatogram.releaseCache) of the runs whose tabs are not
+        selected. Called when the selected tab changes.
+        """
+        mw = gcaGlobals.mainwind
+        dataList = getattr(mw, 'dataList', [])
+        try:
+            currIndex = self.datanb.index(self.datanb.select())
+        except tk.TclError:             # no tab selected
+            currIndex = -1
+        for i, gcExp in enumerate(dataList):
+            if i + gcaGlobals.noChannels != currIndex:
+                gcExp.releaseCache()
 
     def startAnimation(self, channel):
         """Routine to actually start the animation of GC data coming in from
@@ -343,12 +402,10 @@ class dataNotebook():
             it renormalizes the area for all of the remaining peaks. Finally,
             it adds the data frame again to refresh the data.
             """
-            for i in range(len(gc.peaks)):
-                if ((xIndex >= gc.peaks[i].peakStart) and
-                        (xIndex <= gc.peaks[i].peakEnd)):
-                    del gc.peaks[i]
-                    break
-            gc.findNormalizedArea()
+            peakIndex = gc.peaks.findContaining(xIndex)
+            if peakIndex is not None:
+                del gc.peaks[peakIndex]
+            gcaproc.showWarnings(gc.findNormalizedArea())
             currTab = gcaGlobals.mainwind.dataNB.datanb.select()
             currIndex = gcaGlobals.mainwind.dataNB.datanb.index(currTab)
             if currIndex == 0:
@@ -388,12 +445,14 @@ class dataNotebook():
 
         colorlist = 20 * gcaGlobals.colorList
 
+        drawStart = time.perf_counter()
         fig = matplotlib.figure.Figure()
         a = fig.add_subplot(211)
-        xArray = np.array(gc.trace[0])
-        yArray = np.array(gc.trace[1])
-        if gc.baselineCalc != [] and gcaGlobals.showBaseline:
-            yBaseArray = np.array(gc.baselineCalc)
+        traceArrays = gc.traceArrays()      # cached until the tab is left
+        xArray = traceArrays['time']
+        yArray = traceArrays['y']
+        if np.size(gc.baselineCalc) > 0 and gcaGlobals.showBaseline:
+            yBaseArray = gc.baselineArray()
             a.plot(xArray, yBaseArray, color=gcaGlobals.baselineColor)
         a.plot(xArray, yArray, color=gcaGlobals.traceColor)
 
@@ -405,10 +464,12 @@ class dataNotebook():
                            (xArray < xArray[peak.peakEnd + 1]))
 
         table = ""
-        for peak in gc.peaks:
-            table += "{0:.3f}".format(xArray[peak.peakMax]) + \
-                "                     " + "{0:.5f}".format(peak.peakArea) + \
-                "                {0:.5f}".format(peak.relativePeakArea) + "\n"
+        for retTime, area, relArea in zip(gc.peaks.retentionTimes(xArray),
+                                          gc.peaks.peakArea,
+                                          gc.peaks.relativePeakArea):
+            table += "{0:.3f}".format(retTime) + \
+                "                     " + "{0:.5f}".format(area) + \
+                "                {0:.5f}".format(relArea) + "\n"
         fig.text(0.3, 0.02, gc.comment + "\n" +
                  gc.timeStamp + "\nInstrument: " + gc.instrName + "\n\n"
                  "Ret. Time (min)         Area          Relative Area\n" +
@@ -418,6 +479,7 @@ class dataNotebook():
         canvas = FigureCanvasTkAgg(fig, mw.dataNB.dataframelist[listindex])
 
         canvas.show()
+        gc.recordStage('redraw', time.perf_counter() - drawStart)
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         toolbar = NavigationToolbar2TkAgg(canvas,
                                           mw.dataNB.dataframelist[listindex])
@@ -757,6 +819,9 @@ occurred")
                                       "Cannot close Live Data Tab")
         elif currIndex > 1:
             mw.dataNB.datanb.forget(currIndex)
+            gcExp = mw.dataList[currIndex - gcaGlobals.noChannels]
+            gcExp.releaseCache()
+            gcajournal.removeJournal(gcExp)     # closed without saving
             del mw.dataList[currIndex - gcaGlobals.noChannels]
             del mw.dataNB.dataframelist[currIndex]
         else:
@@ -786,7 +851,7 @@ occurred")
             dataListIndex = currIndex - gcaGlobals.noChannels
         gT = float(self.gradThreshVar.get())
         thr = float(self.threshVar.get())
-        gc.gcReProcessing(dataListIndex, thr, gT)
+        gcaproc.gcReProcessing(dataListIndex, thr, gT)
         if mw.dataList[dataListIndex].filename is None:
             mw.dataNB.addDataFrame(mw.dataList[dataListIndex].tabTitle,
                                    currIndex, dataListIndex)
@@ -808,7 +873,7 @@ occurred")
                                       "Cannot analyze Live Data Tab")
         else:
             dataListIndex = currIndex - gcaGlobals.noChannels
-        gc.gcClearPeaks(dataListIndex)
+        gcaproc.gcClearPeaks(dataListIndex)
 
         if mw.dataList[dataListIndex].filename is None:
             mw.dataNB.addDataFrame(mw.dataList[dataListIndex].tabTitle,
@@ -832,8 +897,7 @@ occurred")
         else:
             dataListIndex = currIndex - gcaGlobals.noChannels
 
-        mw.dataList[dataListIndex].manualPeaks(gcaGlobals.manPeakList,
-                                               gcaGlobals.baseSelect)
+        gcaproc.manualPeaks(dataListIndex)
         if mw.dataList[dataListIndex].filename is None:
             mw.dataNB.addDataFrame(mw.dataList[dataListIndex].tabTitle,
                                    currIndex, dataListIndex)
@@ -903,12 +967,9 @@ occurred")
         else:
             dataListIndex = currIndex - gcaGlobals.noChannels
 
-        table = "Retention Time,Area,Relative Area\n"
         gc = gcaGlobals.mainwind.dataList[dataListIndex]
-        for peak in gc.peaks:
-            table += "{0:.3f}".format(gc.trace[0][peak.peakMax]) + "," + \
-                "{0:.3f}".format(peak.peakArea) + "," + \
-                "{0:.3f}".format(peak.relativePeakArea)+"\n"
+        table = "Retention Time,Area,Relative Area\n" + \
+            gc.peaks.toText(gc.trace[0], ",", 3)
 
         gcaGlobals.mainwind.root.clipboard_clear()
         gcaGlobals.mainwind.root.clipboard_append(table)
@@ -1020,6 +1081,8 @@ class fileMenu():
     """
     def __init__(self, parent):
         self.parent = parent
+        self.loader = None          # gcaloader.BackgroundLoader, when used
+        self.polling = False        # checkLoadedFiles is scheduled
         self.fm = tk.Menu(self.parent, tearoff=0)
         self.fm.add_command(label="Open", accelerator="Ctrl-O",
                             command=self.openFile)
@@ -1029,6 +1092,8 @@ class fileMenu():
                             command=lambda: self.saveFileAs())
         self.fm.add_command(label="Save Multiple As",
                             command=lambda: self.saveMultipleFileAs())
+        self.fm.add_command(label="Add to Archive",
+                            command=lambda: self.saveMultipleFileAs(True))
 
     def saveFile(self):
         """Save previously saved file.
@@ -1056,8 +1121,9 @@ class fileMenu():
         mw.dataNB.datanb.tab(currentExpIndex + gcaGlobals.noChannels,
                              text=tabtitle)
 
-    def saveMultipleFileAs(self):
-        """Function saves multiple tabs of data in one file.
+    def saveMultipleFileAs(self, append=False):
+        """Function saves multiple tabs of data in one file (or, with
+        append=True, adds them to a .gcarc archive).
 
         Currently operates by generating dictionary of names and
             GasChromatogram objects that are then displayed with radiobuttons
@@ -1078,7 +1144,10 @@ class fileMenu():
             for item in chosen:
                 if item[0].get():
                     l.append(dataDict[item[1]])
-            gcafio.saveMultipleFileAs(l)
+            if append:
+                gcafio.appendToArchive(l)
+            else:
+                gcafio.saveMultipleFileAs(l)
             fileChoose.destroy()
 
         mw = gcaGlobals.mainwind
@@ -1102,77 +1171,80 @@ class fileMenu():
         button.pack(side=tk.BOTTOM, padx=5, pady=5)
 
     def openFile(self):
-        """Function to open file. Calls gcafileio function.
+        """Function to open file. Calls gcafileio function to ask for the
+        file, which is then read on a background thread (gcaloader) so the
+        window keeps responding. checkLoadedFiles adds a tab for each run
+        as it is ready.
+        """
+        mw = gcaGlobals.mainwind
+
+        filename = gcafio.askOpenFilename()
+        if filename is None:
+            return
+        if self.loader is None:
+            self.loader = gcaloader.BackgroundLoader(
+                gaschromatogram.setting('loadWorkers'))
+        self.loader.submit(filename,
+                           gaschromatogram.setting('memmapTraces'),
+                           gcaGlobals.thresh, gcaGlobals.gradThresh,
+                           gaschromatogram.setting('reprocessOnOpen'))
+        if not self.polling:
+            self.polling = True
+            mw.root.after(50, self.checkLoadedFiles)
+
+    def checkLoadedFiles(self):
+        """Takes the runs read by the background loader off its queue and
+        adds them to the window, one run each call, calling itself again
+        while files are still being read.
         """
-        def fixBkwdCompat(dataset):
-            """Function to deal with backwards compatibility of datasets.
+        mw = gcaGlobals.mainwind
 
-            This function is likely to be constantly in flux with each revision
-            of the program. Anytime that there is a change in the format of the
-            GasChromatogram object, these changes would need to be reflected
-            here so that old data could still be read.
-            """
-            try:
-                if dataset.tabTitle == "":
-                    dataset.tabTitle = sfn
-            except AttributeError:
-                dataset.tabTitle = sfn
-            try:
-                if dataset.instrName == "":
-                    dataset.instrName = ""
-            except AttributeError:
-                dataset.instrName = ""
-            try:
-                if dataset.baselineCalc != []:
-                    pass
-                else:
-                    dataset.baselineCalc = 0
-            except:
-                dataset.baselineCalc = 0
-                
-            return dataset
+        for kind, fn, sfn, value in self.loader.poll():
+            if kind == "run":
+                self.addOpenedRun(value)
+            elif kind == "error":
+                mw.sendMessage("File Open Failed", "Trouble reading file " +
+                               sfn + "\n\n" + value +
+                               "\n\nThe file was not opened.")
+        if self.loader.busy or not self.loader.results.empty():
+            mw.root.after(50, self.checkLoadedFiles)
+        else:
+            self.polling = False
 
+    def addOpenedRun(self, indivNewData):
+        """Adds an opened run to the data list and a tab for it, asking
+        first if a run of the same file is already open.
+        """
         mw = gcaGlobals.mainwind
 
-        try:
-            newData, fn, sfn = gcafio.openFile()
-        except TypeError:
-            pass
-        else:    
-            if newData is not None:
-                existList = []
-                for data in mw.dataList:
-                    existList.append(data.filename)
-                for indivNewData in newData:
-                    newFilename = indivNewData.filename
-                    if newFilename in existList:
-                        msg = "File "+newFilename+" already exists.  \n\n Do you \
+        existList = []
+        for data in mw.dataList:
+            existList.append(data.filename)
+        newFilename = indivNewData.filename
+        if newFilename in existList:
+            msg = "File "+newFilename+" already exists.  \n\n Do you \
 want to reopen the data (this will overwrite the existing data)?"
-                        if tk.messagebox.askokcancel("File Exists", msg):
-                            frameNo = existList.index(newFilename) + \
-                                gcaGlobals.noChannels
-                        else:
-                            frameNo = 999        # user cancelled, don't open file
-                    else:
-                        frameNo = -1        # no files match, append to end of list
-                    if frameNo == -1:
-                        indivNewData = fixBkwdCompat(indivNewData)
-                        mw.dataList.append(indivNewData)
-                        mw.dataNB.addDataFrame(indivNewData.tabTitle)
-                        mw.dataNB.datanb.select(len(mw.dataList)+1)
-                        mw.root.update_idletasks()
-                    elif frameNo != 999:
-                        mw.dataList.append(indivNewData)
-                        mw.dataNB.addDataFrame(indivNewData.tabTitle,
-                                               frameNo,
-                                               frameNo-gcaGlobals.noChannels+1)
-                        mw.dataNB.datanb.select(frameNo)
-                        mw.root.update_idletasks()
-                    elif frameNo == 999:
-                        pass                    # Did not open file
+            if tk.messagebox.askokcancel("File Exists", msg):
+                frameNo = existList.index(newFilename) + \
+                    gcaGlobals.noChannels
             else:
-                mw.sendMessage("File Open Failed", "Some sort of error occurred.\n\
-    \nThe file was not opened.")
+                frameNo = 999        # user cancelled, don't open file
+        else:
+            frameNo = -1        # no files match, append to end of list
+        if frameNo == -1:
+            mw.dataList.append(indivNewData)
+            mw.dataNB.addDataFrame(indivNewData.tabTitle)
+            mw.dataNB.datanb.select(len(mw.dataList)+1)
+            mw.root.update_idletasks()
+        elif frameNo != 999:
+            mw.dataList.append(indivNewData)
+            mw.dataNB.addDataFrame(indivNewData.tabTitle,
+                                   frameNo,
+                                   frameNo-gcaGlobals.noChannels+1)
+            mw.dataNB.datanb.select(frameNo)
+            mw.root.update_idletasks()
+        elif frameNo == 999:
+            pass                    # Did not open file
 
 
 class ardConnectMenu():
@@ -49,18 +49,17 @@ class LiveGCTrace(object):
 
 def emitter():
     """
-    random emitter to show how routine works. Only called if this file is
-    initiated as __main__
+    Emitter of a synthetic GC trace (see gcasynth) to show how routine works.
+    Only called if this file is initiated as __main__
 
     Future Development for GC-Arduino:
         This could be modified to allow for simulation of GC using datafiles
     """
 
-    import random
-    for y in range(100):
-        x = random.random()
-        print(str(x)+" "+str(y))
-        yield [float(x), float(y/100)]
+    import gcasynth
+    for point in gcasynth.emitTrace(nPts=2000, nPeaks=6, tailing=(0, 1),
+                                    overlap=0.3):
+        yield point
 
 if __name__ == '__main__':
     import matplotlib.pyplot as plt
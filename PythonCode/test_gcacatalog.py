@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the catalog of saved runs (gcacatalog): synthetic runs saved in a
+temporary directory are indexed into an in-memory database and searched,
+also after a file has been saved again with other runs.
+
+    python -m unittest test_gcacatalog
+    python -m pytest test_gcacatalog.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import gaschromatogram as gc
+import gcacatalog
+import gcaformat
+import gcasynth
+
+
+def processedRun(seed, timeStamp, instrName, comment):
+    """Returns a GasChromatogram of a synthetic trace with its peaks
+    found.
+    """
+    gcExp = gcasynth.syntheticGC(comment=comment, instrName=instrName,
+                                 nPts=3000, nPeaks=6, seed=seed)
+    gcExp.timeStamp = timeStamp
+    gc.runPeakEngine(gcExp, "vectorized")
+    return gcExp
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.directory, "March"))
+        self.runs = {
+            "a.gcard": [processedRun(1, "2026-02-27-09:15:00", "GC 1",
+                                     "Ethanol standard")],
+            os.path.join("March", "b.gcarc"): [
+                processedRun(2, "2026-03-02-10:00:00", "GC 2", "Sample 1"),
+                processedRun(3, "2026-03-05-14:30:00", "GC 2",
+                             "Sample 2, ethanol")],
+        }
+        for name, gcExps in self.runs.items():
+            self.save(name, gcExps)
+        self.conn = gcacatalog.openCatalog(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def save(self, name, gcExps):
+        if name.endswith(".gcarc"):
+            gcaformat.writeArchive(self.path(name), gcExps)
+        else:
+            gcaformat.writeGCard(self.path(name), gcExps)
+
+    def assertPeaks(self, run, gcExp):
+        peaks = gcExp.peaks
+        expected = list(zip(peaks.retentionTimes(gcExp.trace[0]).tolist(),
+                            peaks.peakArea.tolist(),
+                            peaks.relativePeakArea.tolist(),
+                            [None] * len(peaks),        # not fitted (NaN)
+                            peaks.peakStart.tolist(),
+                            peaks.peakEnd.tolist()))
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(gcacatalog.runPeaks(self.conn, run["id"]),
+                         expected)
+
+    def test_indexAndFind(self):
+        self.assertEqual(gcacatalog.indexDirectory(self.conn,
+                                                   self.directory), 2)
+        runs = gcacatalog.findRuns(self.conn)
+        self.assertEqual([run["time"] for run in runs],
+                         ["2026-03-05 14:30:00", "2026-03-02 10:00:00",
+                          "2026-02-27 09:15:00"])    # newest first
+        archive = self.path(os.path.join("March", "b.gcarc"))
+        self.assertEqual([(run["path"], run["runIndex"]) for run in runs],
+                         [(archive, 1), (archive, 0),
+                          (self.path("a.gcard"), 0)])
+        self.assertEqual(runs[2]["points"], 3000)
+        self.assertEqual((runs[2]["thresh"], runs[2]["gradThresh"]),
+                         (0.001, 0.0005))
+
+        gcExps = self.runs["a.gcard"] + \
+            self.runs[os.path.join("March", "b.gcarc")]
+        for run, gcExp in zip(runs[::-1], gcExps):
+            self.assertPeaks(run, gcExp)
+
+        def found(**conditions):
+            return [run["timeStamp"] for run in
+                    gcacatalog.findRuns(self.conn, **conditions)]
+
+        self.assertEqual(found(instrName="GC 2"),
+                         ["2026-03-05-14:30:00", "2026-03-02-10:00:00"])
+        self.assertEqual(found(since="2026-03-01", until="2026-03-05"),
+                         ["2026-03-02-10:00:00"])
+        self.assertEqual(found(comment="ETHANOL"),
+                         ["2026-03-05-14:30:00", "2026-02-27-09:15:00"])
+        self.assertEqual(found(limit=1), ["2026-03-05-14:30:00"])
+        gcExp = self.runs["a.gcard"][0]
+        retention = float(gcExp.peaks.retentionTimes(gcExp.trace[0])[0])
+        self.assertIn("2026-02-27-09:15:00",
+                      found(peakNear=retention, tolerance=1e-6))
+        self.assertEqual(found(instrName="GC 1", peakNear=retention + 1e-3,
+                               tolerance=1e-4), [])
+
+    def test_reindex(self):
+        gcacatalog.indexDirectory(self.conn, self.directory)
+        self.assertEqual(gcacatalog.indexDirectory(self.conn,
+                                                   self.directory), 0)
+
+# save a.gcard again with another run (and make sure its time changes)
+        newRun = processedRun(4, "2026-03-10-08:00:00", "GC 1", "Rerun")
+        self.save("a.gcard", [newRun])
+        stat = os.stat(self.path("a.gcard"))
+        os.utime(self.path("a.gcard"), ns=(stat.st_atime_ns,
+                                           stat.st_mtime_ns + 10**9))
+        self.assertEqual(gcacatalog.indexDirectory(self.conn,
+                                                   self.directory), 1)
+        runs = gcacatalog.findRuns(self.conn, instrName="GC 1")
+        self.assertEqual([run["comment"] for run in runs], ["Rerun"])
+        self.assertPeaks(runs[0], newRun)
+        nPeaks = sum(len(gcExp.peaks) for gcExp in
+                     self.runs[os.path.join("March", "b.gcarc")]) + \
+            len(newRun.peaks)
+        self.assertEqual(self.conn.execute(
+            "SELECT COUNT(*) FROM peaks").fetchone()[0], nPeaks)
+
+        self.assertTrue(gcacatalog.indexFile(self.conn, self.path("a.gcard"),
+                                             force=True))
+        self.assertEqual(len(gcacatalog.findRuns(self.conn)), 3)
+
+    def test_removedAndUnreadableFiles(self):
+        gcacatalog.indexDirectory(self.conn, self.directory)
+        os.remove(self.path(os.path.join("March", "b.gcarc")))
+        with open(self.path("broken.gcard"), 'wb') as outf:
+            outf.write(b"not a run")
+        out = io.StringIO()
+        self.assertEqual(gcacatalog.indexDirectory(self.conn, self.directory,
+                                                   out=out), 0)
+        self.assertIn("broken.gcard", out.getvalue())
+        self.assertEqual([run["path"] for run in
+                          gcacatalog.findRuns(self.conn)],
+                         [self.path("a.gcard")])
+        self.assertEqual(self.conn.execute(
+            "SELECT COUNT(*) FROM peaks").fetchone()[0],
+            len(self.runs["a.gcard"][0].peaks))
+        gcacatalog.removeFile(self.conn, self.path("a.gcard"))
+        self.assertEqual(gcacatalog.findRuns(self.conn), [])
+
+    def test_isoTime(self):
+        self.assertEqual(gcacatalog.isoTime("2016-06-03-12:01:33"),
+                         "2016-06-03 12:01:33")
+        self.assertIsNone(gcacatalog.isoTime("Recovered 12.01.33"))
+        self.assertIsNone(gcacatalog.isoTime(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the compression of saved arrays (gcacompress): every array must
+decode to exactly the values encoded, whichever encoding is chosen for it.
+
+    python -m unittest test_gcacompress
+    python -m pytest test_gcacompress.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import unittest
+import numpy as np
+import gcacompress
+
+
+def fromSteps(steps, decimals, start=0):
+    """Returns the values (float64, with decimals decimals) whose whole
+    numbers start at start and go up by steps.
+    """
+    whole = start + np.concatenate(([0], np.cumsum(steps)))
+    return whole / 10.0**decimals
+
+
+class CompressTest(unittest.TestCase):
+
+    def assertRoundTrip(self, values, codecs=gcacompress.codecs):
+        """Encodes values with each codec, checks that they decode to the
+        same values and returns the encoding of the last codec.
+        """
+        for codec in codecs:
+            with self.subTest(codec=codec):
+                encoding, data = gcacompress.encodeArray(values, codec)
+                self.assertEqual(encoding["codec"], codec)
+                self.assertEqual(encoding["length"], len(data))
+                decoded = gcacompress.decodeArray(data, encoding,
+                                                  values.dtype, len(values))
+                self.assertEqual(decoded.dtype, values.dtype)
+                np.testing.assert_array_equal(decoded, values)
+        return encoding
+
+    def test_evenTimes(self):
+        """An even time grid is stored as second differences (order 2)."""
+        times = np.round(np.arange(5000) * 0.00315, 5)
+        encoding = self.assertRoundTrip(times)
+        self.assertEqual((encoding["decimals"], encoding["order"],
+                          np.dtype(encoding["deltaType"]).itemsize),
+                         (5, 2, 1))
+
+    def test_orderOne(self):
+        """A slowly changing trace is stored as differences (order 1)."""
+        rng = np.random.default_rng(1)
+        values = fromSteps(rng.integers(-60, 60, 5000), 8, 5000000)
+        encoding = self.assertRoundTrip(values)
+        self.assertEqual((encoding["decimals"], encoding["order"]), (8, 1))
+
+    def test_deltaTypes(self):
+        """The differences are kept in the smallest integer type that holds
+        them.
+        """
+        rng = np.random.default_rng(2)
+        for itemsize, limit in ((1, 100), (2, 30000), (4, 2 * 10**9),
+                                (8, 10**12)):
+            with self.subTest(itemsize=itemsize):
+                steps = rng.integers(-limit, limit, 1000)
+                steps[0] = limit                    # needs the whole type
+                values = fromSteps(steps, 3)
+                encoding = self.assertRoundTrip(values)
+                self.assertEqual(encoding["order"], 1)
+                self.assertEqual(np.dtype(encoding["deltaType"]).itemsize,
+                                 itemsize)
+
+    def test_integers(self):
+        values = np.arange(-500, 500, 7, dtype=np.int32)
+        encoding = self.assertRoundTrip(values)
+        self.assertEqual(encoding["decimals"], 0)
+
+    def test_float32(self):
+        values = np.round(np.linspace(0, 2, 3000), 4).astype(np.float32)
+        encoding = self.assertRoundTrip(values)
+        self.assertIsNotNone(encoding["decimals"])
+
+    def test_shortArrays(self):
+        for values in (np.array([1.25]), np.array([1.25, 2.5]),
+                       np.array([1.25, 2.5, 2.75])):
+            with self.subTest(count=len(values)):
+                self.assertRoundTrip(values)
+
+    def test_notQuantized(self):
+        """Values findDecimals cannot write with few decimals are stored
+        as their bytes.
+        """
+        rng = np.random.default_rng(3)
+        for name, values in (
+                ("random", rng.random(2000)),
+                ("not finite", np.array([0.5, np.nan, np.inf, -np.inf])),
+                ("too large", np.array([1.5, 2.0**60])),
+                ("large integers", np.array([1, 2**62], dtype=np.int64)),
+                ("empty", np.zeros(0))):
+            with self.subTest(values=name):
+                self.assertIsNone(gcacompress.findDecimals(values))
+                encoding = self.assertRoundTrip(values)
+                self.assertIsNone(encoding["decimals"])
+
+    def test_wrongCount(self):
+        values = np.round(np.arange(100) * 0.00315, 5)
+        for codec in ("zlib", "none"):
+            encoding, data = gcacompress.encodeArray(values, codec)
+            with self.assertRaises(ValueError):
+                gcacompress.decodeArray(data, encoding, values.dtype, 99)
+        encoding, data = gcacompress.encodeArray(np.random.random(10))
+        with self.assertRaises(ValueError):
+            gcacompress.decodeArray(data, encoding, np.float64, 11)
+
+    def test_unknownCodec(self):
+        with self.assertRaises(ValueError):
+            gcacompress.encodeArray(np.zeros(3), "bz2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the text export (gcaexport): the text must be exactly what
+formatting each value with "%.*f" % (precision, value) gives.
+
+    python -m unittest test_gcaexport
+    python -m pytest test_gcaexport.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import io
+import unittest
+import numpy as np
+import gaschromatogram as gc
+import gcaexport
+
+
+def printfRows(columns, delimiter, precision, lineEnd):
+    """The text formatted one value at a time."""
+    return "".join(delimiter.join("%.*f" % (p, value)
+                                  for p, value in zip(precision, row)) +
+                   lineEnd for row in zip(*columns)).encode()
+
+
+class ExportTest(unittest.TestCase):
+
+    def test_roundsLikePrintf(self):
+        rng = np.random.default_rng(0)
+        columns = [np.array([5.55, 1.985, 0.125, -0.5, 2.5, -0.0, 0.0,
+                             1e-7, -1e-7, 123456.0005]),
+                   rng.uniform(-10, 10, 10)]
+        for precision in (0, 1, 2, 3, 6):
+            with self.subTest(precision=precision):
+                self.assertEqual(
+                    gcaexport.formatColumns(columns, ",", precision, "\n"),
+                    printfRows(columns, ",", [precision] * 2, "\n"))
+
+    def test_randomValues(self):
+        rng = np.random.default_rng(1)
+        columns = [np.round(rng.uniform(-100, 100, 20000), 3),
+                   rng.normal(0, 1, 20000) * 10.0**rng.integers(-8, 8, 20000),
+                   rng.integers(0, 10**6, 20000).astype(float)]
+        precision = [2, 6, 0]
+        self.assertEqual(
+            gcaexport.formatColumns(columns, " ", precision, "\r\n"),
+            printfRows(columns, " ", precision, "\r\n"))
+
+    def test_writeTraceInChunks(self):
+        rng = np.random.default_rng(2)
+        trace = [np.arange(1000) * 0.00315, rng.uniform(0, 1, 1000)]
+        gcExp = gc.GasChromatogram(trace, "", 0.001, 0.0005)
+        outf = io.BytesIO()
+        gcaexport.writeColumns(outf, gcExp.trace, " ", 6, "\r\n",
+                               chunkRows=64)
+        self.assertEqual(outf.getvalue(),
+                         printfRows(trace, " ", [6, 6], "\r\n"))
+
+    def test_allDigits(self):
+        columns = [np.array([0.1, 1 / 3, 2.0])]
+        self.assertEqual(gcaexport.formatColumns(columns, " ", None, "\n"),
+                         b"0.1\n0.3333333333333333\n2.0\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of fitting peaks with peak shape models (gcafit): peaks made with a
+known shape on a sloping baseline are fitted and the parameters compared
+with those they were made with.
+
+    python -m unittest test_gcafit
+    python -m pytest test_gcafit.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import unittest
+import numpy as np
+import gaschromatogram as gc
+import gcafit
+
+
+def knownPeaks(peaks, baseline=(0.05, 0.02), nPts=600, timeStep=0.002,
+               noise=0.0, seed=0):
+    """Returns (time, y) of peaks (rows of area, centre, sigma, tau; tau 0
+    for a Gaussian) on the straight baseline (value at time 0, slope).
+    """
+    t = np.arange(nPts) * timeStep
+    y = baseline[0] + baseline[1] * t
+    for area, centre, sigma, tau in peaks:
+        y = y + area * gcafit.peakShape(t - centre, sigma, tau)
+    y = y + np.random.default_rng(seed).normal(0, noise, nPts)
+    return t, y
+
+
+def clusterIndices(t, y, peaks):
+    """Rough peak start, end and maximum indices of adjacent peaks (as the
+    peak finding would give them): split halfway between the centres.
+    """
+    centres = [centre for area, centre, sigma, tau in peaks]
+    bounds = [0] + [int(np.searchsorted(t, (a + b) / 2))
+                    for a, b in zip(centres[:-1], centres[1:])] + \
+        [len(t) - 1]
+    starts, ends = np.array(bounds[:-1]), np.array(bounds[1:])
+    maxes = np.array([start + int(np.argmax(y[start:end + 1]))
+                      for start, end in zip(starts, ends)])
+    return starts, ends, maxes
+
+
+class FitTest(unittest.TestCase):
+
+    def fitKnown(self, peaks, model, noise=0.0):
+        t, y = knownPeaks(peaks, noise=noise)
+        starts, ends, maxes = clusterIndices(t, y, peaks)
+        return gcafit.fitCluster(t, y, starts, ends, maxes, float(y[0]),
+                                 model)
+
+    def test_gaussian(self):
+        peaks = [(0.02, 0.6, 0.03, 0.0)]
+        result = self.fitKnown(peaks, "gaussian")
+        self.assertTrue(result['converged'])
+        np.testing.assert_allclose(result['params'],
+                                   [row[:3] for row in peaks], rtol=1e-6)
+        np.testing.assert_allclose(result['baseline'], (0.05, 0.02),
+                                   rtol=1e-6)
+
+    def test_overlappingGaussians(self):
+        peaks = [(0.02, 0.5, 0.03, 0.0), (0.008, 0.6, 0.025, 0.0)]
+        result = self.fitKnown(peaks, "gaussian", noise=1e-5)
+        self.assertTrue(result['converged'])
+        np.testing.assert_allclose(result['areas'], [0.02, 0.008],
+                                   rtol=1e-2)
+
+    def test_emg(self):
+        peaks = [(0.02, 0.5, 0.03, 0.04)]
+        result = self.fitKnown(peaks, "emg")
+        self.assertTrue(result['converged'])
+        np.testing.assert_allclose(result['params'], peaks, rtol=1e-5)
+        np.testing.assert_allclose(result['baseline'], (0.05, 0.02),
+                                   rtol=1e-5)
+
+    def test_noBetterPoint(self):
+        """A fit that can find no step lowering the residuals has not
+        converged (here the Jacobian has the wrong sign).
+        """
+        def residuals(p):
+            return p - 1.0, -np.eye(len(p))
+
+        p, cost, iterations, converged = gcafit.levenbergMarquardt(
+            residuals, [3.0, -2.0])
+        self.assertFalse(converged)
+        np.testing.assert_array_equal(p, [3.0, -2.0])
+
+    def test_fitPeaksSetting(self):
+        """GasChromatogram.fitPeaks fills fittedArea, and fits nothing for
+        the model "none".
+        """
+        peaks = [(0.02, 0.5, 0.03, 0.0), (0.008, 0.6, 0.025, 0.0)]
+        t, y = knownPeaks(peaks, noise=1e-5)
+        gcExp = gc.GasChromatogram([t, y], "", 0.001, 0.0005)
+        starts, ends, maxes = clusterIndices(t, y, peaks)
+        gcExp.peaks = [gc.Peak(start, end, pkMax, 0.0, float(y[0]), 0.0)
+                       for start, end, pkMax in zip(starts, ends, maxes)]
+        self.assertEqual(gcExp.fitPeaks("none"), ([], []))
+        self.assertTrue(np.all(np.isnan(gcExp.peaks.fittedArea)))
+        results, warnings = gcExp.fitPeaks("gaussian")
+        self.assertEqual((len(results), warnings), (1, []))
+        np.testing.assert_allclose(gcExp.peaks.fittedArea,
+                                   [2.0, 0.8], rtol=1e-2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of reading and writing .gcard files and .gcarc archives (gcaformat),
+in particular runs whose arrays are read from the file after it was opened
+(lazily or memory mapped).
+
+    python -m unittest test_gcaformat
+    python -m pytest test_gcaformat.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import gcaformat
+
+exampleDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "Example Data Sets")
+
+
+def readExample(number):
+    return gcaformat.readGCard(os.path.join(
+        exampleDir, "Example Data %d.gcard" % number), lazy=False)
+
+
+class FormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.example1 = readExample(1)
+        self.example2 = readExample(2)
+# the example files are version 1; these are version 2 (read lazily)
+        self.filename = os.path.join(self.directory, "run.gcard")
+        gcaformat.writeGCard(self.filename, self.example1)
+        self.filename2 = os.path.join(self.directory, "run2.gcard")
+        gcaformat.writeGCard(self.filename2, self.example2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def replaceWithExample2(self):
+        """Replaces the file behind the program's back."""
+        tmpname = self.filename + ".new"
+        shutil.copyfile(self.filename2, tmpname)
+        os.replace(tmpname, self.filename)
+
+    def test_lazyRunOfReplacedFile(self):
+        gcExp = gcaformat.readGCard(self.filename)[0]
+        self.replaceWithExample2()
+        with self.assertRaises(ValueError):
+            gcExp.trace
+
+    def test_mappedRunOfReplacedFile(self):
+        gcExp = gcaformat.readGCard(self.filename, mmap=True)[0]
+        self.replaceWithExample2()
+        with self.assertRaises(ValueError):
+            gcExp.trace
+
+    def test_lazyRunOfUnchangedFile(self):
+        for mmap in (False, True):
+            gcExp = gcaformat.readGCard(self.filename, mmap=mmap)[0]
+            np.testing.assert_array_equal(gcExp.trace[1],
+                                          self.example1[0].trace[1])
+
+    def assertTraces(self, gcExps, expected):
+        self.assertEqual(len(gcExps), len(expected))
+        for gcExp, other in zip(gcExps, expected):
+            np.testing.assert_array_equal(gcExp.trace[0], other.trace[0])
+            np.testing.assert_array_equal(gcExp.trace[1], other.trace[1])
+
+    def test_rewriteGCard(self):
+        """Runs opened lazily (or mapped) still have their own arrays after
+        their file is written over with other runs.
+        """
+        for mmap in (False, True):
+            with self.subTest(mmap=mmap):
+                gcaformat.writeGCard(self.filename, self.example1)
+                gcExps = gcaformat.readGCard(self.filename, mmap=mmap)
+                gcaformat.writeGCard(self.filename, self.example2)
+                self.assertTraces(gcExps, self.example1)
+                self.assertTraces(gcaformat.readGCard(self.filename),
+                                  self.example2)
+
+    def test_saveOpenedRunsOverTheirFile(self):
+        for mmap in (False, True):
+            with self.subTest(mmap=mmap):
+                gcaformat.writeGCard(self.filename, self.example1)
+                gcExps = gcaformat.readGCard(self.filename, mmap=mmap)
+                gcaformat.writeGCard(self.filename, gcExps[1:] + gcExps[:1])
+                self.assertTraces(gcaformat.readGCard(self.filename),
+                                  self.example1[1:] + self.example1[:1])
+
+    def test_rewriteArchive(self):
+        archive = os.path.join(self.directory, "runs.gcarc")
+        for mmap in (False, True):
+            with self.subTest(mmap=mmap):
+                gcaformat.writeArchive(archive, self.example1)
+                gcExps = gcaformat.readGCard(archive, mmap=mmap)
+                gcaformat.writeArchive(archive, self.example2)
+                self.assertTraces(gcExps, self.example1)
+                self.assertTraces(gcaformat.readGCard(archive),
+                                  self.example2)
+
+    def test_appendToArchive(self):
+        archive = os.path.join(self.directory, "runs.gcarc")
+        for mmap in (False, True):
+            with self.subTest(mmap=mmap):
+                gcaformat.writeArchive(archive, self.example1)
+                gcExps = gcaformat.readGCard(archive, mmap=mmap)
+                gcaformat.appendArchive(archive, self.example2)
+                self.assertTraces(gcExps, self.example1)
+                self.assertTraces(gcaformat.readGCard(archive),
+                                  self.example1 + self.example2)
+
+    def test_interruptedAppend(self):
+        """An archive whose append stopped part way is still read (the runs
+        written whole), and the next append repairs it.
+        """
+        archive = os.path.join(self.directory, "runs.gcarc")
+        gcaformat.writeArchive(archive, self.example1)
+        with open(archive, 'rb') as inputf:
+            before = inputf.read()
+        gcaformat.appendArchive(archive, self.example2)
+        with open(archive, 'rb') as inputf:
+            after = inputf.read()
+        firstAdded = gcaformat.listArchive(archive)[len(self.example1)]
+        footer = gcaformat._FOOTER.size
+        cuts = ((firstAdded["offset"] + 100, self.example1),
+                (len(after) - footer - 10, self.example1 + self.example2),
+                (len(after) - 3, self.example1 + self.example2))
+        for cut, expected in cuts:
+            with self.subTest(cut=cut):
+# what was not yet written over is still the old file
+                with open(archive, 'wb') as outf:
+                    outf.write(after[:cut] + before[cut:])
+                self.assertEqual(len(gcaformat.listArchive(archive)),
+                                 len(expected))
+                self.assertTraces(gcaformat.readGCard(archive), expected)
+                gcaformat.appendArchive(archive, self.example2[:1])
+                self.assertTraces(gcaformat.readGCard(archive),
+                                  expected + self.example2[:1])
+                self.assertEqual(gcaformat.rebuildArchiveIndex(archive),
+                                 gcaformat.listArchive(archive))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of importing text traces (gcaimport): small files in the layouts
+other data systems write (header lines, other delimiters, decimal commas,
+missing values, a footer) are read in small chunks, so that lines are cut
+between chunks and both the loadtxt path and the genfromtxt fallback are
+used.
+
+    python -m unittest test_gcaimport
+    python -m pytest test_gcaimport.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import gaschromatogram as gc
+import gcaimport
+
+# (file contents, delimiter, decimalComma, headerLines, expected rows)
+fixtures = {
+    "plain.csv": (
+        "0.00000,0.05120\n"
+        "0.00315,0.05131\n"
+        "0.00630,0.05175\n"
+        "0.00945,0.05320\n",
+        ",", False, 0,
+        [[0.0, 0.0512], [0.00315, 0.05131], [0.0063, 0.05175],
+         [0.00945, 0.0532]]),
+    "header.csv": (
+        "Run 12, FID\n"
+        "\"Time (min)\",\"Signal (V)\"\n"
+        "\"0.1\",\"1.5\"\n"
+        "\"0.2\",\"1.75\"\n"
+        "\"0.3\",\"2.0\"\n",
+        ",", False, 2,
+        [[0.1, 1.5], [0.2, 1.75], [0.3, 2.0]]),
+    "comma.txt": (
+        "Zeit\tSignal\tDruck\r\n"
+        "0,5\t10,25\t1\r\n"
+        "1,0\t11,5\t1\r\n"
+        "1,5\t12,75\t1\r\n",
+        "\t", True, 1,
+        [[0.5, 10.25], [1.0, 11.5], [1.5, 12.75]]),
+    "semicolon.csv": (
+        "time;y\n"
+        "1;2\n"
+        "3;4\n"
+        "5;6\n",
+        ";", False, 1,
+        [[1, 2], [3, 4], [5, 6]]),
+    "spaces.dat": (
+        "# exported trace\n"
+        "  0.5   2.5\n"
+        "  1.0   3.5\n"
+        "  1.5   4.5\n",
+        None, False, 1,
+        [[0.5, 2.5], [1.0, 3.5], [1.5, 4.5]]),
+    "missing.csv": (
+        "time,y\n"
+        "0.1,1.0\n"
+        "0.2,\n"
+        "0.3,3.0\n"
+        "0.4,4.0\n"
+        "0.5,5.0\n"
+        "End of run\n",
+        ",", False, 1,
+        [[0.1, 1.0], [0.3, 3.0], [0.4, 4.0], [0.5, 5.0]]),
+}
+
+
+class ImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filenames = {}
+        for name, fixture in fixtures.items():
+            self.filenames[name] = os.path.join(self.directory, name)
+            with open(self.filenames[name], 'w', newline='') as outf:
+                outf.write(fixture[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sniffFormat(self):
+        for name, (text, delimiter, decimalComma, headerLines,
+                   rows) in fixtures.items():
+            with self.subTest(name=name):
+                textFormat = gcaimport.sniffFormat(self.filenames[name])
+                self.assertEqual((textFormat.delimiter,
+                                  textFormat.decimalComma,
+                                  textFormat.headerLines),
+                                 (delimiter, decimalComma, headerLines))
+        self.assertEqual(gcaimport.sniffFormat(
+            self.filenames["header.csv"]).columnNames,
+            ["Time (min)", "Signal (V)"])
+        self.assertEqual(gcaimport.sniffFormat(
+            self.filenames["comma.txt"]).nColumns, 3)
+
+    def test_readTextTrace(self):
+        """Whole file in one chunk, and in chunks of a few bytes (lines cut
+        between chunks).
+        """
+        for name, fixture in fixtures.items():
+            for chunkBytes in (gcaimport.CHUNK_BYTES, 7, 16):
+                with self.subTest(name=name, chunkBytes=chunkBytes):
+                    data = gcaimport.readTextTrace(self.filenames[name],
+                                                   chunkBytes=chunkBytes)
+                    np.testing.assert_array_equal(data, fixture[4])
+
+    def test_fallbackOnlyForBadChunk(self):
+        """Only the chunk with the missing value is parsed again (skipping
+        the line); the rows of the other chunks are all kept.
+        """
+        lines = ["%.5f,%.8f" % (i * 0.00315, 0.05 + i * 1e-5)
+                 for i in range(200)]
+        lines[150] = "%.5f," % (150 * 0.00315)
+        filename = os.path.join(self.directory, "long.csv")
+        with open(filename, 'w') as outf:
+            outf.write("\n".join(lines) + "\n")
+        expected = [[i * 0.00315, 0.05 + i * 1e-5] for i in range(200)
+                    if i != 150]
+        for chunkBytes in (100, 1000, gcaimport.CHUNK_BYTES):
+            with self.subTest(chunkBytes=chunkBytes):
+                data = gcaimport.readTextTrace(filename,
+                                               chunkBytes=chunkBytes)
+                np.testing.assert_allclose(data, expected, rtol=0,
+                                           atol=1e-12)
+
+    def test_otherColumns(self):
+        data = gcaimport.readTextTrace(self.filenames["comma.txt"],
+                                       columns=(0, 2))
+        np.testing.assert_array_equal(data, [[0.5, 1], [1.0, 1], [1.5, 1]])
+
+    def test_importTrace(self):
+        gcExp = gcaimport.importTrace(self.filenames["header.csv"])
+        self.assertEqual((gcExp.thresh, gcExp.gradThresh),
+                         (gc.setting('thresh'), gc.setting('gradThresh')))
+        np.testing.assert_array_equal(gcExp.trace[0], [0.1, 0.2, 0.3])
+        np.testing.assert_array_equal(gcExp.trace[1], [1.5, 1.75, 2.0])
+        self.assertEqual((gcExp.filename, gcExp.tabTitle),
+                         (self.filenames["header.csv"], "header"))
+
+        gcExp = gcaimport.importTrace(self.filenames["semicolon.csv"],
+                                      0.002, 0.0007, timeScale=1 / 60,
+                                      traceDtype="float32")
+        self.assertEqual((gcExp.thresh, gcExp.gradThresh), (0.002, 0.0007))
+        self.assertEqual(gcExp.trace[1].dtype, np.float32)
+        np.testing.assert_allclose(gcExp.trace[0], [1 / 60, 3 / 60, 5 / 60],
+                                   rtol=1e-6)
+
+    def test_noNumbers(self):
+        filename = os.path.join(self.directory, "notes.txt")
+        with open(filename, 'w') as outf:
+            outf.write("These are notes,\nnot a trace.\n")
+        with self.assertRaises(ValueError):
+            gcaimport.readTextTrace(filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
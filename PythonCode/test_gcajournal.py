@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the acquisition journal (gcajournal): a run written to a journal
+is recovered from it, including after the file was cut off part way
+through a block (a crash while writing).
+
+    python -m unittest test_gcajournal
+    python -m pytest test_gcajournal.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import gcajournal
+
+TIME_STAMP = "2026-10-16-12:01:33"
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = gcajournal.journalFilename(self.directory, 1,
+                                                   TIME_STAMP)
+        self.times = np.arange(100) * 0.00315
+        self.yVals = np.sin(self.times * 40) + 0.05
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeJournal(self, points, blockPoints=16):
+        journal = gcajournal.AcquisitionJournal(
+            self.filename, 1, TIME_STAMP, "GC 1", "test run", 0.001,
+            np.float64(0.0005), blockPoints=blockPoints)
+        for timeVal, yVal in zip(self.times[:points].tolist(),
+                                 self.yVals[:points].tolist()):
+            journal.addPoint(timeVal, yVal)
+        return journal
+
+    def test_writeAndRecover(self):
+        self.writeJournal(100).close()
+        self.assertEqual(gcajournal.findJournals(self.directory),
+                         [self.filename])
+        gcExp = gcajournal.recoverJournal(self.filename)
+        np.testing.assert_array_equal(gcExp.trace[0], self.times)
+        np.testing.assert_array_equal(gcExp.trace[1], self.yVals)
+        self.assertEqual((gcExp.timeStamp, gcExp.instrName, gcExp.comment,
+                          gcExp.thresh, gcExp.gradThresh),
+                         (TIME_STAMP, "GC 1", "test run", 0.001, 0.0005))
+
+    def test_crashBeforeClose(self):
+        """Only whole blocks are in the file if the journal is not closed
+        (the points of the last, partial, block are lost).
+        """
+        journal = self.writeJournal(40)
+        header, times, yVals = gcajournal.readJournal(self.filename)
+        np.testing.assert_array_equal(times, self.times[:32])
+        np.testing.assert_array_equal(yVals, self.yVals[:32])
+        journal.close()
+
+    def test_truncatedBlock(self):
+        self.writeJournal(100).close()
+        with open(self.filename, 'rb') as inputf:
+            contents = inputf.read()
+        blockSize = gcajournal._BLOCK.size + 16 * 16
+        lastBlock = len(contents) - gcajournal._BLOCK.size - 16 * 4
+        for cut, points in ((lastBlock - 3 * blockSize + 10, 48),
+                            (lastBlock - 1, 80), (lastBlock + 5, 96),
+                            (len(contents) - 1, 96)):
+            with self.subTest(cut=cut):
+                with open(self.filename, 'wb') as outf:
+                    outf.write(contents[:cut])
+                gcExp = gcajournal.recoverJournal(self.filename)
+                np.testing.assert_array_equal(gcExp.trace[0],
+                                              self.times[:points])
+                np.testing.assert_array_equal(gcExp.trace[1],
+                                              self.yVals[:points])
+
+    def test_damagedBlock(self):
+        """A block whose CRC does not match ends the recovered points."""
+        self.writeJournal(64).close()
+        with open(self.filename, 'r+b') as outf:
+            outf.seek(-100, os.SEEK_END)
+            outf.write(b"\x00\x01")
+        header, times, yVals = gcajournal.readJournal(self.filename)
+        np.testing.assert_array_equal(times, self.times[:48])
+
+    def test_noPoints(self):
+        self.writeJournal(0).close()
+        self.assertIsNone(gcajournal.recoverJournal(self.filename))
+
+    def test_keptUntilSaved(self):
+        self.writeJournal(100).close()
+        gcExp = gcajournal.recoverJournal(self.filename)
+        recovered = gcajournal.markRecovered(self.filename)
+        self.assertEqual(gcajournal.findJournals(self.directory), [])
+        gcajournal.keepJournal(gcExp, recovered)
+        self.assertTrue(os.path.exists(recovered))
+        gcajournal.removeJournal(gcExp)
+        self.assertFalse(os.path.exists(recovered))
+        gcajournal.removeJournal(gcExp)         # nothing left to remove
+
+
+if __name__ == "__main__":
+    unittest.main()
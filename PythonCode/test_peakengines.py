@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that findPeaksVectorized finds the same peaks (same start, end, max,
+area and baseline, to the last bit) and baseline points as findPeaks (point
+by point), on the Example Data Sets and on synthetic traces (gcasynth) with
+noise, drift, tailing and overlapping peaks.
+
+    python -m unittest test_peakengines
+    python -m pytest test_peakengines.py
+
+Created on Fri Oct 16 2026
+
+@author:
+T. Andrew Mobley
+Department of Chemistry
+Noyce Science Center
+Grinnell College
+Grinnell, IA 50112
+mobleyt@grinnell.edu
+"""
+import glob
+import os
+import unittest
+import numpy as np
+import gaschromatogram as gc
+import gcaformat
+import gcasynth
+
+exampleDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "Example Data Sets")
+
+
+def exampleTraces():
+    """Returns list of (name, trace, thresh, gradThresh) of the example
+    data.
+    """
+    traces = []
+    for filename in sorted(glob.glob(os.path.join(exampleDir, "*.gcard"))):
+        for gcExp in gcaformat.readGCard(filename, lazy=False):
+            traces.append((os.path.basename(filename), gcExp.trace,
+                           gcExp.thresh, gcExp.gradThresh))
+    return traces
+
+
+def syntheticTraces(count=30):
+    """Returns list of (name, trace, thresh, gradThresh) of synthetic
+    traces, each made from its seed.
+    """
+    traces = []
+    for seed in range(count):
+        rng = np.random.default_rng(seed)
+        trace, truePeaks = gcasynth.syntheticTrace(
+            int(rng.integers(200, 20000)), int(rng.integers(1, 60)), seed,
+            tailing=(0, 1.5), overlap=0.4,
+            drift=float(rng.uniform(-0.05, 0.05)),
+            wander=float(rng.uniform(0, 0.02)),
+            noise=float(rng.choice([1e-5, 1e-4, 5e-4, 1e-3])))
+        traces.append(("seed " + str(seed), trace,
+                       float(rng.choice([0.0005, 0.001, 0.003])),
+                       float(rng.choice([0.0002, 0.0005, 0.001]))))
+    return traces
+
+
+def noisyTraces():
+    """Returns list of (name, trace, thresh, gradThresh) of long traces
+    whose noise is near thresh, so that most of the peaks found are noise
+    (many short peaks and baseline points near the 2 * thresh limit).
+    """
+    traces = []
+    for noise in (1e-3, 2e-3):
+        trace, truePeaks = gcasynth.syntheticTrace(200000, 40, 1,
+                                                   noise=noise)
+        traces.append(("noise " + str(noise), trace, 0.001, 0.0005))
+    return traces
+
+
+def findWith(engine, trace, thresh, gradThresh, traceDtype=None):
+    """Returns (peaks, baselineIndex) found by engine ("loop" or
+    "vectorized").
+    """
+    gcExp = gc.GasChromatogram([np.array(trace[0]), np.array(trace[1])],
+                               "", thresh, gradThresh,
+                               traceDtype=traceDtype)
+    gc.runPeakEngine(gcExp, engine, areaChoice="trapezoidal")
+    peaks = [(int(pk.peakStart), int(pk.peakEnd), int(pk.peakMax),
+              float(pk.peakArea), float(pk.peakBaseline))
+             for pk in gcExp.peaks]
+    return peaks, list(gcExp.baselineIndex)
+
+
+class PeakEngineTest(unittest.TestCase):
+
+    def compareEngines(self, traces, traceDtype=None):
+        for name, trace, thresh, gradThresh in traces:
+            with self.subTest(trace=name):
+                loopPeaks, loopBaseline = findWith("loop", trace, thresh,
+                                                   gradThresh, traceDtype)
+                peaks, baselineIndex = findWith("vectorized", trace, thresh,
+                                                gradThresh, traceDtype)
+                self.assertEqual(peaks, loopPeaks)
+                self.assertEqual(baselineIndex, loopBaseline)
+
+    def test_vectorizedExamples(self):
+        self.compareEngines(exampleTraces())
+
+    def test_vectorizedSynthetic(self):
+        self.compareEngines(syntheticTraces())
+
+    def test_vectorizedNoisy(self):
+        self.compareEngines(noisyTraces())
+
+    def test_vectorizedFloat32(self):
+        self.compareEngines(syntheticTraces(10), traceDtype="float32")
+
+    def test_traceArraysShareTrace(self):
+        """The cached arrays use the trace itself, in its dtype."""
+        for traceDtype in ("float32", "float64"):
+            name, trace, thresh, gradThresh = syntheticTraces(1)[0]
+            gcExp = gc.GasChromatogram(trace, "", thresh, gradThresh,
+                                       traceDtype=traceDtype)
+            arrays = gcExp.traceArrays()
+            self.assertIs(arrays['time'], gcExp.trace[0])
+            self.assertIs(arrays['y'], gcExp.trace[1])
+            gcExp.releaseCache()
+            self.assertIsNot(gcExp.traceArrays(), arrays)
+
+
+if __name__ == "__main__":
+    unittest.main()